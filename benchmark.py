@@ -0,0 +1,212 @@
+"""
+Benchmark suite for password generation, encryption and encrypted file I/O.
+
+Every case runs in a fresh process so that its peak RSS is its own. Results
+are compared with a JSON baseline; the run fails when throughput drops, or
+peak memory or file size grows, by more than the tolerance.
+
+    python benchmark.py --sizes 1000 10000 --lengths 12 --baseline benchmark_baseline.json
+    python benchmark.py --update-baseline
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_SIZES = (1000, 10000, 100000, 1000000)
+DEFAULT_LENGTHS = (8, 16, 32)
+DEFAULT_TOLERANCE = 0.2
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS отдаёт байты, Linux - килобайты
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _bench_generate_password(count, length, workdir):
+    from password_generator import generate_password
+    for _ in range(count):
+        generate_password(length)
+
+
+def _bench_generate_multiple_passwords(count, length, workdir):
+    from password_generator import generate_multiple_passwords
+    generate_multiple_passwords(count, length)
+
+
+def _bench_generate_pattern_passwords(count, length, workdir):
+    from password_generator import generate_multiple_passwords
+    # Шаблон той же длины с обязательными классами символов
+    generate_multiple_passwords(count, length, pattern=f"u*{{{max(length - 1, 3)}}}!d!s")
+
+
+def _bench_encrypt_password(count, length, workdir):
+    from encryption_utils import encrypt_password
+    from password_generator import generate_multiple_passwords
+    passwords = generate_multiple_passwords(count, length)
+    key = _key()
+    started = time.perf_counter()
+    for password in passwords:
+        encrypt_password(password, key)
+    return time.perf_counter() - started
+
+
+def _bench_decrypt_password(count, length, workdir):
+    from encryption_utils import decrypt_password, encrypt_passwords
+    from password_generator import generate_multiple_passwords
+    key = _key()
+    encrypted_passwords = encrypt_passwords(generate_multiple_passwords(count, length), key, workers=None)
+    started = time.perf_counter()
+    for encrypted_password in encrypted_passwords:
+        decrypt_password(encrypted_password, key)
+    return time.perf_counter() - started
+
+
+def _bench_save_encrypted_passwords(count, length, workdir):
+    from encryption_utils import generate_encrypted_passwords
+    generate_encrypted_passwords(count, length, os.path.join(workdir, 'passwords.txt'), _key(), workers=None)
+
+
+def _bench_read_encrypted_passwords(count, length, workdir):
+    from encryption_utils import generate_encrypted_passwords, read_encrypted_passwords
+    filename = os.path.join(workdir, 'passwords.txt')
+    key = _key()
+    generate_encrypted_passwords(count, length, filename, key, workers=None)
+    started = time.perf_counter()
+    read_encrypted_passwords(filename, key, workers=None)
+    return time.perf_counter() - started
+
+
+def _key():
+    from cryptography.fernet import Fernet
+    return Fernet.generate_key()
+
+
+CASES = {
+    'generate_password': _bench_generate_password,
+    'generate_multiple_passwords': _bench_generate_multiple_passwords,
+    'generate_pattern_passwords': _bench_generate_pattern_passwords,
+    'encrypt_password': _bench_encrypt_password,
+    'decrypt_password': _bench_decrypt_password,
+    'save_encrypted_passwords': _bench_save_encrypted_passwords,
+    'read_encrypted_passwords': _bench_read_encrypted_passwords,
+}
+
+
+def run_case(case, count, length):
+    """
+    Runs one case in the current process and returns its measurements.
+    A case may return the seconds spent in the measured part; otherwise the
+    whole call is timed.
+    """
+    logging.disable(logging.INFO)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            started = time.perf_counter()
+            elapsed = CASES[case](count, length, workdir)
+            if elapsed is None:
+                elapsed = time.perf_counter() - started
+            file_size = sum(os.path.getsize(os.path.join(workdir, name)) for name in os.listdir(workdir))
+    finally:
+        logging.disable(logging.NOTSET)
+    return {
+        'throughput': count / elapsed if elapsed > 0 else float('inf'),
+        'seconds': elapsed,
+        'peak_rss_kb': _peak_rss_kb(),
+        'file_size': file_size or None,
+    }
+
+
+def case_name(case, count, length):
+    return f"{case}/n={count}/len={length}"
+
+
+def run_suite(cases=tuple(CASES), sizes=DEFAULT_SIZES, lengths=DEFAULT_LENGTHS, isolate=True):
+    """
+    Runs every case for every size and length and returns {case name: measurements}
+    """
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        for count in sizes:
+            for length in lengths:
+                if isolate:
+                    with context.Pool(1) as pool:
+                        result = pool.apply(run_case, (case, count, length))
+                else:
+                    result = run_case(case, count, length)
+                name = case_name(case, count, length)
+                results[name] = result
+                print(f"{name}: {result['throughput']:,.0f} items/s, peak RSS {result['peak_rss_kb']} KiB, "
+                      f"file {result['file_size']} bytes", flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns a list of regression messages for results measured against baseline
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['throughput'] < expected['throughput'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {result['throughput']:,.0f} < baseline "
+                               f"{expected['throughput']:,.0f} items/s")
+        for metric in ('peak_rss_kb', 'file_size'):
+            if result.get(metric) and expected.get(metric) and result[metric] > expected[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {result[metric]} > baseline {expected[metric]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Password manager benchmark suite")
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument('--lengths', nargs='+', type=int, default=list(DEFAULT_LENGTHS))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative regression, e.g. 0.2 for 20%%")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="write the results into the baseline instead of comparing")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.cases, args.sizes, args.lengths)
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file)
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
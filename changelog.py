@@ -0,0 +1,137 @@
+import json
+import logging
+import os
+import struct
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from vault import RECORD_LENGTH, VaultError, _append_framed, _iter_framed, _open, _seal
+
+# Журнал изменений хранится рядом с хранилищем в файле <vault>.log:
+#   заголовок | операция 0 | операция 1 | ...
+# Каждая операция (добавление, изменение, удаление записи) шифруется отдельно
+# и дописывается в конец файла, поэтому одно изменение стоит одной записи на диск.
+LOG_MAGIC = b'PMVLTLOG'
+LOG_SUFFIX = '.log'
+COMPACT_SUFFIX = '.compact'
+LOG_HEADER = struct.Struct('>8s16s16s')     # magic, vault salt, log salt
+OP_NUMBER = struct.Struct('>Q')
+
+OP_PUT = 'put'
+OP_DELETE = 'delete'
+
+
+def log_path(vault_filename):
+    return vault_filename + LOG_SUFFIX
+
+
+class ChangeLog:
+    """
+    Append-only encrypted log of record changes made on top of a base vault.
+    The log is bound to the salt of its base vault, so a log left over from
+    before a compaction is recognised as stale and never replayed.
+    """
+
+    def __init__(self, filename, key, vault_salt):
+        self.filename = filename
+        self._key = key if isinstance(key, bytes) else key.encode()
+        self._vault_salt = vault_salt
+        self.ops = []
+        if not self._load(filename) and not self._adopt_compacted():
+            self._create(filename, [])
+
+    def _derive_key(self, log_salt):
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=log_salt, info=b'password_manager change log v1')
+        return AESGCM(hkdf.derive(self._key))
+
+    def _load(self, filename, repair=True):
+        try:
+            with open(filename, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return False
+        if len(data) < LOG_HEADER.size:
+            return False
+        magic, vault_salt, log_salt = LOG_HEADER.unpack_from(data)
+        if magic != LOG_MAGIC or vault_salt != self._vault_salt:
+            return False
+        self._header = data[:LOG_HEADER.size]
+        self._aead = self._derive_key(log_salt)
+
+        ops = []
+        valid_end = LOG_HEADER.size
+        for end, sealed in _iter_framed(data, LOG_HEADER.size):
+            op, entry_id, entry = json.loads(_open(self._aead, sealed, self._header + OP_NUMBER.pack(len(ops))))
+            ops.append((op, entry_id, entry))
+            valid_end = end
+        if repair and valid_end < len(data):
+            # Операция, запись которой прервалась, не была подтверждена - отбрасываем её
+            os.truncate(filename, valid_end)
+        self.ops = ops
+        return True
+
+    def _adopt_compacted(self):
+        """
+        Finishes a compaction that crashed after swapping in the new vault but
+        before moving its log into place
+        """
+        pending = self.filename + COMPACT_SUFFIX
+        if not self._load(pending):
+            return False
+        os.replace(pending, self.filename)
+        logging.info("Recovered change log from an interrupted compaction.")
+        return True
+
+    def _create(self, filename, ops):
+        log_salt = os.urandom(16)
+        self._header = LOG_HEADER.pack(LOG_MAGIC, self._vault_salt, log_salt)
+        self._aead = self._derive_key(log_salt)
+        with open(filename, 'wb') as file:
+            file.write(self._header)
+            for number, op in enumerate(ops):
+                sealed = self._seal_op(number, op)
+                file.write(RECORD_LENGTH.pack(len(sealed)) + sealed)
+            file.flush()
+            os.fsync(file.fileno())
+        self.ops = list(ops)
+
+    def _seal_op(self, number, op):
+        payload = json.dumps(op, ensure_ascii=False, separators=(',', ':')).encode()
+        return _seal(self._aead, payload, self._header + OP_NUMBER.pack(number))
+
+    def append(self, op, entry_id, entry=None):
+        """
+        Durably appends one operation to the log
+        """
+        if op not in (OP_PUT, OP_DELETE):
+            raise VaultError(f"Unknown log operation: {op}")
+        _append_framed(self.filename, self._seal_op(len(self.ops), (op, entry_id, entry)), sync=True)
+        self.ops.append((op, entry_id, entry))
+
+    @classmethod
+    def read(cls, filename, key, vault_salt):
+        """
+        Returns the operations logged for a vault without creating, recovering
+        or repairing any file
+        """
+        log = cls.__new__(cls)
+        log.filename = filename
+        log._key = key if isinstance(key, bytes) else key.encode()
+        log._vault_salt = vault_salt
+        log.ops = []
+        for candidate in (filename, filename + COMPACT_SUFFIX):
+            if log._load(candidate, repair=False):
+                break
+        return log.ops
+
+    @classmethod
+    def write(cls, filename, key, vault_salt, ops):
+        """
+        Writes a fresh log containing ops, replacing whatever is at filename
+        """
+        log = cls.__new__(cls)
+        log.filename = filename
+        log._key = key if isinstance(key, bytes) else key.encode()
+        log._vault_salt = vault_salt
+        log._create(filename, ops)
+        return log
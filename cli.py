@@ -0,0 +1,232 @@
+"""
+Headless command-line interface for scripts and servers without a display.
+
+    python cli.py generate -n 1000 -l 16 > passwords.txt
+    python cli.py generate -n 1000 --pattern 'ul{7}d{2}!s*{4}' > passwords.txt
+    python cli.py encrypt --key decryption_key.key < passwords.txt > encrypted.txt
+    python cli.py decrypt --key decryption_key.key < encrypted.txt
+    python cli.py rekey --key old.key --new-key new.key < encrypted.txt > rotated.txt
+    python cli.py rekey --key old.key --new-key new.key --file passwords.vault
+    python cli.py keygen --passphrase vault.key
+    python cli.py import export.csv --vault passwords.vault --key decryption_key.key
+    python cli.py export passwords.vault --key decryption_key.key -o export.json
+
+Every subcommand reads one item per line from stdin and writes one per line to
+stdout, a chunk at a time, so input of any size runs in bounded memory. Neither
+Qt nor git is imported, and cryptography only for the subcommands that need it.
+"""
+import argparse
+import os
+import sys
+import keyfile
+from password_generator import DEFAULT_CHUNK_SIZE, _iter_chunks, iter_passwords
+
+
+PASSPHRASE_ENV = 'PM_PASSPHRASE'
+
+
+def _passphrase(prompt="Passphrase: "):
+    if PASSPHRASE_ENV in os.environ:
+        return os.environ[PASSPHRASE_ENV]
+    import getpass
+    return getpass.getpass(prompt)
+
+
+def read_key(filename, use_agent=True):
+    """
+    Reads a key file, asking for the passphrase only if the key agent does not hold the key yet
+    """
+    if keyfile.is_passphrase_key_file(filename) and (not use_agent or keyfile.cached_key(filename) is None):
+        return keyfile.load_key(filename, _passphrase(), use_agent=use_agent)
+    return keyfile.load_key(filename, use_agent=use_agent)
+
+
+def _iter_lines(stream):
+    for line in stream:
+        line = line.rstrip(b'\r\n')
+        if line:
+            yield line
+
+
+def _write_chunks(stream, chunks):
+    count = 0
+    for chunk in chunks:
+        stream.write(b'\n'.join(chunk) + b'\n')
+        stream.flush()
+        count += len(chunk)
+    return count
+
+
+def _map_lines(func, key, lines, args):
+    from encryption_utils import _map_chunks
+    return _map_chunks(func, key, _iter_chunks(lines, args.chunk_size), args.workers)
+
+
+# Строки передаются в шифр как есть, без перекодирования в str и обратно
+def _encrypt_lines(key, lines):
+    from cryptography.fernet import Fernet
+    f = Fernet(key)
+    return [f.encrypt(line) for line in lines]
+
+
+def _decrypt_lines(key, tokens):
+    from cryptography.fernet import Fernet
+    f = Fernet(key)
+    return [f.decrypt(token) for token in tokens]
+
+
+def command_generate(args, stdin, stdout):
+    if args.length is None and not args.pattern:
+        raise ValueError("--length is required unless --pattern is given")
+    passwords = iter_passwords(args.count, args.length, include_uppercase=not args.no_uppercase,
+                               include_numbers=not args.no_numbers, include_special=not args.no_special,
+                               exclude_chars=args.exclude, chunk_size=args.chunk_size, pattern=args.pattern)
+    lines = (password.encode() for password in passwords)
+    if args.key is None:
+        return _write_chunks(stdout, _iter_chunks(lines, args.chunk_size))
+    return _write_chunks(stdout, _map_lines(_encrypt_lines, read_key(args.key, not args.no_agent), lines, args))
+
+
+def command_encrypt(args, stdin, stdout):
+    return _write_chunks(stdout, _map_lines(_encrypt_lines, read_key(args.key, not args.no_agent), _iter_lines(stdin), args))
+
+
+def command_decrypt(args, stdin, stdout):
+    return _write_chunks(stdout, _map_lines(_decrypt_lines, read_key(args.key, not args.no_agent), _iter_lines(stdin), args))
+
+
+def command_rekey(args, stdin, stdout):
+    from encryption_utils import _rotate_chunk
+    if not os.path.exists(args.new_key):
+        from cryptography.fernet import Fernet
+        with open(args.new_key, 'wb') as key_file:
+            key_file.write(Fernet.generate_key())
+            # Ключ должен оказаться на диске раньше, чем им зашифруется хоть одна запись
+            key_file.flush()
+            os.fsync(key_file.fileno())
+        print(f"New key written to {args.new_key}", file=sys.stderr)
+    keys = (read_key(args.new_key, not args.no_agent), read_key(args.key, not args.no_agent))
+    if args.file:
+        from rekey import rekey_file
+        rekey_file(args.file, keys[1], keys[0], args.workers, args.chunk_size)
+        return 0
+    return _write_chunks(stdout, _map_lines(_rotate_chunk, keys, _iter_lines(stdin), args))
+
+
+def command_import(args, stdin, stdout):
+    from import_export import import_records
+    key = read_key(args.key, not args.no_agent)
+    count = import_records(args.source, args.vault, key, args.format, workers=args.workers)
+    print(f"{count} records imported into {args.vault}", file=sys.stderr)
+    return 0
+
+
+def command_export(args, stdin, stdout):
+    from import_export import export_records
+    from records import RecordVault
+    with RecordVault(args.vault, read_key(args.key, not args.no_agent)) as vault:
+        export_records(iter(vault), args.output, args.format)
+    return 0
+
+
+def command_keygen(args, stdin, stdout):
+    if args.passphrase:
+        passphrase = _passphrase()
+        if PASSPHRASE_ENV not in os.environ and passphrase != _passphrase("Repeat passphrase: "):
+            raise ValueError("Passphrases do not match")
+        keyfile.create_key_file(args.key_file, passphrase, target_seconds=args.unlock_seconds, force=args.force)
+    else:
+        from cryptography.fernet import Fernet
+        with open(args.key_file, 'wb' if args.force else 'xb') as key_file:
+            key_file.write(Fernet.generate_key())
+    return 0
+
+
+def _positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description="Password manager batch mode")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('-w', '--workers', type=_positive_int, default=None,
+                        help="processes used for encryption (default: number of CPUs)")
+    common.add_argument('--chunk-size', type=_positive_int, default=DEFAULT_CHUNK_SIZE,
+                        help="lines processed per chunk")
+    common.add_argument('--no-agent', action='store_true',
+                        help="neither use nor start the key agent for passphrase-protected keys")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate = subparsers.add_parser('generate', parents=[common], help="print new passwords")
+    generate.add_argument('-n', '--count', type=int, required=True)
+    generate.add_argument('-l', '--length', type=int, help="required unless --pattern is given")
+    generate.add_argument('--no-uppercase', action='store_true')
+    generate.add_argument('--no-numbers', action='store_true')
+    generate.add_argument('--no-special', action='store_true')
+    generate.add_argument('--exclude', default='', help="characters never to use")
+    generate.add_argument('-p', '--pattern', help="password pattern, e.g. 'ul{7}d{2}!s*{4}': l, u, d, s, L, A and * "
+                                                  "are character classes, [abc] a set, {n} a repeat, !c a required "
+                                                  "class, \\c a literal")
+    generate.add_argument('-k', '--key', help="encrypt the passwords with this key file")
+    generate.set_defaults(func=command_generate)
+
+    encrypt = subparsers.add_parser('encrypt', parents=[common], help="encrypt passwords read from stdin")
+    encrypt.add_argument('-k', '--key', required=True, help="key file")
+    encrypt.set_defaults(func=command_encrypt)
+
+    decrypt = subparsers.add_parser('decrypt', parents=[common], help="decrypt tokens read from stdin")
+    decrypt.add_argument('-k', '--key', required=True, help="key file")
+    decrypt.set_defaults(func=command_decrypt)
+
+    rekey = subparsers.add_parser('rekey', parents=[common], help="re-encrypt tokens read from stdin under a new key")
+    rekey.add_argument('-k', '--key', required=True, help="current key file")
+    rekey.add_argument('--new-key', required=True, help="new key file; created if it does not exist")
+    rekey.add_argument('--file', help="re-encrypt this password file or vault in place instead of stdin; "
+                                      "an interrupted run resumes when repeated with the same keys")
+    rekey.set_defaults(func=command_rekey)
+
+    import_ = subparsers.add_parser('import', parents=[common], help="import a CSV or JSON export into a vault")
+    import_.add_argument('source', help="CSV or JSON file exported from a browser or password manager")
+    import_.add_argument('--vault', required=True, help="record vault to create or add to")
+    import_.add_argument('-k', '--key', required=True, help="key file of the vault")
+    import_.add_argument('--format', choices=('csv', 'json'), help="default: from the file extension")
+    import_.set_defaults(func=command_import)
+
+    export = subparsers.add_parser('export', parents=[common], help="export a vault to CSV or JSON")
+    export.add_argument('vault', help="record vault to export")
+    export.add_argument('-k', '--key', required=True, help="key file of the vault")
+    export.add_argument('-o', '--output', required=True, help="CSV or JSON file to write")
+    export.add_argument('--format', choices=('csv', 'json'), help="default: from the file extension")
+    export.set_defaults(func=command_export)
+
+    keygen = subparsers.add_parser('keygen', help="create a key file")
+    keygen.add_argument('key_file')
+    keygen.add_argument('-p', '--passphrase', action='store_true',
+                        help=f"derive the key from a passphrase (read from ${PASSPHRASE_ENV} or the terminal)")
+    keygen.add_argument('--unlock-seconds', type=float, default=keyfile.DEFAULT_UNLOCK_SECONDS,
+                        help="time one unlock may take; the key derivation cost is calibrated to it")
+    keygen.add_argument('-f', '--force', action='store_true', help="overwrite an existing key file")
+    keygen.set_defaults(func=command_keygen)
+    return parser
+
+
+def main(argv=None, stdin=None, stdout=None):
+    args = build_parser().parse_args(argv)
+    stdin = sys.stdin.buffer if stdin is None else stdin
+    stdout = sys.stdout.buffer if stdout is None else stdout
+    try:
+        args.func(args, stdin, stdout)
+    except BrokenPipeError:
+        # Читатель закрыл канал (например, head) - это не ошибка
+        return 0
+    except Exception as e:
+        print(f"{args.command}: {type(e).__name__}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,15 @@
 import logging
-from cryptography.fernet import Fernet
-
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, islice
+from cryptography.fernet import Fernet, MultiFernet
+import metrics
+from password_generator import iter_passwords, DEFAULT_CHUNK_SIZE, _iter_chunks
 
 def generate_key():
     """
@@ -17,48 +24,172 @@ def generate_key():
         logging.error(f"Error generating or saving key: {e}")
     return key
 
+@lru_cache(maxsize=8)
+def _cipher(key):
+    return Fernet(key)
+
 def encrypt_password(password, key):
     """
     Encrypts the given password using the provided key
     """
-    f = Fernet(key)
+    started = time.perf_counter() if metrics.enabled else None
     try:
-        encrypted_password = f.encrypt(password.encode())
-        logging.info("Password encrypted successfully.")
+        encrypted_password = _cipher(key).encrypt(password.encode())
     except Exception as e:
         logging.error(f"Error encrypting password: {e}")
         raise e
+    if started is not None:
+        metrics.record('encrypt', 1, len(encrypted_password), time.perf_counter() - started)
     return encrypted_password
 
 def decrypt_password(encrypted_password, key):
     """
     Decrypts the given password using the provided key
     """
-    f = Fernet(key)
+    started = time.perf_counter() if metrics.enabled else None
     try:
-        decrypted_password = f.decrypt(encrypted_password).decode()
-        logging.info("Password decrypted successfully.")
+        decrypted_password = _cipher(key).decrypt(encrypted_password).decode()
     except Exception as e:
         logging.error(f"Error decrypting password: {e}")
         raise e
+    if started is not None:
+        metrics.record('decrypt', 1, len(encrypted_password), time.perf_counter() - started)
     return decrypted_password
 
-def save_encrypted_passwords(passwords, filename, key):
+def _encrypt_chunk(key, passwords):
+    f = Fernet(key)
+    return [f.encrypt(password.encode()) for password in passwords]
+
+def _decrypt_chunk(key, encrypted_passwords):
+    f = Fernet(key)
+    return [f.decrypt(encrypted_password).decode() for encrypted_password in encrypted_passwords]
+
+def _rotate_chunk(keys, encrypted_passwords):
+    new_key, old_key = keys
+    f = MultiFernet([Fernet(new_key), Fernet(old_key)])
+    return [f.rotate(encrypted_password) for encrypted_password in encrypted_passwords]
+
+def _resolve_workers(workers):
+    # None - по процессу на ядро; публичные функции по умолчанию работают в одном процессе
+    if workers is None:
+        return os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    return workers
+
+def _map_chunks(func, key, chunks, workers):
+    """
+    Applies func(key, chunk) to every chunk and yields the results in input order.
+    With more than one worker the chunks are spread across a process pool while
+    keeping only a bounded number of them in flight. Called from a thread other
+    than the main one, the pool starts its processes with spawn instead of fork.
+    """
+    workers = _resolve_workers(workers)
+    chunks = iter(chunks)
+    head = list(islice(chunks, 2))
+    chunks = chain(head, chunks)
+    if workers == 1 or len(head) < 2:
+        for chunk in chunks:
+            yield func(key, chunk)
+        return
+
+    context = None
+    if threading.current_thread() is not threading.main_thread():
+        # fork копирует процесс с блокировками, захваченными другими потоками
+        context = multiprocessing.get_context('spawn')
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        for chunk in chunks:
+            pending.append(executor.submit(func, key, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def encrypt_passwords(passwords, key, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Encrypts many passwords with a single cipher per chunk, spreading chunks across
+    workers processes. Returns the encrypted passwords in input order.
+    """
     try:
-        with open(filename, 'wb') as file:
-            for password in passwords:
-                encrypted_password = encrypt_password(password, key)
-                file.write(encrypted_password + b'\n')
+        encrypted_passwords = []
+        with metrics.operation('encrypt') as operation:
+            for encrypted_chunk in _map_chunks(_encrypt_chunk, key, _iter_chunks(passwords, chunk_size), workers):
+                encrypted_passwords.extend(encrypted_chunk)
+                operation.add(len(encrypted_chunk), sum(map(len, encrypted_chunk)) if metrics.enabled else 0)
+        logging.debug(f"{len(encrypted_passwords)} passwords encrypted successfully.")
+    except Exception as e:
+        logging.error(f"Error encrypting passwords: {e}")
+        raise e
+    return encrypted_passwords
+
+def decrypt_passwords(encrypted_passwords, key, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decrypts many passwords with a single cipher per chunk, spreading chunks across
+    workers processes. Returns the decrypted passwords in input order.
+    """
+    try:
+        passwords = []
+        with metrics.operation('decrypt') as operation:
+            for chunk in _map_chunks(_decrypt_chunk, key, _iter_chunks(encrypted_passwords, chunk_size), workers):
+                passwords.extend(chunk)
+                operation.add(len(chunk))
+        logging.debug(f"{len(passwords)} passwords decrypted successfully.")
+    except Exception as e:
+        logging.error(f"Error decrypting passwords: {e}")
+        raise e
+    return passwords
+
+def save_encrypted_passwords(passwords, filename, key, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, progress=None):
+    """
+    Encrypts passwords and writes them to filename one chunk at a time.
+    passwords may be any iterable, including a generator, so only a few chunks
+    of plaintexts are held in memory at once. If given, progress is called with
+    the number of passwords written so far after every chunk.
+    """
+    try:
+        written = 0
+        with metrics.operation('file_write') as operation, open(filename, 'wb') as file:
+            chunks = _iter_chunks(passwords, chunk_size)
+            for encrypted_passwords in _map_chunks(_encrypt_chunk, key, chunks, workers):
+                data = b'\n'.join(encrypted_passwords) + b'\n'
+                file.write(data)
+                written += len(encrypted_passwords)
+                operation.add(len(encrypted_passwords), len(data))
+                if progress is not None:
+                    progress(written)
         logging.info("Encrypted passwords saved successfully.")
     except Exception as e:
         logging.error(f"Error saving encrypted passwords: {e}")
         raise e
 
-def read_encrypted_passwords(filename, key):
+def generate_encrypted_passwords(count, length, filename, key, chunk_size=DEFAULT_CHUNK_SIZE, workers=1,
+                                 **options):
+    """
+    Streams freshly generated passwords straight through encryption into filename.
+    Accepts the same options as generate_multiple_passwords; peak memory is bounded
+    by chunk_size rather than count.
+    """
+    passwords = iter_passwords(count, length, chunk_size=chunk_size, **options)
+    save_encrypted_passwords(passwords, filename, key, chunk_size, workers)
+
+def iter_encrypted_passwords(filename, key, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Lazily decrypts a legacy file with one Fernet token per line, chunk_size lines at a time
+    """
+    with open(filename, 'rb') as file:
+        lines = (line.rstrip(b'\r\n') for line in file)
+        chunks = _iter_chunks((line for line in lines if line), chunk_size)
+        for passwords in _map_chunks(_decrypt_chunk, key, chunks, workers):
+            yield from passwords
+
+def read_encrypted_passwords(filename, key, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
     try:
-        with open(filename, 'rb') as file:
-            encrypted_passwords = file.read().splitlines()
-            passwords = [decrypt_password(ep, key) for ep in encrypted_passwords]
+        with metrics.operation('file_read') as operation, open(filename, 'rb') as file:
+            data = file.read()
+            encrypted_passwords = data.splitlines()
+            operation.add(len(encrypted_passwords), len(data))
+        passwords = decrypt_passwords(encrypted_passwords, key, workers, chunk_size)
         logging.info("Encrypted passwords read and decrypted successfully.")
     except Exception as e:
         logging.error(f"Error reading or decrypting passwords: {e}")
@@ -0,0 +1,323 @@
+import csv
+import io
+import json
+import logging
+import os
+from itertools import chain
+from records import Record, RecordVault, _fsync_directory, _fsync_file, index_path, save_records
+from changelog import log_path
+from vault import DEFAULT_CHUNK_ENTRIES, is_vault_file
+
+# Импорт и экспорт учётных данных в CSV и JSON. Файлы читаются построчно
+# (JSON - по одному объекту), записи сразу уходят в хранилище порциями,
+# поэтому расход памяти не зависит от размера выгрузки.
+FORMATS = ('csv', 'json')
+IMPORT_SUFFIX = '.import'
+READ_SIZE = 1 << 16
+EXPORT_FIELDS = ('service', 'username', 'password', 'metadata')
+
+# Названия столбцов в выгрузках браузеров и менеджеров паролей (после casefold)
+SERVICE_FIELDS = ('service', 'name', 'title', 'account')
+URL_FIELDS = ('url', 'login_uri', 'uri', 'origin', 'web site', 'website', 'hostname')
+USERNAME_FIELDS = ('username', 'login_username', 'login name', 'login', 'user', 'email')
+PASSWORD_FIELDS = ('password', 'login_password')
+# Ключи JSON-объекта, под которыми выгрузки хранят список записей
+JSON_ITEM_KEYS = ('items', 'entries', 'logins', 'passwords', 'records')
+# Списки объектов, из которых берётся первый элемент. Остальные списки, например
+# история паролей и пользовательские поля Bitwarden, остаются только метаданными
+LIFTED_LISTS = ('uris', 'urls')
+EXPORT_SUFFIX = '.export'
+
+
+def detect_format(filename):
+    extension = os.path.splitext(filename)[1].lower().lstrip('.')
+    if extension in ('json', 'jsonl'):
+        return 'json'
+    if extension == 'csv':
+        return 'csv'
+    raise ValueError(f"Cannot tell the format of {filename}; use .csv or .json")
+
+
+def _flatten(mapping):
+    """
+    Lowercases the keys of mapping and lifts the fields of nested objects,
+    such as "login" in Bitwarden exports, to the top level. Fields of the
+    object itself take priority over nested ones.
+    """
+    flat = {}
+    nested = []
+    for name, value in mapping.items():
+        name = str(name).strip().casefold()
+        if isinstance(value, dict):
+            nested.append(value)
+        elif (name in LIFTED_LISTS and isinstance(value, list) and value
+              and all(isinstance(item, dict) for item in value)):
+            # Например, список адресов: берётся первый
+            nested.append(value[0])
+        else:
+            flat.setdefault(name, value)
+    for value in nested:
+        for nested_name, nested_value in _flatten(value).items():
+            flat.setdefault(nested_name, nested_value)
+    return flat
+
+
+def _first(fields, names):
+    for name in names:
+        value = fields.pop(name, None)
+        if value not in (None, ''):
+            return str(value)
+    return ''
+
+
+def record_from_mapping(mapping):
+    """
+    Converts one row or object of an export into a Record, or None if it has no password.
+    Fields that are not service, username or password are kept as metadata.
+    """
+    mapping = dict(mapping)
+    metadata = None
+    for name in list(mapping):
+        if str(name).strip().casefold() == 'metadata':
+            metadata = mapping.pop(name)
+    fields = _flatten(mapping)
+    if isinstance(metadata, str) and metadata:
+        try:
+            decoded = json.loads(metadata)
+        except ValueError:
+            decoded = None
+        if isinstance(decoded, dict):
+            metadata = decoded
+    if metadata is not None and not isinstance(metadata, dict):
+        # Свободный текст из столбца metadata сохраняется как обычное поле
+        fields['metadata'] = metadata if isinstance(metadata, str) else json.dumps(metadata, ensure_ascii=False)
+        metadata = None
+    password = _first(fields, PASSWORD_FIELDS)
+    if not password:
+        return None
+    service = _first(fields, SERVICE_FIELDS)
+    url = _first(fields, URL_FIELDS)
+    username = _first(fields, USERNAME_FIELDS)
+    if not service:
+        service = url
+    elif url:
+        fields['url'] = url
+    extra = {name: value for name, value in fields.items() if value not in (None, '', [], {})}
+    if extra:
+        metadata = {**extra, **metadata} if isinstance(metadata, dict) else extra
+    return Record(service, username, password, metadata)
+
+
+def _iter_csv(file):
+    yield from csv.DictReader(file)
+
+
+def _iter_json(file):
+    """
+    Yields the objects of a JSON array, a JSON object holding an array of
+    items, or JSON Lines, decoding one object at a time
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        data = file.read(READ_SIZE)
+        eof = not data
+        buffer = buffer[position:] + data
+        position = 0
+        return not eof
+
+    def skip(characters):
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in characters:
+                position += 1
+            if position < len(buffer) or not fill():
+                return buffer[position:position + 1]
+
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+                # Число на границе блока могло быть прочитано не целиком
+                if end < len(buffer) or eof:
+                    position = end
+                    return value
+            except ValueError:
+                if eof:
+                    raise
+            fill()
+
+    def iter_array():
+        # Открывающая скобка уже прочитана
+        while skip(' \t\r\n,') not in ('', ']'):
+            yield decode()
+        if skip(' \t\r\n') == '':
+            raise ValueError("Unterminated JSON array")
+        nonlocal position
+        position += 1
+
+    first = skip(' \t\r\n\ufeff')
+    if first == '[':
+        position += 1
+        yield from iter_array()
+    elif first == '{':
+        # Объект выгрузки или JSON Lines: разбираем объект по ключам
+        position += 1
+        items_found = False
+        while True:
+            symbol = skip(' \t\r\n,')
+            if symbol == '}':
+                position += 1
+                break
+            if symbol == '':
+                raise ValueError("Unterminated JSON object")
+            name = decode()
+            skip(' \t\r\n:')
+            if skip(' \t\r\n') == '[' and str(name).casefold() in JSON_ITEM_KEYS:
+                position += 1
+                items_found = True
+                yield from iter_array()
+            else:
+                decode()
+        if not items_found:
+            # Первая строка JSON Lines - обычная запись, разбираем файл заново
+            file.seek(0)
+            buffer, position, eof = '', 0, False
+            while skip(' \t\r\n\ufeff') == '{':
+                yield decode()
+    elif first != '':
+        raise ValueError("JSON export must be an array or an object")
+
+
+def _open_source(filename):
+    raw = open(filename, 'rb')
+    return raw, io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+
+
+def iter_import_records(filename, fmt=None, progress=None):
+    """
+    Yields records parsed from a CSV or JSON export one row at a time.
+    progress, if given, is called with (bytes read, file size).
+    """
+    fmt = fmt or detect_format(filename)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    total = os.path.getsize(filename)
+    raw, text = _open_source(filename)
+    with text:
+        rows = _iter_csv(text) if fmt == 'csv' else _iter_json(text)
+        for count, row in enumerate(rows, 1):
+            if not isinstance(row, dict):
+                raise ValueError(f"Entry {count} is not an object")
+            record = record_from_mapping(row)
+            if record is not None:
+                yield record
+            if progress is not None and count % DEFAULT_CHUNK_ENTRIES == 0:
+                progress(raw.tell(), total)
+    if progress is not None:
+        progress(total, total)
+
+
+def import_records(source, vault_filename, key, fmt=None, existing=None, workers=1, progress=None):
+    """
+    Imports a CSV or JSON export into a record vault. The vault is written to
+    a temporary file chunk by chunk as the export is parsed, then swapped in.
+    Records of a vault already at vault_filename (including its pending
+    changes) and the iterable existing come first. Returns the number of
+    imported records.
+    """
+    temporary = vault_filename + IMPORT_SUFFIX
+    imported = 0
+
+    def imported_records():
+        nonlocal imported
+        for record in iter_import_records(source, fmt, progress):
+            imported += 1
+            yield record
+
+    if os.path.exists(vault_filename) and not is_vault_file(vault_filename):
+        raise ValueError(f"{vault_filename} exists and is not a vault")
+    try:
+        current = None
+        if os.path.exists(vault_filename):
+            current = RecordVault(vault_filename, key)
+        try:
+            records = chain(current if current is not None else (), existing or (), imported_records())
+            save_records(records, temporary, key, workers=workers)
+        finally:
+            if current is not None:
+                current.close()
+        _fsync_file(temporary)
+        _fsync_file(index_path(temporary))
+        os.replace(temporary, vault_filename)
+        os.replace(index_path(temporary), index_path(vault_filename))
+        # Журнал изменений уже учтён в новом хранилище
+        if os.path.exists(log_path(vault_filename)):
+            os.remove(log_path(vault_filename))
+        _fsync_directory(vault_filename)
+        logging.info(f"{imported} records imported successfully.")
+    except Exception as e:
+        for filename in (temporary, index_path(temporary)):
+            if os.path.exists(filename):
+                os.remove(filename)
+        logging.error(f"Error importing records: {e}")
+        raise e
+    return imported
+
+
+def _export_row(record):
+    metadata = '' if record.metadata is None else json.dumps(record.metadata, ensure_ascii=False)
+    return record.service, record.username, record.password, metadata
+
+
+def export_records(records, filename, fmt=None, total=None, progress=None):
+    """
+    Writes records to a CSV or JSON file one at a time and returns their number.
+    The export is readable only by the owner and written to a temporary file
+    that replaces filename once complete.
+    progress, if given, is called with (records written, total) every chunk.
+    """
+    fmt = fmt or detect_format(filename)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    temporary = filename + EXPORT_SUFFIX
+    count = 0
+    try:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        # Выгрузка содержит пароли открытым текстом
+        descriptor = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'w', encoding='utf-8', newline='') as file:
+            if fmt == 'csv':
+                writer = csv.writer(file)
+                writer.writerow(EXPORT_FIELDS)
+            else:
+                file.write('[')
+            for count, record in enumerate(records, 1):
+                if fmt == 'csv':
+                    writer.writerow(_export_row(record))
+                else:
+                    file.write(',\n' if count > 1 else '\n')
+                    file.write(json.dumps(dict(zip(EXPORT_FIELDS, record)), ensure_ascii=False))
+                if progress is not None and count % DEFAULT_CHUNK_ENTRIES == 0:
+                    progress(count, total or count)
+            if fmt == 'json':
+                file.write('\n]\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, filename)
+        _fsync_directory(filename)
+        if progress is not None:
+            progress(count, total or count)
+        logging.info(f"{count} records exported successfully.")
+    except Exception as e:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        logging.error(f"Error exporting records: {e}")
+        raise e
+    return count
@@ -0,0 +1,220 @@
+import logging
+import os
+import threading
+from password_generator import DEFAULT_CHUNK_SIZE, _iter_chunks, iter_passwords
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobControl:
+    """
+    Handle passed to a long-running job.
+    The job reports progress and partial results through it and checks it
+    between chunks to stop early once cancel() has been called.
+    """
+
+    def __init__(self, on_progress=None, on_partial=None):
+        self._cancelled = threading.Event()
+        self._on_progress = on_progress
+        self._on_partial = on_partial
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def progress(self, done, total):
+        self.check()
+        if self._on_progress is not None:
+            self._on_progress(done, total)
+
+    def partial(self, values):
+        self.check()
+        if self._on_partial is not None:
+            self._on_partial(values)
+
+
+def generate_passwords_job(control, count, length, chunk_size=DEFAULT_CHUNK_SIZE, **options):
+    """
+    Generates passwords chunk by chunk, handing every chunk to control.partial
+    """
+    chunk = []
+    done = 0
+    for password in iter_passwords(count, length, chunk_size=chunk_size, **options):
+        chunk.append(password)
+        if len(chunk) == chunk_size:
+            done += len(chunk)
+            control.partial(chunk)
+            control.progress(done, count)
+            chunk = []
+    if chunk:
+        control.partial(chunk)
+        control.progress(count, count)
+    logging.info("Passwords generated successfully.")
+    return count
+
+
+def save_passwords_job(control, passwords, plain_file_path, encrypted_file_path, key, passphrase=None):
+    """
+    Writes passwords in plain text and/or encrypted form, reporting progress per chunk.
+    With a passphrase, key is ignored: a key is derived from the passphrase and
+    only the derivation parameters are written to the key file.
+    """
+    total = len(passwords) * ((1 if plain_file_path else 0) + (1 if encrypted_file_path else 0))
+    done = 0
+    if plain_file_path:
+        with open(plain_file_path, 'w') as file:
+            for start in range(0, len(passwords), DEFAULT_CHUNK_SIZE):
+                chunk = passwords[start:start + DEFAULT_CHUNK_SIZE]
+                file.write("\n".join(chunk) + "\n")
+                done += len(chunk)
+                control.progress(done, total)
+        logging.info("Plain passwords saved successfully.")
+    if encrypted_file_path:
+        # cryptography загружается только когда действительно нужно шифровать
+        from encryption_utils import save_encrypted_passwords
+
+        if passphrase:
+            from keyfile import create_key_file
+            # Ключ относится к файлу, который перезаписывается вместе с ним
+            key = create_key_file(f"{encrypted_file_path}.key", passphrase, force=True)
+        plain_done = done
+        save_encrypted_passwords(passwords, encrypted_file_path, key,
+                                 progress=lambda written: control.progress(plain_done + written, total))
+        if not passphrase:
+            with open(f"{encrypted_file_path}.key", 'wb') as key_file:
+                key_file.write(key)
+        logging.info("Encrypted passwords and key saved successfully.")
+    return len(passwords)
+
+
+def open_with_key_job(control, function, filename, load_key):
+    """
+    Loads the key with load_key(), which may have to derive it from a
+    passphrase, and returns (key, function(filename, key))
+    """
+    key = load_key()
+    control.check()
+    return key, function(filename, key)
+
+
+def rekey_job(control, filename, load_key, new_key_file, passphrase=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Re-encrypts filename in place under a new key saved to new_key_file,
+    reporting progress per chunk. The new key is on disk before any entry is
+    encrypted with it; if new_key_file already exists, its key is reused, so
+    an interrupted or cancelled rotation resumes where it stopped.
+    """
+    import keyfile
+    from rekey import rekey_file
+
+    old_key = load_key()
+    control.check()
+    if os.path.exists(new_key_file):
+        new_key = keyfile.load_key(new_key_file, passphrase)
+    elif passphrase:
+        new_key = keyfile.create_key_file(new_key_file, passphrase)
+    else:
+        from cryptography.fernet import Fernet
+        # Новый ключ пишется только в new_key_file: старый может лежать в decryption_key.key
+        new_key = Fernet.generate_key()
+        with open(new_key_file, 'xb') as key_file:
+            key_file.write(new_key)
+            key_file.flush()
+            os.fsync(key_file.fileno())
+    return rekey_file(filename, old_key, new_key, chunk_size=chunk_size, progress=control.progress)
+
+
+def import_records_job(control, source, vault_filename, key, existing=None, key_file=None):
+    """
+    Imports a CSV or JSON export into the record vault at vault_filename,
+    reporting progress as bytes of the export read. With key_file, key is a
+    new key that is written there before anything is encrypted with it;
+    FileExistsError is raised if key_file already exists.
+    """
+    from import_export import import_records
+
+    if key_file:
+        # Существующий файл ключа не перезаписывается
+        with open(key_file, 'xb') as file:
+            file.write(key)
+            file.flush()
+            os.fsync(file.fileno())
+    return import_records(source, vault_filename, key, existing=existing, progress=control.progress)
+
+
+def export_records_job(control, records, total, filename):
+    """
+    Writes records to a CSV or JSON file, reporting progress per chunk
+    """
+    from import_export import export_records
+
+    return export_records(records, filename, total=total, progress=control.progress)
+
+
+def save_records_job(control, records, total, filename, key, vault=None):
+    """
+    Writes records to a record vault at filename, reporting progress per chunk.
+    If filename is the open vault, its change log is compacted instead.
+    """
+    from records import save_records
+
+    if vault is not None and os.path.abspath(filename) == os.path.abspath(vault.filename):
+        # Сохранение поверх открытого хранилища - это уплотнение его журнала
+        vault.compact()
+        return filename
+
+    def counted():
+        for done, record in enumerate(records, 1):
+            yield record
+            if done % DEFAULT_CHUNK_SIZE == 0:
+                control.progress(done, total)
+
+    save_records(counted(), filename, key)
+    control.progress(total, total)
+    return filename
+
+
+def build_search_index_job(control, index, records):
+    """
+    Fills a SearchIndex from records, stopping between chunks when cancelled
+    """
+    index.build(records, control.check)
+    logging.info(f"Search index built for {len(index)} entries.")
+    return index
+
+
+def analyze_passwords_job(control, passwords, total, existing=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Scores total passwords from the iterable passwords and finds repeats among
+    them and in existing, reporting progress per chunk. Returns a PasswordReport.
+    """
+    from strength import PasswordAnalyzer
+
+    analyzer = PasswordAnalyzer(capacity=total)
+    if existing is not None:
+        for chunk in _iter_chunks(existing, chunk_size):
+            analyzer.add_existing(chunk)
+            control.check()
+    done = 0
+    for chunk in _iter_chunks(passwords, chunk_size):
+        analyzer.analyze(chunk)
+        done += len(chunk)
+        control.progress(done, total)
+    return analyzer.report()
+
+
+def call_job(control, function, *args, **kwargs):
+    """
+    Runs a function that does not report progress as a job
+    """
+    control.check()
+    return function(*args, **kwargs)
@@ -0,0 +1,210 @@
+"""
+Local key agent: keeps keys derived from passphrases in memory for a while,
+so the GUI and the CLI do not repeat the expensive derivation on every unlock.
+
+The agent listens on a Unix socket that only its owner can reach and answers
+one JSON request per connection:
+
+    {"op": "get", "id": ...}                 -> {"key": ... or null}
+    {"op": "put", "id": ..., "key": ...}     -> {"ok": true}
+    {"op": "forget"}                         -> {"ok": true}
+    {"op": "stop"}                           -> {"ok": true}
+
+Keys expire after the TTL. Once it holds no keys and has been idle for a TTL,
+the agent exits on its own. It is started on demand by put_key.
+
+    python key_agent.py [--socket PATH] [--ttl SECONDS]
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import struct
+import subprocess
+import sys
+import time
+
+DEFAULT_TTL = 15 * 60
+SOCKET_ENV = 'PM_AGENT_SOCKET'
+DEFAULT_SOCKET = os.path.join(os.path.expanduser('~'), '.password_manager', 'agent.sock')
+CLIENT_TIMEOUT = 1
+START_TIMEOUT = 3
+MAX_REQUEST_SIZE = 64 * 1024
+
+
+def socket_path():
+    return os.environ.get(SOCKET_ENV, DEFAULT_SOCKET)
+
+
+def is_supported():
+    return hasattr(socket, 'AF_UNIX')
+
+
+def _recv_line(connection):
+    data = b''
+    while not data.endswith(b'\n') and len(data) < MAX_REQUEST_SIZE:
+        chunk = connection.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class KeyAgent:
+    """
+    Serves keys from memory over a Unix socket until it has been idle and empty for ttl seconds
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        self.path = path or socket_path()
+        self.ttl = ttl
+        self._keys = {}
+        self._last_request = time.monotonic()
+        self._stopped = False
+
+    def _purge(self):
+        now = time.monotonic()
+        for key_id in [key_id for key_id, (_, expires) in self._keys.items() if expires <= now]:
+            del self._keys[key_id]
+
+    def handle(self, request):
+        self._purge()
+        self._last_request = time.monotonic()
+        op = request.get('op')
+        if op == 'get':
+            entry = self._keys.get(request.get('id'))
+            return {'key': entry[0] if entry else None}
+        if op == 'put':
+            self._keys[request['id']] = (request['key'], time.monotonic() + self.ttl)
+            return {'ok': True}
+        if op == 'forget':
+            self._keys.clear()
+            return {'ok': True}
+        if op == 'stop':
+            self._stopped = True
+            return {'ok': True}
+        return {'error': f"unknown op {op!r}"}
+
+    def _bind(self):
+        os.makedirs(os.path.dirname(self.path) or '.', mode=0o700, exist_ok=True)
+        if os.path.exists(self.path):
+            if _request({'op': 'get', 'id': None}, self.path) is not None:
+                raise RuntimeError(f"Key agent already running on {self.path}")
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # Сокет создаётся сразу с правами только для владельца
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen()
+        server.settimeout(1)
+        return server
+
+    def _peer_allowed(self, connection):
+        if not hasattr(socket, 'SO_PEERCRED'):
+            return True
+        credentials = connection.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', credentials)
+        return uid == os.getuid()
+
+    def serve(self):
+        server = self._bind()
+        logging.info(f"Key agent listening on {self.path}")
+        try:
+            while not self._stopped:
+                self._purge()
+                if not self._keys and time.monotonic() - self._last_request > self.ttl:
+                    break
+                try:
+                    connection, _ = server.accept()
+                except socket.timeout:
+                    continue
+                with connection:
+                    connection.settimeout(CLIENT_TIMEOUT)
+                    try:
+                        if not self._peer_allowed(connection):
+                            continue
+                        response = self.handle(json.loads(_recv_line(connection)))
+                        connection.sendall(json.dumps(response).encode() + b'\n')
+                    except (OSError, ValueError, KeyError) as e:
+                        logging.error(f"Error serving key agent request: {e}")
+        finally:
+            server.close()
+            self._keys.clear()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def stop(self):
+        self._stopped = True
+
+
+def _request(message, path=None):
+    """
+    Sends one request to the agent; returns the response or None if no agent is running
+    """
+    if not is_supported():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(CLIENT_TIMEOUT)
+            connection.connect(path or socket_path())
+            connection.sendall(json.dumps(message).encode() + b'\n')
+            return json.loads(_recv_line(connection))
+    except (OSError, ValueError):
+        return None
+
+
+def start_agent(path=None, ttl=DEFAULT_TTL):
+    """
+    Starts a detached agent process and waits until it accepts connections
+    """
+    path = path or socket_path()
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), '--socket', path, '--ttl', str(ttl)],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if _request({'op': 'get', 'id': None}, path) is not None:
+            return True
+        time.sleep(0.05)
+    logging.error("Key agent did not start in time.")
+    return False
+
+
+def get_key(key_id, path=None):
+    response = _request({'op': 'get', 'id': key_id}, path)
+    if response is None or response.get('key') is None:
+        return None
+    return response['key'].encode()
+
+
+def put_key(key_id, key, path=None, start=True):
+    """
+    Hands a derived key to the agent, starting the agent if it is not running yet
+    """
+    message = {'op': 'put', 'id': key_id, 'key': key.decode()}
+    if _request(message, path) is not None:
+        return True
+    if start and is_supported() and start_agent(path):
+        return _request(message, path) is not None
+    return False
+
+
+def forget_keys(path=None):
+    return _request({'op': 'forget'}, path) is not None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Password manager key agent")
+    parser.add_argument('--socket', default=socket_path())
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL, help="seconds a key is kept")
+    args = parser.parse_args(argv)
+    KeyAgent(args.socket, args.ttl).serve()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from collections import namedtuple
+
+# Файл ключа бывает двух видов:
+#   - сырой ключ Fernet (как его пишет generate_key);
+#   - KDF_MAGIC + JSON с параметрами scrypt и солью. Сам ключ в файле не хранится,
+#     он каждый раз выводится из парольной фразы.
+KDF_MAGIC = b'PMKDF1\n'
+SCRYPT_R = 8
+SCRYPT_P = 1
+# scrypt использует 128 * r * n байт памяти: 16 МиБ при MIN_SCRYPT_N, 1 ГиБ при MAX_SCRYPT_N
+MIN_SCRYPT_N = 1 << 14
+MAX_SCRYPT_N = 1 << 20
+DEFAULT_UNLOCK_SECONDS = 0.5
+CALIBRATION_FILE = os.path.join(os.path.expanduser('~'), '.password_manager', 'kdf_calibration.json')
+
+KdfParams = namedtuple('KdfParams', ['n', 'r', 'p', 'salt'])
+
+
+class KeyFileError(Exception):
+    pass
+
+
+def derive_key(passphrase, params):
+    """
+    Derives a Fernet key from passphrase with scrypt
+    """
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+    kdf = Scrypt(salt=params.salt, length=32, n=params.n, r=params.r, p=params.p)
+    return base64.urlsafe_b64encode(kdf.derive(passphrase.encode()))
+
+
+def _check_value(key):
+    return hmac.new(key, b'password_manager key check', hashlib.sha256).hexdigest()[:16]
+
+
+def calibrate(target_seconds=DEFAULT_UNLOCK_SECONDS, r=SCRYPT_R, p=SCRYPT_P, max_n=MAX_SCRYPT_N):
+    """
+    Picks the largest power-of-two scrypt cost n whose derivation on this
+    machine stays within target_seconds. Time grows linearly with n, so a
+    single derivation at MIN_SCRYPT_N is enough to extrapolate.
+    """
+    params = KdfParams(MIN_SCRYPT_N, r, p, os.urandom(16))
+    started = time.perf_counter()
+    derive_key('calibration', params)
+    elapsed = max(time.perf_counter() - started, 1e-6)
+    n = MIN_SCRYPT_N
+    while n < max_n and elapsed * 2 <= target_seconds:
+        n *= 2
+        elapsed *= 2
+    logging.info(f"Calibrated scrypt cost n={n} for a {target_seconds:.2f} s unlock.")
+    return n
+
+
+def calibrated_cost(target_seconds=DEFAULT_UNLOCK_SECONDS, calibration_file=CALIBRATION_FILE):
+    """
+    Returns the scrypt cost for target_seconds, calibrating once per machine
+    and target and remembering the result in calibration_file
+    """
+    try:
+        with open(calibration_file) as file:
+            costs = json.load(file)
+    except (OSError, ValueError):
+        costs = {}
+    target = f"{target_seconds:g}"
+    if target not in costs:
+        costs[target] = calibrate(target_seconds)
+        try:
+            os.makedirs(os.path.dirname(calibration_file), exist_ok=True)
+            with open(calibration_file, 'w') as file:
+                json.dump(costs, file)
+        except OSError as e:
+            logging.error(f"Error saving KDF calibration: {e}")
+    return costs[target]
+
+
+def create_key_file(filename, passphrase, n=None, target_seconds=DEFAULT_UNLOCK_SECONDS, force=False):
+    """
+    Writes a passphrase-protected key file and returns the derived key.
+    Without an explicit cost n, it is calibrated to target_seconds.
+    An existing file is only replaced with force; otherwise FileExistsError is raised.
+    """
+    if not passphrase:
+        raise KeyFileError("Passphrase must not be empty")
+    if n is None:
+        n = calibrated_cost(target_seconds)
+    params = KdfParams(n, SCRYPT_R, SCRYPT_P, os.urandom(16))
+    key = derive_key(passphrase, params)
+    header = {
+        'kdf': 'scrypt', 'n': params.n, 'r': params.r, 'p': params.p,
+        'salt': base64.b64encode(params.salt).decode(), 'check': _check_value(key),
+    }
+    # Перезапись ключа сделала бы недоступным всё, что им зашифровано
+    with open(filename, 'wb' if force else 'xb') as key_file:
+        key_file.write(KDF_MAGIC + json.dumps(header).encode() + b'\n')
+        key_file.flush()
+        os.fsync(key_file.fileno())
+    logging.info("Passphrase-protected key file saved successfully.")
+    return key
+
+
+def _read_header(data):
+    try:
+        header = json.loads(data[len(KDF_MAGIC):])
+        params = KdfParams(header['n'], header['r'], header['p'], base64.b64decode(header['salt']))
+        return params, header['check']
+    except (ValueError, KeyError) as e:
+        raise KeyFileError(f"Damaged key file: {e}")
+
+
+def is_passphrase_key_file(filename):
+    with open(filename, 'rb') as key_file:
+        return key_file.read(len(KDF_MAGIC)) == KDF_MAGIC
+
+
+def _agent_id(data):
+    # Соль уникальна для каждого файла, так что хэш заголовка однозначно его определяет
+    return hashlib.sha256(data.strip()).hexdigest()
+
+
+def cached_key(filename):
+    """
+    Returns the key for a passphrase key file if the key agent holds it, otherwise None
+    """
+    import key_agent
+    with open(filename, 'rb') as key_file:
+        data = key_file.read()
+    if not data.startswith(KDF_MAGIC):
+        return None
+    return key_agent.get_key(_agent_id(data))
+
+
+def load_key(filename, passphrase=None, use_agent=True):
+    """
+    Returns the Fernet key stored in or derived from filename.
+    Keys derived from a passphrase are handed to the key agent, so later
+    loads, from any process, skip the expensive derivation until the agent's
+    TTL runs out. Raises KeyFileError if a passphrase is needed but missing
+    or wrong.
+    """
+    with open(filename, 'rb') as key_file:
+        data = key_file.read()
+    if not data.startswith(KDF_MAGIC):
+        return data.strip()
+
+    params, check = _read_header(data)
+    if use_agent:
+        import key_agent
+        key = key_agent.get_key(_agent_id(data))
+        if key is not None:
+            return key
+    if passphrase is None:
+        raise KeyFileError("Passphrase required")
+    key = derive_key(passphrase, params)
+    if not hmac.compare_digest(_check_value(key), check):
+        raise KeyFileError("Wrong passphrase")
+    if use_agent:
+        key_agent.put_key(_agent_id(data), key)
+    return key
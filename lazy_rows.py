@@ -0,0 +1,177 @@
+import mmap
+import os
+from array import array
+from collections import OrderedDict
+from cryptography.fernet import Fernet
+from records import RecordReader, RecordVault, record_from_legacy
+from vault import FLAG_RECORDS, VaultReader, is_vault_file
+
+# Строки расшифровываются блоками по DEFAULT_BLOCK_SIZE при первом обращении,
+# в памяти держится не больше DEFAULT_MAX_CACHED_ROWS расшифрованных строк.
+DEFAULT_BLOCK_SIZE = 256
+DEFAULT_MAX_CACHED_ROWS = 20000
+
+
+class LazyRows:
+    """
+    Read-only sequence of rows that are decrypted on demand.
+    fetch(start, stop) must return rows [start, stop). Rows are fetched in
+    aligned blocks and kept in a bounded LRU cache, so memory stays capped no
+    matter how large the underlying file is. Rows assigned with rows[i] = value
+    are pinned and never evicted.
+    """
+
+    def __init__(self, length, fetch, block_size=DEFAULT_BLOCK_SIZE, max_cached_rows=DEFAULT_MAX_CACHED_ROWS,
+                 close=None):
+        self._length = length
+        self._fetch = fetch
+        self._block_size = block_size
+        self._max_blocks = max(1, max_cached_rows // block_size)
+        self._blocks = OrderedDict()
+        self._overrides = {}
+        self._close = close
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._length
+        if not 0 <= row < self._length:
+            raise IndexError("row out of range")
+        if row in self._overrides:
+            return self._overrides[row]
+        block_number, offset = divmod(row, self._block_size)
+        block = self._blocks.get(block_number)
+        if block is None:
+            start = block_number * self._block_size
+            block = self._fetch(start, min(start + self._block_size, self._length))
+            self._blocks[block_number] = block
+            if len(self._blocks) > self._max_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(block_number)
+        return block[offset]
+
+    def __setitem__(self, row, value):
+        self[row]  # проверка диапазона
+        self._overrides[row] = value
+
+    def __iter__(self):
+        # Последовательный обход идёт большими блоками мимо кэша
+        step = self._block_size * 16
+        for start in range(0, self._length, step):
+            rows = self._fetch(start, min(start + step, self._length))
+            for row, value in enumerate(rows, start):
+                yield self._overrides.get(row, value)
+
+    @property
+    def cached_rows(self):
+        return sum(len(block) for block in self._blocks.values())
+
+    def invalidate(self, row=None):
+        """
+        Drops cached rows so they are fetched again; all of them if row is None
+        """
+        if row is None:
+            self._blocks.clear()
+        else:
+            self._blocks.pop(row // self._block_size, None)
+
+    def close(self):
+        self._blocks.clear()
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+class LegacyLines:
+    """
+    Random access to a legacy file with one Fernet token per line.
+    Opening scans the memory-mapped file for line breaks once, without
+    decrypting anything; tokens are decrypted only when their rows are read.
+    """
+
+    def __init__(self, filename, key):
+        self._file = open(filename, 'rb')
+        self._fernet = Fernet(key)
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._starts = array('Q')
+        self._ends = array('Q')
+        position = 0
+        while position < size:
+            end = self._mmap.find(b'\n', position)
+            if end == -1:
+                end = size
+            line_end = end - 1 if end > position and self._mmap[end - 1] == 0x0d else end
+            if line_end > position:
+                self._starts.append(position)
+                self._ends.append(line_end)
+            position = end + 1
+
+    def __len__(self):
+        return len(self._starts)
+
+    def read_range(self, start, stop):
+        return [self._fernet.decrypt(self._mmap[self._starts[i]:self._ends[i]]).decode() for i in range(start, stop)]
+
+    def close(self):
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+
+def _rows_from(source, convert=None):
+    if convert is None:
+        fetch = source.read_range
+    else:
+        def fetch(start, stop):
+            return [convert(value) for value in source.read_range(start, stop)]
+    return LazyRows(len(source), fetch, close=source.close)
+
+
+def record_text(record):
+    if record.service:
+        return f"{record.password} - {record.service}"
+    return record.password
+
+
+def open_record_rows(vault):
+    """
+    Lazy rows of records for an open RecordVault; the caller keeps owning the vault
+    """
+    return LazyRows(len(vault), vault.read_range)
+
+
+def open_legacy_record_rows(filename, key):
+    """
+    Lazy rows of records for a legacy file of "password - service" lines
+    """
+    return _rows_from(LegacyLines(filename, key), record_from_legacy)
+
+
+def open_text_rows(filename, key):
+    """
+    Lazy display rows for any supported file: legacy lines, binary vaults and record vaults
+    """
+    if not is_vault_file(filename):
+        return _rows_from(LegacyLines(filename, key))
+    reader = VaultReader(filename, key)
+    if not reader.flags & FLAG_RECORDS:
+        return _rows_from(reader)
+    reader.close()
+    # Только для просмотра: индекс сервисов не нужен, файлы рядом с хранилищем не создаются
+    return _rows_from(RecordReader(filename, key), record_text)
+
+
+def open_edit_rows(filename, key):
+    """
+    Opens a file for editing and returns (vault, rows).
+    vault is the RecordVault that changes should be written to, or None for
+    legacy files, whose edits are only kept in rows.
+    """
+    if is_vault_file(filename):
+        vault = RecordVault(filename, key)
+        return vault, open_record_rows(vault)
+    return None, open_legacy_record_rows(filename, key)
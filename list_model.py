@@ -0,0 +1,75 @@
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt
+
+
+class LazyListModel(QAbstractListModel):
+    """
+    List model over a LazyRows sequence for use with QListView.
+    The view only asks for the rows it shows, so rows are decrypted as they
+    scroll into view and opening a vault does not depend on its size.
+    """
+
+    def __init__(self, parent=None, display=str):
+        super().__init__(parent)
+        self._rows = []
+        self._display = display
+        self._visible = None
+
+    @property
+    def rows(self):
+        return self._rows
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        if hasattr(self._rows, 'close'):
+            self._rows.close()
+        self._rows = rows
+        self._visible = None
+        self.endResetModel()
+
+    def clear(self):
+        self.set_rows([])
+
+    def set_filter(self, rows):
+        """
+        Shows only the given rows, in the given order; None shows all rows again
+        """
+        self.beginResetModel()
+        self._visible = None if rows is None else list(rows)
+        self.endResetModel()
+
+    def source_row(self, view_row):
+        """
+        Maps a row of the view to a row of rows, taking the filter into account
+        """
+        if self._visible is None or view_row < 0:
+            return view_row
+        return self._visible[view_row]
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows) if self._visible is None else len(self._visible)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        return self._display(self._rows[self.source_row(index.row())])
+
+    def row_changed(self, row):
+        if self._visible is not None:
+            if row not in self._visible:
+                return
+            row = self._visible.index(row)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def append_rows(self, values):
+        """
+        Appends values to a model backed by a plain list
+        """
+        if not values:
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(values) - 1)
+        self._rows.extend(values)
+        self.endInsertRows()
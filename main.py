@@ -1,42 +1,42 @@
+from startup import StartupTimer, lazy_import
+
+startup_timer = StartupTimer()
+
 import gettext
 import locale
 import os
 import sys
 import logging
+from functools import partial
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
-                             QListWidget, QCheckBox, QFileDialog, QMessageBox, QTabWidget)
-import pyperclip  # Для копирования в буфер обмена
-from password_generator import generate_multiple_passwords
-from encryption_utils import generate_key, save_encrypted_passwords, read_encrypted_passwords
-import git
+                             QListView, QCheckBox, QFileDialog, QMessageBox, QTabWidget, QProgressBar,
+                             QInputDialog)
+from PyQt5.QtCore import QThreadPool, QTimer
+import keyfile
+from jobs import (call_job, analyze_passwords_job, build_search_index_job, export_records_job,
+                  generate_passwords_job, import_records_job, open_with_key_job, rekey_job, save_passwords_job,
+                  save_records_job)
+from list_model import LazyListModel
+from workers import Worker
+
+# Тяжёлые модули загружаются при первом обращении, а не при запуске
+pyperclip = lazy_import('pyperclip')  # Для копирования в буфер обмена
+encryption_utils = lazy_import('encryption_utils')
+password_generator = lazy_import('password_generator')
+lazy_rows = lazy_import('lazy_rows')
+records = lazy_import('records')
+updater = lazy_import('updater')
+search_index = lazy_import('search_index')
+strength = lazy_import('strength')
+
+startup_timer.mark('imports')
+
+# После стольких изменений в журнале хранилище уплотняется в фоне
+COMPACT_AFTER_CHANGES = 1000
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Автообновление через GitHub
-def update_from_github(repo_path):
-    if not os.path.exists(repo_path):
-        logging.error(f"Путь к репозиторию {repo_path} не существует.")
-        return False
-
-    try:
-        repo = git.Repo(repo_path)
-        origin = repo.remotes.origin
-        # Получаем информацию о удаленном репозитории
-        fetch_info = origin.fetch()
-        # Проверяем, есть ли изменения
-        if fetch_info:
-            origin.pull()
-            logging.info("Есть новая версия, обновляемся...")
-            print("Есть новая версия, обновляемся...")
-        else:
-            logging.info("Обновлений нет, все стабильно :)")
-            print("Обновлений нет, все стабильно :)")
-        return True
-    except Exception as e:
-        logging.error(f"Ошибка обновления репозитория: {e}")
-        return False
-
 # Настройка многоязычной поддержки
 def setup_translation():
     current_locale = locale.getlocale()[0]
@@ -53,6 +53,11 @@ _ = setup_translation()
 class PasswordManagerApp(QWidget):
     def __init__(self):
         super().__init__()
+        self.edit_vault = None
+        self.edit_search = None
+        self.search_worker = None
+        self.compact_worker = None
+        self.current_worker = None
         self.initUI()
 
     def initUI(self):
@@ -76,6 +81,17 @@ class PasswordManagerApp(QWidget):
         self.create_edit_tab()
 
         layout.addWidget(self.tabs)
+
+        # Общий индикатор выполнения фоновых операций
+        job_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        self.cancel_button = QPushButton(_('Cancel'))
+        self.cancel_button.setVisible(False)
+        self.cancel_button.clicked.connect(self.cancel_job)
+        job_layout.addWidget(self.progress_bar)
+        job_layout.addWidget(self.cancel_button)
+        layout.addLayout(job_layout)
         self.setLayout(layout)
 
     def create_generate_tab(self):
@@ -93,9 +109,20 @@ class PasswordManagerApp(QWidget):
         self.include_special.setChecked(True)
         self.exclude_chars_label = QLabel(_('Exclude characters:'))
         self.exclude_chars_input = QLineEdit('')
+        self.pattern_label = QLabel(_('Pattern (optional, overrides length):'))
+        self.pattern_input = QLineEdit('')
+        self.pattern_input.setPlaceholderText('ul{7}d{2}!s*{4}')
+        self.pattern_input.setToolTip(_('l, u, d, s: lowercase, uppercase, digit, special; L: letter; '
+                                        'A: letter or digit; *: any selected character; [abc]: one of a, b, c; '
+                                        '{n}: repeat n times; !d: at least one digit; \\x: the character x'))
         self.generate_button = QPushButton(_('Generate passwords'))
         self.generate_button.clicked.connect(self.generate_passwords)
-        self.password_list = QListWidget()
+        self.password_list = self.create_lazy_list_view()
+        self.check_generated_button = QPushButton(_('Check strength and duplicates'))
+        self.check_generated_button.clicked.connect(self.check_generated_passwords)
+        self.generated_report_label = QLabel('')
+        self.generated_report_label.setWordWrap(True)
+        self.protect_key = QCheckBox(_('Protect key with a passphrase'))
         self.save_button = QPushButton(_('Save passwords'))
         self.save_button.clicked.connect(self.save_passwords)
 
@@ -108,8 +135,13 @@ class PasswordManagerApp(QWidget):
         layout.addWidget(self.include_special)
         layout.addWidget(self.exclude_chars_label)
         layout.addWidget(self.exclude_chars_input)
+        layout.addWidget(self.pattern_label)
+        layout.addWidget(self.pattern_input)
         layout.addWidget(self.generate_button)
         layout.addWidget(self.password_list)
+        layout.addWidget(self.check_generated_button)
+        layout.addWidget(self.generated_report_label)
+        layout.addWidget(self.protect_key)
         layout.addWidget(self.save_button)
 
         self.generate_tab.setLayout(layout)
@@ -137,7 +169,7 @@ class PasswordManagerApp(QWidget):
 
         self.decrypt_button = QPushButton(_('Decrypt passwords'))
         self.decrypt_button.clicked.connect(self.decrypt_passwords)
-        self.decrypted_password_list = QListWidget()
+        self.decrypted_password_list = self.create_lazy_list_view()
 
         layout.addLayout(input_layout)
         layout.addLayout(key_layout)
@@ -169,139 +201,345 @@ class PasswordManagerApp(QWidget):
 
         self.load_and_decrypt_button = QPushButton(_('Load and decrypt passwords'))
         self.load_and_decrypt_button.clicked.connect(self.load_and_decrypt_passwords)
-        self.edit_password_list = QListWidget()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText(_('Search by service or username'))
+        self.search_input.textChanged.connect(self.search_edit_rows)
+        self.edit_password_list = self.create_lazy_list_view(display=lambda record: lazy_rows.record_text(record))
         self.service_label = QLabel(_('Service:'))
         self.service_input = QLineEdit()
         self.add_service_button = QPushButton(_('Add service'))
         self.add_service_button.clicked.connect(self.add_service)
+        self.check_edit_button = QPushButton(_('Check strength and duplicates'))
+        self.check_edit_button.clicked.connect(self.check_edit_passwords)
+        self.edit_report_label = QLabel('')
+        self.edit_report_label.setWordWrap(True)
         self.save_with_services_button = QPushButton(_('Save decrypted passwords with services'))
         self.save_with_services_button.clicked.connect(self.save_decrypted_passwords_with_services)
+        self.save_vault_button = QPushButton(_('Save encrypted vault with services'))
+        self.save_vault_button.clicked.connect(self.save_vault_with_services)
+        self.change_key_button = QPushButton(_('Change key'))
+        self.change_key_button.clicked.connect(self.change_key)
+        self.import_button = QPushButton(_('Import CSV or JSON'))
+        self.import_button.clicked.connect(self.import_credentials)
+        self.export_button = QPushButton(_('Export CSV or JSON'))
+        self.export_button.clicked.connect(self.export_credentials)
 
         layout.addLayout(input_layout)
         layout.addLayout(key_layout)
         layout.addWidget(self.load_and_decrypt_button)
+        layout.addWidget(self.search_input)
         layout.addWidget(self.edit_password_list)
         layout.addWidget(self.service_label)
         layout.addWidget(self.service_input)
         layout.addWidget(self.add_service_button)
+        layout.addWidget(self.check_edit_button)
+        layout.addWidget(self.edit_report_label)
         layout.addWidget(self.save_with_services_button)
+        layout.addWidget(self.save_vault_button)
+        layout.addWidget(self.change_key_button)
+        layout.addWidget(self.import_button)
+        layout.addWidget(self.export_button)
 
         self.edit_tab.setLayout(layout)
 
+    def create_lazy_list_view(self, display=str):
+        view = QListView()
+        # Одинаковая высота строк: виду не нужно запрашивать все строки для расчёта прокрутки
+        view.setUniformItemSizes(True)
+        view.setModel(LazyListModel(view, display))
+        return view
+
     def browse_encrypted_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, _("Select file with encrypted passwords"), "", "Text files (*.txt)")
+        file_path, _selected_filter = QFileDialog.getOpenFileName(self, _("Select file with encrypted passwords"), "", "Text files (*.txt);;Vault files (*.vault)")
         self.encrypted_file_path_input.setText(file_path)
 
     def browse_key_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, _("Select key file"), "", "Key files (*.key)")
+        file_path, _selected_filter = QFileDialog.getOpenFileName(self, _("Select key file"), "", "Key files (*.key)")
         self.key_file_path_input.setText(file_path)
 
     def browse_edit_encrypted_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, _("Select file with encrypted passwords"), "", "Text files (*.txt)")
+        file_path, _selected_filter = QFileDialog.getOpenFileName(self, _("Select file with encrypted passwords"), "", "Text files (*.txt);;Vault files (*.vault)")
         self.edit_encrypted_file_path_input.setText(file_path)
 
     def browse_edit_key_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, _("Select key file"), "", "Key files (*.key)")
+        file_path, _selected_filter = QFileDialog.getOpenFileName(self, _("Select key file"), "", "Key files (*.key)")
         self.edit_key_file_path_input.setText(file_path)
 
+    def start_job(self, job, *args, on_finished=None, on_partial=None, **kwargs):
+        """
+        Runs job on the thread pool, showing its progress and allowing it to be cancelled
+        """
+        if self.job_running():
+            return None
+        worker = Worker(job, *args, **kwargs)
+        worker.signals.progress.connect(self.show_job_progress)
+        if on_partial is not None:
+            worker.signals.partial.connect(on_partial)
+        if on_finished is not None:
+            worker.signals.finished.connect(on_finished)
+        worker.signals.failed.connect(self.job_failed)
+        for signal in (worker.signals.finished, worker.signals.failed, worker.signals.cancelled):
+            signal.connect(self.job_done)
+        self.current_worker = worker
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(True)
+        self.cancel_button.setVisible(True)
+        QThreadPool.globalInstance().start(worker)
+        return worker
+
+    def job_running(self):
+        """
+        Warns and returns True while another job is running
+        """
+        if self.current_worker is None:
+            return False
+        QMessageBox.warning(self, _("Warning"), _("Another operation is still running"))
+        return True
+
+    def edit_vault_busy(self):
+        """
+        Warns and returns True while a job or a compaction may still use the open vault
+        """
+        if self.current_worker is None and self.compact_worker is None:
+            return False
+        QMessageBox.warning(self, _("Warning"), _("Another operation is still running"))
+        return True
+
+    def show_job_progress(self, done, total):
+        # QProgressBar хранит int32, а перешифрование больших файлов считает байты
+        while total > 0x7fffffff:
+            done, total = done >> 10, total >> 10
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+
+    def job_failed(self, message):
+        QMessageBox.critical(self, _("Error"), _("Operation failed: ") + message)
+
+    def job_done(self, *args):
+        self.current_worker = None
+        self.progress_bar.setVisible(False)
+        self.cancel_button.setVisible(False)
+
+    def cancel_job(self):
+        if self.current_worker is not None:
+            self.current_worker.cancel()
+
     def generate_passwords(self):
         try:
             count = int(self.num_passwords_input.text())
-            length = int(self.length_input.text())
-            include_uppercase = self.include_uppercase.isChecked()
-            include_numbers = self.include_numbers.isChecked()
-            include_special = self.include_special.isChecked()
-            exclude_chars = self.exclude_chars_input.text()
-
-            passwords = generate_multiple_passwords(count, length, include_uppercase, include_numbers, include_special, exclude_chars=exclude_chars)
-            self.password_list.clear()
-            for password in passwords:
-                self.password_list.addItem(password)
-            logging.info("Passwords generated successfully.")
+            pattern = self.pattern_input.text() or None
+            length = int(self.length_input.text()) if pattern is None else 0
+            options = {
+                'include_uppercase': self.include_uppercase.isChecked(),
+                'include_numbers': self.include_numbers.isChecked(),
+                'include_special': self.include_special.isChecked(),
+                'exclude_chars': self.exclude_chars_input.text(),
+                'pattern': pattern,
+            }
+            if pattern is not None:
+                # Ошибки шаблона показываются сразу; скомпилированный шаблон кэшируется для генерации
+                password_generator.compile_pattern(pattern, options['include_uppercase'], options['include_numbers'],
+                                                   options['include_special'], options['exclude_chars'])
         except Exception as e:
             logging.error(f"Error generating passwords: {e}")
             QMessageBox.critical(self, _('Error'), _("Failed to generate passwords: ") + str(e))
+            return
+
+        # Список очищается только если новую генерацию можно запустить
+        if self.job_running():
+            return
+        model = self.password_list.model()
+        model.set_rows([])
+        # Пароли появляются в списке по мере генерации, порциями
+        self.start_job(generate_passwords_job, count, length, on_partial=model.append_rows, **options)
 
     def save_passwords(self):
-        passwords = [self.password_list.item(i).text() for i in range(self.password_list.count())]
+        passwords = self.password_list.model().rows
         if not passwords:
             QMessageBox.warning(self, _("Warning"), _("No passwords to save"))
             return
 
+        passphrase = None
+        if self.protect_key.isChecked():
+            passphrase = self.ask_new_passphrase()
+            if passphrase is None:
+                return
+
+        plain_file_path, _selected_filter = QFileDialog.getSaveFileName(self, _("Save plain passwords"), "", "Text files (*.txt)")
+        # Save encrypted passwords and generate key
+        # Ключ из парольной фразы выводится в фоне, на диск попадают только параметры scrypt
+        key = None if passphrase else encryption_utils.generate_key()
+        encrypted_file_path, _selected_filter = QFileDialog.getSaveFileName(self, _("Save encrypted passwords"), "", "Text files (*.txt)")
+
+        def saved(count):
+            try:
+                if encrypted_file_path:
+                    QMessageBox.information(self, _("Success"), _("Passwords saved and encrypted"))
+                # Copy passwords to clipboard
+                pyperclip.copy("\n".join(passwords))
+                logging.info("Passwords copied to clipboard.")
+                QMessageBox.information(self, _("Success"), _("Passwords copied to clipboard"))
+            except Exception as e:
+                logging.error(f"Error saving passwords: {e}")
+                QMessageBox.critical(self, _("Error"), _("Failed to save passwords: ") + str(e))
+
+        self.start_job(save_passwords_job, list(passwords), plain_file_path, encrypted_file_path, key, passphrase,
+                       on_finished=saved)
+
+    def ask_new_passphrase(self):
+        passphrase, ok = QInputDialog.getText(self, _("Passphrase"), _("New passphrase:"), QLineEdit.Password)
+        if not ok:
+            return None
+        repeated, ok = QInputDialog.getText(self, _("Passphrase"), _("Repeat passphrase:"), QLineEdit.Password)
+        if not ok:
+            return None
+        if not passphrase or passphrase != repeated:
+            QMessageBox.warning(self, _("Warning"), _("Passphrases are empty or do not match"))
+            return None
+        return passphrase
+
+    def read_key_file(self, encrypted_file_path, key_file_path):
+        """
+        Returns a function that loads the key, to be called from a job, or None.
+        The passphrase of a protected key file is asked for here, unless the
+        key agent still holds its key.
+        """
+        if not encrypted_file_path or not key_file_path:
+            QMessageBox.warning(self, _("Warning"), _("Please select both encrypted password file and key file"))
+            return None
         try:
-            # Save plain passwords
-            plain_file_path, _ = QFileDialog.getSaveFileName(self, _("Save plain passwords"), "", "Text files (*.txt)")
-            if plain_file_path:
-                with open(plain_file_path, 'w') as file:
-                    for password in passwords:
-                        file.write(password + "\n")
-                logging.info("Plain passwords saved successfully.")
-
-            # Save encrypted passwords and generate key
-            key = generate_key()
-            encrypted_file_path, _ = QFileDialog.getSaveFileName(self, _("Save encrypted passwords"), "", "Text files (*.txt)")
-            if encrypted_file_path:
-                save_encrypted_passwords(passwords, encrypted_file_path, key)
-                with open(f"{encrypted_file_path}.key", 'wb') as key_file:
-                    key_file.write(key)
-                logging.info("Encrypted passwords and key saved successfully.")
-                QMessageBox.information(self, _("Success"), _("Passwords saved and encrypted"))
-
-            # Copy passwords to clipboard
-            passwords_str = "\n".join(passwords)
-            pyperclip.copy(passwords_str)
-            logging.info("Passwords copied to clipboard.")
-            QMessageBox.information(self, _("Success"), _("Passwords copied to clipboard"))
+            if not keyfile.is_passphrase_key_file(key_file_path) or keyfile.cached_key(key_file_path) is not None:
+                return partial(keyfile.load_key, key_file_path)
         except Exception as e:
-            logging.error(f"Error saving passwords: {e}")
-            QMessageBox.critical(self, _("Error"), _("Failed to save passwords: ") + str(e))
+            logging.error(f"Error reading key file: {e}")
+            QMessageBox.critical(self, _("Error"), _("Failed to decrypt passwords: ") + str(e))
+            return None
+        passphrase, ok = QInputDialog.getText(self, _("Passphrase"), _("Key file passphrase:"), QLineEdit.Password)
+        if not ok:
+            return None
+        return partial(keyfile.load_key, key_file_path, passphrase)
 
     def decrypt_passwords(self):
+        if self.job_running():
+            return
         encrypted_file_path = self.encrypted_file_path_input.text()
-        key_file_path = self.key_file_path_input.text()
-
-        if not encrypted_file_path or not key_file_path:
-            QMessageBox.warning(self, _("Warning"), _("Please select both encrypted password file and key file"))
+        load_key = self.read_key_file(encrypted_file_path, self.key_file_path_input.text())
+        if load_key is None:
             return
 
-        try:
-            with open(key_file_path, 'rb') as key_file:
-                key = key_file.read()
-
-            passwords = read_encrypted_passwords(encrypted_file_path, key)
-            self.decrypted_password_list.clear()
-            for password in passwords:
-                self.decrypted_password_list.addItem(password)
+        def opened(result):
+            _key, rows = result
+            self.decrypted_password_list.model().set_rows(rows)
             logging.info("Passwords decrypted successfully.")
             QMessageBox.information(self, _("Success"), _("Passwords decrypted"))
-        except Exception as e:
-            logging.error(f"Error decrypting passwords: {e}")
-            QMessageBox.critical(self, _("Error"), _("Failed to decrypt passwords: ") + str(e))
+
+        self.decrypted_password_list.model().clear()
+        self.start_job(open_with_key_job, lazy_rows.open_text_rows, encrypted_file_path, load_key, on_finished=opened)
 
     def load_and_decrypt_passwords(self):
+        # Открытое хранилище закрывается до запуска job, поэтому занятость проверяется заранее
+        if self.edit_vault_busy():
+            return
         encrypted_file_path = self.edit_encrypted_file_path_input.text()
-        key_file_path = self.edit_key_file_path_input.text()
-
-        if not encrypted_file_path or not key_file_path:
-            QMessageBox.warning(self, _("Warning"), _("Please select both encrypted password file and key file"))
+        load_key = self.read_key_file(encrypted_file_path, self.edit_key_file_path_input.text())
+        if load_key is None:
             return
 
-        try:
-            with open(key_file_path, 'rb') as key_file:
-                key = key_file.read()
-
-            self.decrypted_passwords = read_encrypted_passwords(encrypted_file_path, key)
-            self.edit_password_list.clear()
-            for password in self.decrypted_passwords:
-                self.edit_password_list.addItem(password)
+        def opened(result):
+            key, (self.edit_vault, rows) = result
+            self.edit_key = key
+            self.edit_password_list.model().set_rows(rows)
+            self.search_edit_rows()
             logging.info("Passwords decrypted successfully.")
             QMessageBox.information(self, _("Success"), _("Passwords decrypted"))
-        except Exception as e:
-            logging.error(f"Error decrypting passwords: {e}")
-            QMessageBox.critical(self, _("Error"), _("Failed to decrypt passwords: ") + str(e))
+
+        self.close_edit_vault()
+        self.start_job(open_with_key_job, lazy_rows.open_edit_rows, encrypted_file_path, load_key, on_finished=opened)
+
+    def format_report(self, report):
+        levels = ", ".join(f"{_(strength.LEVEL_NAMES[level])}: {count}"
+                           for level, count in enumerate(report.level_counts) if count)
+        text = _("Checked {total}. {levels}. Repeated: {repeated}.").format(
+            total=report.total, levels=levels, repeated=len(report.duplicates))
+        if report.reused:
+            text += " " + _("Already in the open vault: {reused}.").format(reused=len(report.reused))
+        if report.approximate:
+            text += " " + _("Repeats are approximate for this many passwords.")
+        return text
+
+    def edit_passwords(self):
+        """
+        Passwords of the rows open in the Edit tab, read lazily
+        """
+        return (record.password for record in self.edit_password_list.model().rows)
+
+    def check_generated_passwords(self):
+        passwords = self.password_list.model().rows
+        if not passwords:
+            QMessageBox.warning(self, _("Warning"), _("No passwords to check"))
+            return
+        # Новые пароли сверяются и с хранилищем, открытым на вкладке редактирования
+        existing = self.edit_passwords() if len(self.edit_password_list.model().rows) else None
+
+        def checked(report):
+            self.generated_report_label.setText(self.format_report(report))
+
+        self.start_job(analyze_passwords_job, list(passwords), len(passwords), existing, on_finished=checked)
+
+    def check_edit_passwords(self):
+        model = self.edit_password_list.model()
+        if not len(model.rows):
+            QMessageBox.warning(self, _("Warning"), _("No passwords to check"))
+            return
+
+        def checked(report):
+            self.edit_report_label.setText(self.format_report(report))
+            if report.duplicates and not report.approximate:
+                # Показываем только записи с повторяющимися паролями
+                rows = set()
+                for row, first in report.duplicates:
+                    rows.update((row, first))
+                model.set_filter(sorted(rows))
+
+        self.start_job(analyze_passwords_job, self.edit_passwords(), len(model.rows), on_finished=checked)
+
+    def search_edit_rows(self):
+        """
+        Filters the Edit tab by the search box. The index is built on first
+        use, on the thread pool; until it is complete, results cover the rows
+        indexed so far and are refreshed once it finishes.
+        """
+        model = self.edit_password_list.model()
+        query = self.search_input.text()
+        if not query.strip():
+            model.set_filter(None)
+            return
+        if self.edit_search is None:
+            if not len(model.rows):
+                return
+            self.edit_search = search_index.SearchIndex()
+            self.search_worker = Worker(build_search_index_job, self.edit_search, iter(model.rows))
+            self.search_worker.signals.finished.connect(self.search_index_built)
+            self.search_worker.signals.failed.connect(partial(self.search_index_failed, self.edit_search))
+            QThreadPool.globalInstance().start(self.search_worker)
+        model.set_filter(self.edit_search.search(query))
+
+    def search_index_built(self, index):
+        if index is self.edit_search:
+            self.search_worker = None
+            self.search_edit_rows()
+
+    def search_index_failed(self, index, message):
+        if index is not self.edit_search:
+            return
+        # Недостроенный индекс отбрасывается; следующий запрос построит его заново
+        self.search_worker = None
+        self.edit_search = None
+        self.edit_password_list.model().set_filter(None)
+        self.job_failed(message)
 
     def add_service(self):
-        selected_index = self.edit_password_list.currentRow()
+        selected_index = self.edit_password_list.model().source_row(self.edit_password_list.currentIndex().row())
         if selected_index == -1:
             QMessageBox.warning(self, _("Warning"), _("Please select a password to add service"))
             return
@@ -309,29 +547,210 @@ class PasswordManagerApp(QWidget):
         if not service:
             QMessageBox.warning(self, _("Warning"), _("Please enter a service name"))
             return
-        password = self.decrypted_passwords[selected_index]
-        self.edit_password_list.takeItem(selected_index)
-        self.edit_password_list.insertItem(selected_index, f"{password} - {service}")
-        self.decrypted_passwords[selected_index] = f"{password} - {service}"
+        model = self.edit_password_list.model()
+        record = model.rows[selected_index]._replace(service=service)
+        try:
+            if self.edit_vault is not None:
+                # Изменение дописывается в журнал хранилища, файл целиком не переписывается
+                self.edit_vault.update(selected_index, record)
+                model.rows.invalidate(selected_index)
+                if self.edit_vault.pending_changes >= COMPACT_AFTER_CHANGES:
+                    self.compact_edit_vault()
+            else:
+                model.rows[selected_index] = record
+            if self.edit_search is not None:
+                self.edit_search.update(selected_index, record)
+        except Exception as e:
+            logging.error(f"Error adding service: {e}")
+            QMessageBox.critical(self, _("Error"), _("Failed to add service: ") + str(e))
+            return
+        model.row_changed(selected_index)
         logging.info("Service added successfully.")
 
+    def compact_edit_vault(self):
+        """
+        Folds the change log of the open vault into it on the thread pool
+        """
+        if self.compact_worker is not None:
+            return
+        self.compact_worker = Worker(call_job, self.edit_vault.compact)
+        self.compact_worker.signals.failed.connect(self.compaction_failed)
+        for signal in (self.compact_worker.signals.finished, self.compact_worker.signals.failed):
+            signal.connect(self.compaction_done)
+        QThreadPool.globalInstance().start(self.compact_worker)
+
+    def compaction_failed(self, message):
+        # Изменения остаются в журнале, поэтому ничего не потеряно
+        QMessageBox.warning(self, _("Warning"), _("Failed to compact the vault: ") + message)
+
+    def compaction_done(self, *args):
+        self.compact_worker = None
+
+    def close_edit_vault(self):
+        if self.search_worker is not None:
+            self.search_worker.cancel()
+            self.search_worker = None
+        self.edit_search = None
+        self.edit_password_list.model().clear()
+        if self.edit_vault is not None:
+            self.edit_vault.close()
+            self.edit_vault = None
+
     def save_decrypted_passwords_with_services(self):
-        file_path, _ = QFileDialog.getSaveFileName(self, _("Save decrypted passwords with services"), "", "Text files (*.txt)")
+        file_path, _selected_filter = QFileDialog.getSaveFileName(self, _("Save decrypted passwords with services"), "", "Text files (*.txt)")
         if file_path:
             try:
                 with open(file_path, 'w') as file:
-                    for password in self.decrypted_passwords:
-                        file.write(password + "\n")
+                    for record in self.edit_password_list.model().rows:
+                        file.write(lazy_rows.record_text(record) + "\n")
                 logging.info("Decrypted passwords with services saved successfully.")
                 QMessageBox.information(self, _("Success"), _("Decrypted passwords with services saved"))
             except Exception as e:
                 logging.error(f"Error saving decrypted passwords with services: {e}")
                 QMessageBox.critical(self, _("Error"), _("Failed to save decrypted passwords with services: ") + str(e))
 
+    def save_vault_with_services(self):
+        rows = self.edit_password_list.model().rows
+        if not len(rows):
+            QMessageBox.warning(self, _("Warning"), _("No passwords to save"))
+            return
+        file_path, _selected_filter = QFileDialog.getSaveFileName(self, _("Save encrypted vault with services"), "", "Vault files (*.vault)")
+        if not file_path:
+            return
+
+        def saved(filename):
+            if self.edit_vault is None or os.path.abspath(filename) != os.path.abspath(self.edit_vault.filename):
+                self.close_edit_vault()
+                # Дальнейшие изменения дописываются в журнал нового хранилища
+                self.edit_vault = records.RecordVault(filename, self.edit_key)
+            self.edit_password_list.model().set_rows(lazy_rows.open_record_rows(self.edit_vault))
+            self.search_edit_rows()
+            logging.info("Encrypted vault with services saved successfully.")
+            QMessageBox.information(self, _("Success"), _("Encrypted vault with services saved"))
+
+        self.start_job(save_records_job, iter(rows), len(rows), file_path, self.edit_key, self.edit_vault,
+                       on_finished=saved)
+
+    def change_key(self):
+        """
+        Re-encrypts the selected file under a new key. A cancelled or failed
+        rotation resumes when started again with the same new key file.
+        """
+        if self.edit_vault_busy():
+            return
+        encrypted_file_path = self.edit_encrypted_file_path_input.text()
+        key_file_path = self.edit_key_file_path_input.text()
+        load_key = self.read_key_file(encrypted_file_path, key_file_path)
+        if load_key is None:
+            return
+        new_key_file_path, _selected_filter = QFileDialog.getSaveFileName(self, _("Save new key file"), "", "Key files (*.key)")
+        if not new_key_file_path:
+            return
+        if os.path.abspath(new_key_file_path) == os.path.abspath(key_file_path):
+            QMessageBox.warning(self, _("Warning"), _("The new key file must differ from the current one"))
+            return
+        passphrase = None
+        if keyfile.is_passphrase_key_file(key_file_path):
+            passphrase = self.ask_new_passphrase()
+            if passphrase is None:
+                return
+
+        def changed(entries):
+            self.edit_key_file_path_input.setText(new_key_file_path)
+            logging.info("Key changed successfully.")
+            QMessageBox.information(self, _("Success"), _("Key changed, entries re-encrypted: ") + str(entries))
+
+        # Файл заменяется целиком, поэтому открытое хранилище сначала закрывается
+        self.close_edit_vault()
+        self.start_job(rekey_job, encrypted_file_path, load_key, new_key_file_path, passphrase, on_finished=changed)
+
+    def import_credentials(self):
+        """
+        Imports a CSV or JSON export into the open vault, or into a new vault
+        together with the rows open in the Edit tab. Without open rows, a new
+        key is created beside the new vault.
+        """
+        if self.edit_vault_busy():
+            return
+        source, _selected_filter = QFileDialog.getOpenFileName(self, _("Select CSV or JSON export"), "",
+                                                "Exports (*.csv *.json *.jsonl)")
+        if not source:
+            return
+        rows = self.edit_password_list.model().rows
+        key_file = None
+        existing = None
+        if self.edit_vault is not None:
+            vault_path = self.edit_vault.filename
+            key = self.edit_key
+            # Хранилище переписывается целиком; его записи и журнал job прочитает сам
+            self.close_edit_vault()
+        else:
+            vault_path, _selected_filter = QFileDialog.getSaveFileName(self, _("Save encrypted vault with services"), "",
+                                                        "Vault files (*.vault)")
+            if not vault_path:
+                return
+            if len(rows):
+                key = self.edit_key
+                existing = iter(rows)
+            else:
+                key_file = f"{vault_path}.key"
+                # Новый ключ не подходит к существующему хранилищу, а старый ключ нельзя затирать
+                if os.path.exists(vault_path) or os.path.exists(key_file):
+                    QMessageBox.warning(self, _("Warning"),
+                                        _("The vault or its key file already exists; open the vault in the Edit tab first"))
+                    return
+                # generate_key() заодно перезаписал бы decryption_key.key
+                key = encryption_utils.Fernet.generate_key()
+
+        def imported(count):
+            self.close_edit_vault()
+            self.edit_key = key
+            self.edit_vault = records.RecordVault(vault_path, key)
+            self.edit_encrypted_file_path_input.setText(vault_path)
+            if key_file:
+                self.edit_key_file_path_input.setText(key_file)
+            self.edit_password_list.model().set_rows(lazy_rows.open_record_rows(self.edit_vault))
+            logging.info("Credentials imported successfully.")
+            QMessageBox.information(self, _("Success"), _("Records imported: ") + str(count))
+
+        self.start_job(import_records_job, source, vault_path, key, existing, key_file, on_finished=imported)
+
+    def export_credentials(self):
+        rows = self.edit_password_list.model().rows
+        if not len(rows):
+            QMessageBox.warning(self, _("Warning"), _("No passwords to save"))
+            return
+        file_path, _selected_filter = QFileDialog.getSaveFileName(self, _("Export CSV or JSON"), "",
+                                                   "CSV files (*.csv);;JSON files (*.json)")
+        if not file_path:
+            return
+
+        def exported(count):
+            QMessageBox.information(self, _("Success"), _("Records exported: ") + str(count))
+
+        self.start_job(export_records_job, iter(rows), len(rows), file_path, on_finished=exported)
+
+    def start_update_check(self):
+        """
+        Checks for updates on the thread pool once the window is already on screen
+        """
+        worker = Worker(call_job, updater.check_for_updates, REPO_PATH)
+        worker.signals.finished.connect(self.update_checked)
+        QThreadPool.globalInstance().start(worker)
+
+    def update_checked(self, result):
+        if result == updater.UPDATE_APPLIED:
+            QMessageBox.information(self, _("Update"), _("A new version was downloaded. Restart the application to use it."))
+
+REPO_PATH = os.path.dirname(os.path.abspath(__file__))
+
 if __name__ == '__main__':
-    REPO_PATH = os.path.dirname(os.path.abspath(__file__))
-    update_from_github(REPO_PATH)
     app = QApplication(sys.argv)
     ex = PasswordManagerApp()
+    startup_timer.mark('window created')
     ex.show()
+    startup_timer.mark('window shown')
+    # Проверка обновлений стартует после первой отрисовки окна и не задерживает запуск
+    QTimer.singleShot(0, startup_timer.report)
+    QTimer.singleShot(0, ex.start_update_check)
     sys.exit(app.exec_())
@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+import time
+
+# Метрики выключены по умолчанию: горячие пути проверяют только этот флаг.
+# Включаются через enable() или переменную окружения PM_METRICS=1.
+enabled = os.environ.get('PM_METRICS', '') not in ('', '0')
+
+# Границы корзин гистограммы задержек растут степенями двойки от 1 мкс
+HISTOGRAM_BUCKETS = 32
+
+_lock = threading.Lock()
+_stats = {}
+
+
+class _Stat:
+    __slots__ = ('calls', 'count', 'bytes', 'seconds', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.count = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.histogram = [0] * HISTOGRAM_BUCKETS
+
+
+def enable(flag=True):
+    global enabled
+    enabled = flag
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def record(name, count=1, nbytes=0, seconds=None):
+    """
+    Adds one call of count items and nbytes bytes that took seconds to the totals of name
+    """
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = _Stat()
+        stat.calls += 1
+        stat.count += count
+        stat.bytes += nbytes
+        if seconds is not None:
+            stat.seconds += seconds
+            bucket = min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+            stat.histogram[bucket] += 1
+
+
+def snapshot():
+    """
+    Returns {name: {'calls', 'count', 'bytes', 'seconds', 'histogram'}}, where
+    histogram maps the upper bound of each non-empty bucket in microseconds to
+    the number of calls that fell into it
+    """
+    with _lock:
+        return {
+            name: {
+                'calls': stat.calls,
+                'count': stat.count,
+                'bytes': stat.bytes,
+                'seconds': stat.seconds,
+                'histogram': {1 << bucket: calls for bucket, calls in enumerate(stat.histogram) if calls},
+            }
+            for name, stat in _stats.items()
+        }
+
+
+def format_summary(name, count, nbytes, seconds):
+    rate = f", {count / seconds:,.0f} items/s" if seconds > 0 else ""
+    return f"{name}: {count} items, {nbytes / 1024:,.1f} KiB in {seconds * 1000:.1f} ms{rate}"
+
+
+class operation:
+    """
+    Context manager measuring one bulk operation.
+    Items and bytes are added with add(); on exit the totals are recorded and
+    a single summary line is logged. Does nothing while metrics are disabled.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.bytes = 0
+        self._started = None
+
+    def __enter__(self):
+        if enabled:
+            self._started = time.perf_counter()
+        return self
+
+    def add(self, count, nbytes=0):
+        self.count += count
+        self.bytes += nbytes
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._started is None:
+            return
+        elapsed = time.perf_counter() - self._started
+        record(self.name, self.count, self.bytes, elapsed)
+        if exc_type is None:
+            logging.info(format_summary(self.name, self.count, self.bytes, elapsed))
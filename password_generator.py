@@ -1,9 +1,41 @@
-import random
+import os
+import secrets
 import string
+import time
+from collections import namedtuple
+from functools import lru_cache
+from itertools import compress, islice, repeat
+import metrics
 
+# Размер блока случайных байт, запрашиваемого у os.urandom за один вызов
+RANDOM_BLOCK_SIZE = 1 << 16
+# Сколько паролей iter_passwords генерирует за один проход
+DEFAULT_CHUNK_SIZE = 10000
 
-def generate_password(length, include_uppercase=True, include_numbers=True, include_special=True, template=None,
-                      exclude_chars=""):
+
+# Классы символов языка шаблонов
+PATTERN_CLASSES = {
+    'l': string.ascii_lowercase,
+    'u': string.ascii_uppercase,
+    'd': string.digits,
+    's': string.punctuation,
+    'L': string.ascii_letters,
+    'A': string.ascii_letters + string.digits,
+}
+# Сколько раз перегенерируются пароли, не выполняющие требования шаблона
+MAX_REQUIREMENT_ROUNDS = 100
+
+CompiledPattern = namedtuple('CompiledPattern', ['runs', 'length', 'required'])
+CompiledPattern.__doc__ = """
+Result of compile_pattern(): runs is a tuple of (characters, count) for
+consecutive positions drawn from the same characters, required a tuple of
+character sets every password must contain at least one character of.
+"""
+
+
+@lru_cache(maxsize=256)
+def _build_charset(include_uppercase=True, include_numbers=True, include_special=True, template=None,
+                   exclude_chars=""):
     if template:
         characters = template
     else:
@@ -15,14 +47,270 @@ def generate_password(length, include_uppercase=True, include_numbers=True, incl
         if include_special:
             characters += string.punctuation
 
-    characters = ''.join(c for c in characters if c not in exclude_chars)
+    return characters.translate(str.maketrans('', '', exclude_chars))
+
+
+def _parse_set(pattern, position):
+    """
+    Reads a [...] set starting after the opening bracket and returns (characters, position after it)
+    """
+    characters = []
+    while position < len(pattern) and pattern[position] != ']':
+        if pattern[position] == '\\':
+            position += 1
+            if position == len(pattern):
+                break
+        characters.append(pattern[position])
+        position += 1
+    if position == len(pattern):
+        raise ValueError("Unclosed [ in pattern")
+    return ''.join(dict.fromkeys(characters)), position + 1
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern, include_uppercase=True, include_numbers=True, include_special=True, exclude_chars=""):
+    """
+    Compiles a password pattern into per-position character sets.
+    l, u, d, s are lowercase letters, uppercase letters, digits and special
+    characters; L is any letter, A any letter or digit, and * any character
+    allowed by the include_* options. [abc] is a custom set, \\c the literal c,
+    and any other character stands for itself. {n} after a position repeats
+    it n times. !c (a class or a set) requires at least one such character
+    somewhere in the password. exclude_chars is removed from every position
+    except literals. The result is cached by pattern and options.
+    """
+    positions = []
+    required = []
+    position = 0
+    while position < len(pattern):
+        symbol = pattern[position]
+        position += 1
+        if symbol == '{':
+            end = pattern.find('}', position)
+            if not positions or end == -1 or not pattern[position:end].isdigit() or int(pattern[position:end]) < 1:
+                raise ValueError(f"Invalid repetition at position {position - 1} of pattern")
+            positions.extend(positions[-1:] * (int(pattern[position:end]) - 1))
+            position = end + 1
+            continue
+        requirement = symbol == '!'
+        if requirement:
+            if position == len(pattern):
+                raise ValueError("Pattern ends with !")
+            symbol = pattern[position]
+            position += 1
+        if symbol == '\\':
+            if position == len(pattern):
+                raise ValueError("Pattern ends with \\")
+            characters = pattern[position]
+            position += 1
+        elif symbol == '[':
+            characters, position = _parse_set(pattern, position)
+            characters = characters.translate(str.maketrans('', '', exclude_chars))
+        elif symbol == '*':
+            characters = _build_charset(include_uppercase, include_numbers, include_special, None, exclude_chars)
+        elif symbol in PATTERN_CLASSES:
+            characters = PATTERN_CLASSES[symbol].translate(str.maketrans('', '', exclude_chars))
+        elif requirement:
+            raise ValueError(f"Unknown class !{symbol} in pattern")
+        else:
+            characters = symbol
+        if not characters:
+            raise ValueError(f"No characters left for {symbol!r} in pattern")
+        (required if requirement else positions).append(characters)
+
+    if not positions:
+        raise ValueError("Pattern has no positions")
+    for characters in required:
+        if not any(set(characters) & set(allowed) for allowed in positions):
+            raise ValueError(f"Pattern can never contain a required character from {characters!r}")
+    runs = []
+    for characters in positions:
+        if runs and runs[-1][0] == characters:
+            runs[-1][1] += 1
+        else:
+            runs.append([characters, 1])
+    return CompiledPattern(tuple(map(tuple, runs)), len(positions), tuple(map(frozenset, required)))
+
+
+@lru_cache(maxsize=256)
+def _symbol_table(characters):
+    """
+    Byte translation table mapping random bytes onto characters, built once per charset
+    """
+    size = len(characters)
+    # Bytes at or above limit would make some characters more likely than others
+    limit = 256 - 256 % size
+    rejected = bytes(range(limit, 256))
+    latin1 = all(ord(c) < 256 for c in characters)
+    if latin1:
+        table = bytes(ord(characters[b % size]) for b in range(limit)) + bytes(256 - limit)
+    else:
+        table = bytes(b % size for b in range(limit)) + bytes(256 - limit)
+    return limit, table, rejected, latin1
+
+
+def _random_symbols(characters, n):
+    """
+    Returns a string of n characters drawn uniformly from characters using the OS CSPRNG.
+    Random bytes are pulled in large blocks and mapped onto the charset with rejection
+    sampling, so every character is equally likely regardless of the charset size.
+    """
+    if n <= 0:
+        return ''
+    size = len(characters)
+    if size == 0:
+        raise ValueError("No characters available to generate passwords from")
+    if size > 256:
+        return ''.join(secrets.choice(characters) for _ in range(n))
+
+    limit, table, rejected, latin1 = _symbol_table(characters)
+    chunks = []
+    remaining = n
+    while remaining > 0:
+        # Запрашиваем с запасом, чтобы обычно хватало одного блока
+        request = min(remaining * 256 // limit + 64, RANDOM_BLOCK_SIZE)
+        accepted = os.urandom(request).translate(table, rejected)
+        chunks.append(accepted[:remaining])
+        remaining -= len(chunks[-1])
+
+    symbols = b''.join(chunks)
+    if latin1:
+        return symbols.decode('latin-1')
+    return ''.join(map(characters.__getitem__, symbols))
+
+
+def _options_charset_or_pattern(include_uppercase, include_numbers, include_special, template, exclude_chars,
+                                pattern):
+    if pattern:
+        return compile_pattern(pattern, include_uppercase, include_numbers, include_special, exclude_chars)
+    return _build_charset(include_uppercase, include_numbers, include_special, template, exclude_chars)
 
-    password = ''.join(random.choice(characters) for _ in range(length))
-    return password
+
+def _pattern_chunk(compiled, count):
+    """
+    Generates count passwords position run by position run: every run is one
+    block of random symbols, and the runs are zipped into passwords
+    """
+    columns = []
+    for characters, run in compiled.runs:
+        if len(characters) == 1:
+            columns.append(repeat(characters * run, count))
+        elif run == 1:
+            columns.append(_random_symbols(characters, count))
+        else:
+            symbols = _random_symbols(characters, count * run)
+            columns.append([symbols[i:i + run] for i in range(0, count * run, run)])
+    return list(map(''.join, zip(*columns)))
+
+
+def _missing_required(passwords, required):
+    """
+    Returns indexes of passwords lacking a character from one of the required sets
+    """
+    missing = set()
+    for characters in required:
+        missing.update(compress(range(len(passwords)), map(characters.isdisjoint, passwords)))
+    return sorted(missing)
+
+
+def _generate_pattern_chunk(compiled, count):
+    passwords = _pattern_chunk(compiled, count)
+    if not compiled.required:
+        return passwords
+    missing = _missing_required(passwords, compiled.required)
+    rounds = 0
+    # Отбраковка: перегенерируются только пароли без обязательных символов,
+    # так что остальные распределены так же, как без требований
+    while missing:
+        rounds += 1
+        if rounds > MAX_REQUIREMENT_ROUNDS:
+            raise ValueError("Pattern requirements are too unlikely to be met")
+        replacements = _pattern_chunk(compiled, len(missing))
+        for index, password in zip(missing, replacements):
+            passwords[index] = password
+        missing = [missing[i] for i in _missing_required(replacements, compiled.required)]
+    return passwords
+
+
+def generate_password(length, include_uppercase=True, include_numbers=True, include_special=True, template=None,
+                      exclude_chars="", pattern=None):
+    """
+    Generates one password. template is a flat set of characters to draw from;
+    pattern, if given, is compiled with compile_pattern() and decides the
+    length instead of length.
+    """
+    source = _options_charset_or_pattern(include_uppercase, include_numbers, include_special, template,
+                                         exclude_chars, pattern)
+    if pattern:
+        return _generate_pattern_chunk(source, 1)[0]
+    return _random_symbols(source, length)
+
+
+def _generate_chunk(characters, count, length):
+    if isinstance(characters, CompiledPattern):
+        return _generate_pattern_chunk(characters, count)
+    if length <= 0:
+        return [''] * count
+    symbols = _random_symbols(characters, count * length)
+    return [symbols[i:i + length] for i in range(0, count * length, length)]
+
+
+def _iter_chunks(items, chunk_size):
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
 
 
 def generate_multiple_passwords(count, length, include_uppercase=True, include_numbers=True, include_special=True,
-                                template=None, exclude_chars=""):
-    passwords = [generate_password(length, include_uppercase, include_numbers, include_special, template, exclude_chars)
-                 for _ in range(count)]
+                                template=None, exclude_chars="", pattern=None):
+    characters = _options_charset_or_pattern(include_uppercase, include_numbers, include_special, template,
+                                             exclude_chars, pattern)
+    if pattern:
+        length = characters.length
+    with metrics.operation('generate') as operation:
+        passwords = _generate_chunk(characters, count, length)
+        operation.add(count, count * max(length, 0))
     return passwords
+
+
+def iter_passwords(count, length, include_uppercase=True, include_numbers=True, include_special=True,
+                   template=None, exclude_chars="", chunk_size=DEFAULT_CHUNK_SIZE, pattern=None):
+    """
+    Lazily yields count passwords, generating at most chunk_size of them at a time
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+    characters = _options_charset_or_pattern(include_uppercase, include_numbers, include_special, template,
+                                             exclude_chars, pattern)
+    if pattern:
+        length = characters.length
+    remaining = count
+    while remaining > 0:
+        batch = min(remaining, chunk_size)
+        started = time.perf_counter() if metrics.enabled else None
+        chunk = _generate_chunk(characters, batch, length)
+        if started is not None:
+            metrics.record('generate', batch, batch * max(length, 0), time.perf_counter() - started)
+        yield from chunk
+        remaining -= batch
+
+
+def measure_throughput(lengths=(8, 12, 16, 32, 64), count=100000, **options):
+    """
+    Measures generate_multiple_passwords throughput and returns {length: passwords per second}
+    """
+    results = {}
+    for length in lengths:
+        start = time.perf_counter()
+        generate_multiple_passwords(count, length, **options)
+        elapsed = time.perf_counter() - start
+        results[length] = count / elapsed if elapsed > 0 else float('inf')
+    return results
+
+
+if __name__ == '__main__':
+    for length, rate in measure_throughput().items():
+        print(f"length {length:>3}: {rate:,.0f} passwords/sec")
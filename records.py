@@ -0,0 +1,557 @@
+import bisect
+import hashlib
+import hmac
+import json
+import logging
+import os
+import struct
+import threading
+from collections import namedtuple
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from changelog import COMPACT_SUFFIX, OP_PUT, OP_DELETE, ChangeLog, log_path
+from vault import (
+    DEFAULT_CHUNK_ENTRIES, FLAG_RECORDS, VaultError, VaultReader, _append_framed, _iter_framed, _open, _seal,
+    save_vault
+)
+
+# Структурированная запись хранилища
+Record = namedtuple('Record', ['service', 'username', 'password', 'metadata'], defaults=('', '', '', None))
+
+# Индекс сервисов хранится рядом с хранилищем в файле <vault>.sidx:
+#   заголовок | сегмент 0 | сегмент 1 | ...
+# Сегмент - зашифрованный список пар (HMAC имени сервиса, номер записи).
+# Новые записи дописываются новым сегментом, старые сегменты не переписываются.
+INDEX_MAGIC = b'PMSINDEX'
+INDEX_SUFFIX = '.sidx'
+INDEX_HEADER = struct.Struct('>8s16s16s')   # magic, vault salt, index salt
+SEGMENT_NUMBER = struct.Struct('>I')
+INDEX_PAIR = struct.Struct('>16sQ')         # service digest, entry number
+DIGEST_SIZE = 16
+
+
+def encode_record(record):
+    return json.dumps([record.service, record.username, record.password, record.metadata],
+                      ensure_ascii=False, separators=(',', ':'))
+
+
+def decode_record(entry):
+    service, username, password, metadata = json.loads(entry)
+    return Record(service, username, password, metadata)
+
+
+def normalize_service(service):
+    return service.strip().casefold()
+
+
+def index_path(vault_filename):
+    return vault_filename + INDEX_SUFFIX
+
+
+def _entry_id(deleted, row):
+    """
+    Maps a row among live records to its entry number, given the sorted deleted entry numbers
+    """
+    # deleted отсортирован, поэтому deleted[i] - i не убывает: ищем, сколько
+    # удалённых записей стоит перед искомой, двоичным поиском
+    low, high = 0, len(deleted)
+    while low < high:
+        middle = (low + high) // 2
+        if deleted[middle] - middle <= row:
+            low = middle + 1
+        else:
+            high = middle
+    return row + low
+
+
+class ServiceIndex:
+    """
+    Encrypted keyed-hash index from service name to record numbers.
+    Service names are stored only as HMAC digests, and every segment is sealed
+    with AES-GCM. The index may return stale candidates (edited or deleted
+    records, digest collisions), so callers verify the record they decrypt.
+    Opening reads only the header; segments are decrypted on first use.
+    """
+
+    def __init__(self, filename, key, vault_salt):
+        self.filename = filename
+        self._key = key if isinstance(key, bytes) else key.encode()
+        self._vault_salt = vault_salt
+        self._entries = {}
+        # Пары, добавленные только в память (например, из журнала изменений)
+        self._remembered = {}
+        self._segment_count = 0
+        self._indexed_count = 0
+        self._loaded = False
+        if not self._read_header():
+            self._reset()
+
+    def _derive_keys(self, index_salt):
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=64, salt=index_salt, info=b'password_manager service index v1')
+        derived = hkdf.derive(self._key)
+        self._aead = AESGCM(derived[:32])
+        self._hmac_key = derived[32:]
+
+    def _read_header(self):
+        try:
+            with open(self.filename, 'rb') as file:
+                header = file.read(INDEX_HEADER.size)
+        except FileNotFoundError:
+            return False
+        if len(header) < INDEX_HEADER.size:
+            return False
+        magic, vault_salt, index_salt = INDEX_HEADER.unpack(header)
+        if magic != INDEX_MAGIC or vault_salt != self._vault_salt:
+            logging.info("Service index is missing or stale, rebuilding.")
+            return False
+        self._header = header
+        self._derive_keys(index_salt)
+        return True
+
+    def _load(self):
+        """
+        Decrypts the segments once; a damaged index is reset and left empty
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        with open(self.filename, 'rb') as file:
+            data = file.read()
+        valid_end = INDEX_HEADER.size
+        for end, sealed in _iter_framed(data, INDEX_HEADER.size):
+            try:
+                pairs = _open(self._aead, sealed, self._header + SEGMENT_NUMBER.pack(self._segment_count))
+            except VaultError:
+                logging.info("Service index is damaged, rebuilding.")
+                self._reset()
+                return
+            self._add_pairs(INDEX_PAIR.iter_unpack(pairs))
+            self._segment_count += 1
+            valid_end = end
+        if valid_end < len(data):
+            # Недописанный последний сегмент: отрезаем, его записи будут проиндексированы заново
+            os.truncate(self.filename, valid_end)
+
+    def _reset(self):
+        index_salt = os.urandom(16)
+        self._header = INDEX_HEADER.pack(INDEX_MAGIC, self._vault_salt, index_salt)
+        self._derive_keys(index_salt)
+        self._entries = {}
+        self._segment_count = 0
+        self._indexed_count = 0
+        self._loaded = True
+        with open(self.filename, 'wb') as file:
+            file.write(self._header)
+
+    @property
+    def indexed_count(self):
+        """
+        Number of records covered by the segments on disk
+        """
+        self._load()
+        return self._indexed_count
+
+    def _add_pairs(self, pairs):
+        for digest, entry_number in pairs:
+            self._entries.setdefault(digest, []).append(entry_number)
+            if entry_number >= self._indexed_count:
+                self._indexed_count = entry_number + 1
+
+    def digest(self, service):
+        return hmac.new(self._hmac_key, normalize_service(service).encode(), hashlib.sha256).digest()[:DIGEST_SIZE]
+
+    def lookup(self, service):
+        """
+        Returns candidate record numbers for service, newest first
+        """
+        self._load()
+        digest = self.digest(service)
+        return (self._entries.get(digest, []) + self._remembered.get(digest, []))[::-1]
+
+    def add(self, services, remember=True):
+        """
+        Appends one segment for an iterable of (entry_number, service) pairs.
+        With remember=False the pairs are only written, not kept in memory.
+        """
+        pairs = [(self.digest(service), entry_number) for entry_number, service in services]
+        if not pairs:
+            return
+        # Номер сегмента входит в его AAD, поэтому существующие сегменты нужно сосчитать
+        self._load()
+        packed = b''.join(INDEX_PAIR.pack(digest, entry_number) for digest, entry_number in pairs)
+        sealed = _seal(self._aead, packed, self._header + SEGMENT_NUMBER.pack(self._segment_count))
+        _append_framed(self.filename, sealed)
+        self._segment_count += 1
+        if remember:
+            self._add_pairs(pairs)
+
+    def remember(self, services):
+        """
+        Adds (entry_number, service) pairs to the in-memory index only
+        """
+        for entry_number, service in services:
+            self._remembered.setdefault(self.digest(service), []).append(entry_number)
+
+    def rebuild(self, services, segment_size=DEFAULT_CHUNK_ENTRIES):
+        """
+        Discards the index and rebuilds it from (entry_number, service) pairs
+        """
+        self._reset()
+        batch = []
+        for pair in services:
+            batch.append(pair)
+            if len(batch) >= segment_size:
+                self.add(batch)
+                batch = []
+        self.add(batch)
+
+
+class RecordVault:
+    """
+    Binary vault of structured records with a service index stored beside it.
+    Rows are positions among the live records, like indices into a list.
+    Changes are appended to an encrypted change log instead of rewriting the
+    vault; compact() folds the log back into the base vault. Looking a service
+    up costs one index probe plus decrypting the chunk that holds the record.
+    """
+
+    def __init__(self, filename, key):
+        self.filename = filename
+        self._key = key
+        self._lock = threading.RLock()
+        self._compacting = False
+        self.compact_error = None
+        self._open()
+
+    def _open(self):
+        self._reader = VaultReader(self.filename, self._key)
+        try:
+            if not self._reader.flags & FLAG_RECORDS:
+                raise VaultError("Vault does not contain structured records")
+            self.index = ServiceIndex(index_path(self.filename), self._key, self._reader.salt)
+            self.log = ChangeLog(log_path(self.filename), self._key, self._reader.salt)
+        except Exception:
+            self._reader.close()
+            raise
+        self._index_checked = False
+        self._overlay = {}
+        self._deleted = []
+        self._next_id = len(self._reader)
+        for op, entry_id, entry in self.log.ops:
+            self._apply(op, entry_id, entry)
+
+    def _check_index(self):
+        """
+        Loads the service index on first lookup and indexes the records it has not seen yet
+        """
+        if not self._index_checked:
+            if self.index.indexed_count < len(self._reader):
+                self._index_from(self.index.indexed_count)
+            self._index_checked = True
+
+    def _index_from(self, start):
+        """
+        Indexes only the records the index has not seen yet
+        """
+        if start == 0:
+            entries = self._reader.iter_entries()
+            self.index.rebuild((i, decode_record(entry).service) for i, entry in enumerate(entries))
+            return
+        for chunk_start in range(start, len(self._reader), DEFAULT_CHUNK_ENTRIES):
+            entries = self._reader.read_range(chunk_start, chunk_start + DEFAULT_CHUNK_ENTRIES)
+            self.index.add((chunk_start + i, decode_record(entry).service) for i, entry in enumerate(entries))
+
+    def _apply(self, op, entry_id, entry):
+        if op == OP_PUT:
+            record = decode_record(entry)
+            self._overlay[entry_id] = record
+            self.index.remember([(entry_id, record.service)])
+            self._next_id = max(self._next_id, entry_id + 1)
+        else:
+            self._overlay[entry_id] = None
+            bisect.insort(self._deleted, entry_id)
+
+    def _id_of(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("record row out of range")
+        return _entry_id(self._deleted, row)
+
+    def _row_of(self, entry_id):
+        return entry_id - bisect.bisect_left(self._deleted, entry_id)
+
+    def _record(self, entry_id):
+        if entry_id in self._overlay:
+            return self._overlay[entry_id]
+        return decode_record(self._reader.get(entry_id))
+
+    def __len__(self):
+        return self._next_id - len(self._deleted)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._reader.close()
+
+    @property
+    def pending_changes(self):
+        return len(self.log.ops)
+
+    def get(self, row):
+        with self._lock:
+            return self._record(self._id_of(row))
+
+    def __getitem__(self, row):
+        return self.get(row)
+
+    def read_range(self, start, stop):
+        """
+        Returns rows [start, stop), decrypting only the chunks that hold them
+        """
+        with self._lock:
+            return [self._record(self._id_of(row)) for row in range(start, stop)]
+
+    def __iter__(self):
+        with self._lock:
+            snapshot = (VaultReader(self.filename, self._key), dict(self._overlay), self._next_id)
+        return _iter_live(*snapshot)
+
+    def append(self, record):
+        """
+        Adds a record at the end; costs one append to the change log
+        """
+        with self._lock:
+            entry_id = self._next_id
+            entry = encode_record(record)
+            self.log.append(OP_PUT, entry_id, entry)
+            self._apply(OP_PUT, entry_id, entry)
+            return len(self) - 1
+
+    def update(self, row, record):
+        with self._lock:
+            entry_id = self._id_of(row)
+            entry = encode_record(record)
+            self.log.append(OP_PUT, entry_id, entry)
+            self._apply(OP_PUT, entry_id, entry)
+
+    def delete(self, row):
+        with self._lock:
+            entry_id = self._id_of(row)
+            self.log.append(OP_DELETE, entry_id)
+            self._apply(OP_DELETE, entry_id, None)
+
+    def find_rows(self, service):
+        """
+        Returns (row, record) for every record stored for service, newest first
+        """
+        wanted = normalize_service(service)
+        matches = []
+        with self._lock:
+            self._check_index()
+            for entry_id in set(self.index.lookup(service)):
+                if entry_id >= self._next_id:
+                    continue
+                record = self._record(entry_id)
+                if record is not None and normalize_service(record.service) == wanted:
+                    matches.append((self._row_of(entry_id), record))
+        return sorted(matches, key=lambda match: -match[0])
+
+    def find(self, service):
+        """
+        Returns every record stored for service, newest first
+        """
+        return [record for _row, record in self.find_rows(service)]
+
+    def compact(self, workers=1):
+        """
+        Folds the change log into a new base vault and atomically swaps it in.
+        The new vault is written beside the old one while reads and writes go
+        on; only the final swap holds the lock. Returns False if there was
+        nothing to compact.
+        """
+        with self._lock:
+            snapshot_ops = len(self.log.ops)
+            if not snapshot_ops or self._compacting:
+                return False
+            self._compacting = True
+            snapshot = VaultReader(self.filename, self._key)
+            overlay = dict(self._overlay)
+            deleted = list(self._deleted)
+            next_id = self._next_id
+
+        temporary = self.filename + COMPACT_SUFFIX
+        try:
+            try:
+                save_records(_iter_live(snapshot, overlay, next_id), temporary, self._key, workers=workers)
+            finally:
+                # _iter_live закрывает снимок сам, но только если его успели начать читать
+                snapshot.close()
+            _fsync_file(temporary)
+            _fsync_file(index_path(temporary))
+            with VaultReader(temporary, self._key) as reader:
+                new_salt = reader.salt
+
+            with self._lock:
+                # Операции, дописанные во время уплотнения, переносятся в новый журнал
+                pending = [(op, entry_id - bisect.bisect_right(deleted, entry_id), entry)
+                           for op, entry_id, entry in self.log.ops[snapshot_ops:]]
+                pending_log = log_path(self.filename) + COMPACT_SUFFIX
+                ChangeLog.write(pending_log, self._key, new_salt, pending)
+                self._reader.close()
+                # Точка фиксации: после замены файла хранилища старый журнал считается устаревшим
+                os.replace(temporary, self.filename)
+                os.replace(index_path(temporary), index_path(self.filename))
+                os.replace(pending_log, log_path(self.filename))
+                _fsync_directory(self.filename)
+                self._open()
+            logging.info("Vault compacted successfully.")
+        except Exception as e:
+            logging.error(f"Error compacting vault: {e}")
+            raise e
+        finally:
+            self._compacting = False
+        return True
+
+    def compact_in_background(self, workers=1, on_error=None):
+        """
+        Runs compact() in a background thread and returns the started thread.
+        If compaction fails, on_error, if given, is called with the exception
+        from that thread; the exception is also kept in compact_error.
+        """
+        self.compact_error = None
+
+        def run():
+            try:
+                self.compact(workers)
+            except Exception as e:
+                self.compact_error = e
+                if on_error is not None:
+                    on_error(e)
+
+        thread = threading.Thread(target=run, name='vault-compaction', daemon=True)
+        thread.start()
+        return thread
+
+
+class RecordReader:
+    """
+    Read-only view of a record vault with its change log applied. Unlike
+    RecordVault it neither loads nor creates the service index or the log,
+    so opening costs the same for any vault size and writes nothing.
+    """
+
+    def __init__(self, filename, key):
+        self._reader = VaultReader(filename, key)
+        try:
+            if not self._reader.flags & FLAG_RECORDS:
+                raise VaultError("Vault does not contain structured records")
+            ops = ChangeLog.read(log_path(filename), key, self._reader.salt)
+        except Exception:
+            self._reader.close()
+            raise
+        self._overlay = {}
+        self._deleted = []
+        self._next_id = len(self._reader)
+        for op, entry_id, entry in ops:
+            if op == OP_PUT:
+                self._overlay[entry_id] = decode_record(entry)
+                self._next_id = max(self._next_id, entry_id + 1)
+            else:
+                self._overlay[entry_id] = None
+                bisect.insort(self._deleted, entry_id)
+
+    def __len__(self):
+        return self._next_id - len(self._deleted)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def read_range(self, start, stop):
+        """
+        Returns rows [start, stop), decrypting only the chunks that hold them
+        """
+        records = []
+        for row in range(start, stop):
+            entry_id = _entry_id(self._deleted, row)
+            if entry_id in self._overlay:
+                records.append(self._overlay[entry_id])
+            else:
+                records.append(decode_record(self._reader.get(entry_id)))
+        return records
+
+    def close(self):
+        self._reader.close()
+
+
+def _iter_live(reader, overlay, next_id):
+    """
+    Yields the live records of a snapshot: base entries with the overlay of
+    logged changes applied, followed by the records added after the base
+    """
+    with reader:
+        for entry_id, entry in enumerate(reader.iter_entries()):
+            record = overlay[entry_id] if entry_id in overlay else decode_record(entry)
+            if record is not None:
+                yield record
+        for entry_id in range(len(reader), next_id):
+            if overlay.get(entry_id) is not None:
+                yield overlay[entry_id]
+
+
+def save_records(records, filename, key, chunk_entries=DEFAULT_CHUNK_ENTRIES, workers=1):
+    """
+    Writes structured records to a binary vault and rebuilds its service index.
+    The index is written segment by segment while the records stream through,
+    so memory does not grow with the number of records.
+    Any change log left beside an older vault at filename becomes stale.
+    """
+    salt = os.urandom(16)
+    index = ServiceIndex(index_path(filename), key, salt)
+
+    def encoded():
+        batch = []
+        for entry_number, record in enumerate(records):
+            batch.append((entry_number, record.service))
+            if len(batch) >= chunk_entries:
+                index.add(batch, remember=False)
+                batch = []
+            yield encode_record(record)
+        index.add(batch, remember=False)
+
+    save_vault(encoded(), filename, key, chunk_entries, workers, flags=FLAG_RECORDS, salt=salt)
+    logging.info("Service index saved successfully.")
+
+
+def _fsync_file(filename):
+    with open(filename, 'rb') as file:
+        os.fsync(file.fileno())
+
+
+def _fsync_directory(filename):
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(filename)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def record_from_legacy(entry):
+    """
+    Converts a legacy "password - service" line into a record
+    """
+    password, separator, service = entry.rpartition(' - ')
+    if not separator:
+        return Record(password=entry)
+    return Record(service=service, password=password)
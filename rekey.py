@@ -0,0 +1,244 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+from collections import deque
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from encryption_utils import _map_chunks, _rotate_chunk
+from password_generator import DEFAULT_CHUNK_SIZE
+from records import RecordVault, _fsync_directory, index_path
+from changelog import log_path
+from vault import (
+    CHUNK_POSITION, FLAG_RECORDS, FOOTER, FOOTER_MAGIC, HEADER, INDEX_ENTRY, RECORD_LENGTH, VAULT_MAGIC,
+    VAULT_VERSION, VaultError, VaultReader, _derive_vault_key, _open, _seal, is_vault_file
+)
+
+# Перешифрование идёт во временный файл <файл>.rekey. После каждой порции
+# временный файл сбрасывается на диск, а в <файл>.rekey.json записывается,
+# докуда он дописан. После сбоя повторный запуск с теми же ключами продолжает
+# с последней контрольной точки; исходный файл заменяется только в самом конце.
+REKEY_SUFFIX = '.rekey'
+CHECKPOINT_SUFFIX = '.rekey.json'
+
+
+def _source_stamp(filename):
+    stat = os.stat(filename)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _key_check(key):
+    # Контрольная точка привязана к новому ключу, но не раскрывает его
+    return hmac.new(key, b'password_manager rekey checkpoint', hashlib.sha256).hexdigest()[:16]
+
+
+class _Checkpoint:
+    def __init__(self, filename, new_key):
+        self.path = filename + CHECKPOINT_SUFFIX
+        self._identity = {'source': _source_stamp(filename), 'key': _key_check(new_key)}
+
+    def load(self):
+        """
+        Returns the saved state if it belongs to the same source file and new key
+        """
+        try:
+            with open(self.path) as file:
+                state = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if any(state.get(name) != value for name, value in self._identity.items()):
+            logging.info("Ignoring a rekey checkpoint for a different file or key.")
+            return None
+        return state
+
+    def save(self, **state):
+        state.update(self._identity)
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _open_temporary(path, size):
+    """
+    Opens the temporary file for appending after discarding anything written past size
+    """
+    file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+    file.truncate(size)
+    file.seek(size)
+    return file
+
+
+def _commit(file, temporary, filename, checkpoint):
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+    # Точка фиксации: исходный файл атомарно заменяется перешифрованным
+    os.replace(temporary, filename)
+    _fsync_directory(filename)
+    checkpoint.remove()
+
+
+def _iter_line_chunks(file, chunk_size, ends):
+    """
+    Yields chunks of non-empty lines from file and appends the byte offset
+    after each chunk to ends
+    """
+    chunk = []
+    for line in iter(file.readline, b''):
+        line = line.rstrip(b'\r\n')
+        if line:
+            chunk.append(line)
+        if len(chunk) == chunk_size:
+            ends.append(file.tell())
+            yield chunk
+            chunk = []
+    if chunk:
+        ends.append(file.tell())
+        yield chunk
+
+
+def _rekey_legacy(filename, old_key, new_key, workers, chunk_size, progress):
+    checkpoint = _Checkpoint(filename, new_key)
+    state = checkpoint.load() or {'offset': 0, 'written': 0, 'entries': 0}
+    temporary = filename + REKEY_SUFFIX
+    total = os.path.getsize(filename)
+    entries = state['entries']
+    out = _open_temporary(temporary, state['written'])
+    try:
+        with open(filename, 'rb') as source:
+            source.seek(state['offset'])
+            ends = deque()
+            chunks = _iter_line_chunks(source, chunk_size, ends)
+            # Ротация по правилам MultiFernet: токены, уже зашифрованные новым ключом, тоже принимаются
+            for tokens in _map_chunks(_rotate_chunk, (new_key, old_key), chunks, workers):
+                out.write(b'\n'.join(tokens) + b'\n')
+                out.flush()
+                os.fsync(out.fileno())
+                entries += len(tokens)
+                offset = ends.popleft()
+                checkpoint.save(offset=offset, written=out.tell(), entries=entries)
+                if progress is not None:
+                    progress(offset, total)
+    except Exception:
+        out.close()
+        raise
+    _commit(out, temporary, filename, checkpoint)
+    return entries
+
+
+def _reseal_chunk(contexts, task):
+    (old_key, old_header), (new_key, new_header) = contexts
+    chunk_number, first_entry, _entry_count, sealed = task
+    position = CHUNK_POSITION.pack(chunk_number, first_entry)
+    # Чанк перешифровывается целиком, без разбора записей
+    return _seal(AESGCM(new_key), _open(AESGCM(old_key), sealed, old_header + position), new_header + position)
+
+
+def _chunk_offsets(file, start, count):
+    """
+    Walks count length-prefixed chunks of an unfinished vault from start and returns their offsets
+    """
+    offsets = []
+    position = start
+    for _ in range(count):
+        offsets.append(position)
+        file.seek(position)
+        (length,) = RECORD_LENGTH.unpack(file.read(RECORD_LENGTH.size))
+        position += RECORD_LENGTH.size + length
+    return offsets
+
+
+def _rekey_vault(filename, old_key, new_key, workers, progress):
+    checkpoint_path = filename + CHECKPOINT_SUFFIX
+    try:
+        with VaultReader(filename, old_key) as reader:
+            records = bool(reader.flags & FLAG_RECORDS)
+    except VaultError:
+        # Ротация уже завершилась раньше: файл открывается новым ключом
+        with VaultReader(filename, new_key) as reader:
+            logging.info("Vault is already encrypted with the new key.")
+            entries = len(reader)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return entries
+    if records:
+        # Журнал изменений зашифрован старым ключом: сначала он вливается в хранилище
+        with RecordVault(filename, old_key) as vault:
+            vault.compact(workers)
+
+    checkpoint = _Checkpoint(filename, new_key)
+    state = checkpoint.load() or {'salt': os.urandom(16).hex(), 'chunks': 0, 'written': HEADER.size}
+    temporary = filename + REKEY_SUFFIX
+    with VaultReader(filename, old_key) as reader:
+        entries = len(reader)
+        chunk_count = reader.chunk_count
+        new_header = HEADER.pack(VAULT_MAGIC, VAULT_VERSION, reader.flags, bytes.fromhex(state['salt']))
+        new_context = (_derive_vault_key(new_key, bytes.fromhex(state['salt'])), new_header)
+        out = _open_temporary(temporary, state['written'])
+        try:
+            out.seek(0)
+            out.write(new_header)
+            offsets = _chunk_offsets(out, HEADER.size, state['chunks'])
+            out.seek(state['written'])
+            done = state['chunks']
+            tasks = (reader._chunk_task(number) for number in range(done, chunk_count))
+            for sealed in _map_chunks(_reseal_chunk, (reader._context, new_context), tasks, workers):
+                offsets.append(out.tell())
+                out.write(RECORD_LENGTH.pack(len(sealed)) + sealed)
+                out.flush()
+                os.fsync(out.fileno())
+                done += 1
+                checkpoint.save(salt=state['salt'], chunks=done, written=out.tell())
+                if progress is not None:
+                    progress(done, chunk_count)
+
+            index = b''.join(INDEX_ENTRY.pack(offset, first_entry, entry_count)
+                             for offset, (_old, first_entry, entry_count) in zip(offsets, reader._index))
+            index_offset = out.tell()
+            sealed_index = _seal(AESGCM(new_context[0]), index, new_header + FOOTER_MAGIC)
+            out.write(sealed_index)
+            out.write(FOOTER.pack(index_offset, len(sealed_index), FOOTER_MAGIC))
+        except Exception:
+            out.close()
+            raise
+    _commit(out, temporary, filename, checkpoint)
+
+    if records:
+        # Индекс сервисов и журнал старого ключа больше не нужны; индекс строится заново
+        for sidecar in (index_path(filename), log_path(filename)):
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+        RecordVault(filename, new_key).close()
+    return entries
+
+
+def rekey_file(filename, old_key, new_key, workers=1, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Re-encrypts a legacy password file or a binary vault under new_key in place.
+    The file is streamed chunk by chunk across workers processes into a
+    temporary file that is checkpointed after every chunk and swapped in
+    atomically at the end. If the process dies, calling rekey_file again with
+    the same keys resumes from the last checkpoint, and the original file
+    stays readable with old_key until the swap. Entries already encrypted with
+    new_key are accepted, as with MultiFernet.rotate. progress, if given, is
+    called with (done, total) after every chunk. Returns the number of entries.
+    """
+    old_key = old_key if isinstance(old_key, bytes) else old_key.encode()
+    new_key = new_key if isinstance(new_key, bytes) else new_key.encode()
+    try:
+        if is_vault_file(filename):
+            entries = _rekey_vault(filename, old_key, new_key, workers, progress)
+        else:
+            entries = _rekey_legacy(filename, old_key, new_key, workers, chunk_size, progress)
+        logging.info(f"{entries} entries re-encrypted with the new key.")
+    except Exception as e:
+        logging.error(f"Error re-encrypting {filename}: {e}")
+        raise e
+    return entries
@@ -0,0 +1,221 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+
+# Поиск по сервису и имени пользователя строится на трёх структурах:
+#   - отсортированный список (сервис, строка) - точные совпадения и префиксы сервиса;
+#   - отсортированный список (слово, строка) - префиксы слов сервиса и имени;
+#   - триграммный индекс (триграмма -> строки) - подстроки и опечатки.
+# Все они только дополняются: после изменения записи старые вхождения остаются,
+# поэтому каждый кандидат перед выдачей сверяется с текущими полями строки.
+GRAM_SIZE = 3
+DEFAULT_LIMIT = 200
+BUILD_CHUNK_SIZE = 2048
+# Сколько вхождений из списков триграмм просматривает поиск с опечатками за один запрос
+MAX_FUZZY_POSTINGS = 20000
+_WORD = re.compile(r'\w+')
+
+
+def _grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def _fields(record):
+    return record.service.strip().casefold(), record.username.strip().casefold()
+
+
+class _SortedPairs:
+    """
+    Sorted list of (text, row) pairs. Bulk additions are buffered and merged
+    in one sort once the buffer outgrows the list, so building stays
+    O(n log n); pairs still in the buffer are only missed by prefix lookups.
+    """
+
+    def __init__(self):
+        self.pairs = []
+        self._pending = []
+
+    def add(self, pair):
+        insort(self.pairs, pair)
+
+    def add_bulk(self, pairs):
+        self._pending.extend(pairs)
+        if len(self._pending) >= len(self.pairs):
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.pairs.extend(self._pending)
+            self.pairs.sort()
+            self._pending = []
+
+    def iter_prefix(self, prefix):
+        pairs = self.pairs
+        for i in range(bisect_left(pairs, (prefix,)), len(pairs)):
+            text, row = pairs[i]
+            if not text.startswith(prefix):
+                return
+            yield text, row
+
+
+class SearchIndex:
+    """
+    In-memory index over the service and username of records, kept by row.
+    search() returns exact service matches first, then service prefixes, then
+    word prefixes, then substrings, then near misses that share most trigrams
+    with the query. Each tier is only consulted while results are missing, so
+    a keystroke costs about as much as the results it returns; when the query
+    grows, the complete substring matches of the previous one are re-checked
+    instead of the index.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._fields = []
+        self._services = _SortedPairs()
+        self._words = _SortedPairs()
+        self._grams = {}
+        self._updated = set()
+        self._last = None
+
+    def __len__(self):
+        return len(self._fields)
+
+    def _index(self, row, record, bulk=False):
+        service, username = _fields(record)
+        while len(self._fields) <= row:
+            self._fields.append(None)
+        old = self._fields[row]
+        self._fields[row] = (service, username)
+        old_grams = _grams(old[0]) | _grams(old[1]) if old else set()
+        for gram in (_grams(service) | _grams(username)) - old_grams:
+            postings = self._grams.get(gram)
+            if postings is None:
+                postings = self._grams[gram] = array('I')
+            postings.append(row)
+        words = [(word, row) for word in set(_WORD.findall(service)) | set(_WORD.findall(username))]
+        if bulk:
+            self._services.add_bulk([(service, row)])
+            self._words.add_bulk(words)
+        else:
+            self._services.add((service, row))
+            for word in words:
+                self._words.add(word)
+        self._last = None
+
+    def update(self, row, record):
+        """
+        Indexes record as the new content of row, which may be one past the last row
+        """
+        with self._lock:
+            self._updated.add(row)
+            self._index(row, record)
+
+    def append(self, record):
+        with self._lock:
+            row = len(self._fields)
+            self.update(row, record)
+            return row
+
+    def build(self, records, check=None):
+        """
+        Indexes records as rows 0, 1, ... . Meant to run on a background
+        thread: search() works meanwhile over the rows indexed so far, and rows
+        changed through update() in the meantime keep their newer content.
+        check, if given, is called between chunks and may raise to stop.
+        """
+        chunk = []
+        for row, record in enumerate(records):
+            chunk.append((row, record))
+            if len(chunk) == BUILD_CHUNK_SIZE:
+                self._index_chunk(chunk)
+                chunk = []
+                if check is not None:
+                    check()
+        self._index_chunk(chunk)
+        with self._lock:
+            self._services.flush()
+            self._words.flush()
+
+    def _index_chunk(self, chunk):
+        with self._lock:
+            for row, record in chunk:
+                if row not in self._updated:
+                    self._index(row, record, bulk=True)
+
+    def _substring_rows(self, query, found, limit):
+        last = self._last
+        if last is not None and query.startswith(last[0]):
+            # Запрос дополнился: новые совпадения - подмножество прежних
+            candidates = last[1]
+        else:
+            candidates = min((self._grams.get(gram, ()) for gram in _grams(query)), key=len)
+        matches = []
+        complete = True
+        for row in candidates:
+            service, username = self._fields[row]
+            if query in service or query in username:
+                matches.append(row)
+                if row not in found:
+                    found[row] = None
+                    if len(found) >= limit:
+                        complete = False
+                        break
+        self._last = (query, matches) if complete else None
+
+    def _fuzzy_rows(self, query, found, limit):
+        query_grams = _grams(query)
+        needed = max(1, (len(query_grams) + 1) // 2)
+        # Строка, разделяющая с запросом needed триграмм, обязательно встречается
+        # в одном из len - needed + 1 самых редких списков, так что кандидатов
+        # достаточно искать в них, а частые триграммы учитываются уже при проверке
+        postings = sorted((self._grams.get(gram, ()) for gram in query_grams), key=len)
+        hits = Counter()
+        budget = MAX_FUZZY_POSTINGS
+        for rows in postings[:len(postings) - needed + 1]:
+            if len(rows) > budget:
+                break
+            hits.update(rows)
+            budget -= len(rows)
+        wanted = limit - len(found)
+        scored = []
+        # Кандидатов с запасом: часть из них уже найдена или устарела
+        for row, _count in hits.most_common(wanted * 4 + len(found)):
+            if row in found:
+                continue
+            service, username = self._fields[row]
+            # Счётчик мог учесть устаревшие вхождения - пересчитываем по текущим полям
+            service_shared = sum(gram in service for gram in query_grams)
+            shared = sum(gram in service or gram in username for gram in query_grams)
+            if shared >= needed:
+                scored.append((-shared, -service_shared, len(service), row))
+        for *_, row in sorted(scored)[:wanted]:
+            found[row] = None
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Returns up to limit rows matching query, best first
+        """
+        query = query.strip().casefold()
+        if not query:
+            return []
+        found = {}
+        with self._lock:
+            # Точное совпадение сортируется раньше остальных строк с тем же префиксом
+            for service, row in self._services.iter_prefix(query):
+                if self._fields[row][0] == service and row not in found:
+                    found[row] = None
+                    if len(found) >= limit:
+                        return list(found)
+            for word, row in self._words.iter_prefix(query):
+                if row not in found and word in _WORD.findall(' '.join(self._fields[row])):
+                    found[row] = None
+                    if len(found) >= limit:
+                        return list(found)
+            if len(query) >= GRAM_SIZE:
+                self._substring_rows(query, found, limit)
+                if len(found) < limit and len(query) > GRAM_SIZE:
+                    self._fuzzy_rows(query, found, limit)
+        return list(found)
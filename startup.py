@@ -0,0 +1,43 @@
+import importlib.util
+import logging
+import sys
+import time
+
+# Момент импорта модуля - максимально близко к запуску процесса
+_STARTED = time.perf_counter()
+
+
+def lazy_import(name):
+    """
+    Returns module name without executing it; the real import happens on first
+    attribute access. Used to keep heavy modules off the startup path.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class StartupTimer:
+    """
+    Collects named startup milestones and reports them as one log line
+    """
+
+    def __init__(self, started=None):
+        self._started = _STARTED if started is None else started
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self._started))
+
+    def report(self):
+        summary = ", ".join(f"{name} {elapsed * 1000:.0f} ms" for name, elapsed in self.marks)
+        logging.info(f"Startup timing: {summary}")
+        return summary
@@ -0,0 +1,196 @@
+import math
+import string
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import repeat
+
+# Оценка стойкости: длина * log2(размер алфавита), где алфавит складывается из
+# встреченных классов символов. Повторы символов снижают оценку: учитывается не
+# больше двух символов на каждый различный символ пароля.
+CLASS_SIZES = {'l': 26, 'u': 26, 'd': 10, 's': len(string.punctuation) + 1}
+# Символы вне ASCII: грубая оценка размера алфавита
+OTHER_CLASS_SIZE = 100
+_CLASS_TABLE = str.maketrans({
+    **{c: 'l' for c in string.ascii_lowercase},
+    **{c: 'u' for c in string.ascii_uppercase},
+    **{c: 'd' for c in string.digits},
+    **{c: 's' for c in string.punctuation + ' '},
+})
+
+VERY_WEAK, WEAK, REASONABLE, STRONG, VERY_STRONG = range(5)
+LEVEL_NAMES = ('very weak', 'weak', 'reasonable', 'strong', 'very strong')
+# Границы уровней в битах энтропии
+LEVEL_THRESHOLDS = (36, 60, 80, 128)
+
+# Пока паролей не больше DEFAULT_MAX_EXACT, повторы ищутся точно по хэшам;
+# дальше - фильтром Блума с вероятностью ложного срабатывания DEFAULT_ERROR_RATE
+DEFAULT_MAX_EXACT = 2000000
+DEFAULT_ERROR_RATE = 1e-4
+
+PasswordReport = namedtuple('PasswordReport', ['total', 'level_counts', 'duplicates', 'reused', 'approximate'])
+PasswordReport.__doc__ = """
+Result of PasswordAnalyzer.report().
+duplicates lists (index, first_index) for passwords repeating an earlier one in
+the batch; first_index is None when only a Bloom filter remembered it.
+reused lists indexes of passwords that already occur among the existing ones.
+approximate is True if a Bloom filter was used, so a few of the reported
+repeats may be false positives.
+"""
+
+
+class _PoolBits(dict):
+    """
+    log2 of the alphabet size for a set of class symbols, computed once per distinct set
+    """
+
+    def __missing__(self, signature):
+        size = sum(CLASS_SIZES.get(symbol, 0) for symbol in signature)
+        if any(symbol not in CLASS_SIZES for symbol in signature):
+            size += OTHER_CLASS_SIZE
+        bits = self[signature] = math.log2(size) if size > 1 else 0.0
+        return bits
+
+
+def entropy_bits(passwords):
+    """
+    Estimates the entropy of every password and returns a list of bits.
+    The per-password work runs through map() over C-level string methods,
+    the nearest thing to a vectorized pass without numpy.
+    """
+    passwords = list(passwords)
+    signatures = map(frozenset, map(str.translate, passwords, repeat(_CLASS_TABLE)))
+    pools = map(_PoolBits().__getitem__, signatures)
+    lengths = map(len, passwords)
+    distinct = map(len, map(set, passwords))
+    return [min(length, 2 * unique) * pool for length, unique, pool in zip(lengths, distinct, pools)]
+
+
+def strength_level(bits):
+    return bisect_right(LEVEL_THRESHOLDS, bits)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over 64-bit hashes, using double hashing
+    """
+
+    def __init__(self, capacity, error_rate=DEFAULT_ERROR_RATE):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, value):
+        """
+        Adds a hash and returns whether it was (probably) present already
+        """
+        value &= 0xffffffffffffffff
+        first, step = value & 0xffffffff, (value >> 32) | 1
+        bits = self._bits
+        present = True
+        for i in range(self.hash_count):
+            position = (first + i * step) % self.size
+            mask = 1 << (position & 7)
+            byte = position >> 3
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        return present
+
+    def __contains__(self, value):
+        value &= 0xffffffffffffffff
+        first, step = value & 0xffffffff, (value >> 32) | 1
+        for i in range(self.hash_count):
+            position = (first + i * step) % self.size
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class SeenPasswords:
+    """
+    Remembers passwords and the index they were first seen at. Beyond
+    max_exact passwords, it switches to a Bloom filter over their 64-bit
+    hashes, so memory stays bounded at the price of rare false positives.
+    """
+
+    def __init__(self, max_exact=DEFAULT_MAX_EXACT, capacity=None, error_rate=DEFAULT_ERROR_RATE):
+        self._first = {}
+        self._bloom = None
+        self._max_exact = max_exact
+        self._capacity = capacity
+        self._error_rate = error_rate
+
+    @property
+    def approximate(self):
+        return self._bloom is not None
+
+    def _switch_to_bloom(self):
+        self._bloom = BloomFilter(max(self._capacity or 0, 4 * self._max_exact), self._error_rate)
+        for password in self._first:
+            self._bloom.add(hash(password))
+        self._first = None
+
+    def add(self, password, index=None):
+        """
+        Remembers password and returns (seen before, index of its first occurrence or None)
+        """
+        if self._bloom is not None:
+            return self._bloom.add(hash(password)), None
+        # Точный набор хранит сами пароли: совпадение хэшей не считается повтором
+        size = len(self._first)
+        first = self._first.setdefault(password, index)
+        if len(self._first) == size:
+            return True, first
+        if len(self._first) > self._max_exact:
+            self._switch_to_bloom()
+        return False, None
+
+    def __contains__(self, password):
+        if self._bloom is not None:
+            return hash(password) in self._bloom
+        return password in self._first
+
+
+class PasswordAnalyzer:
+    """
+    Scores passwords and finds repeats, one chunk at a time.
+    Passwords given to add_existing() (for example, those of an open vault) are
+    only remembered. capacity, the expected number of passwords, sizes the
+    Bloom filters if the exact sets outgrow max_exact. Passwords given to analyze() are scored, checked against
+    the existing ones and against each other, and counted in the report.
+    """
+
+    def __init__(self, max_exact=DEFAULT_MAX_EXACT, capacity=None, error_rate=DEFAULT_ERROR_RATE):
+        self._existing = SeenPasswords(max_exact, capacity, error_rate)
+        self._batch = SeenPasswords(max_exact, capacity, error_rate)
+        self._level_counts = [0] * len(LEVEL_NAMES)
+        self._duplicates = []
+        self._reused = []
+        self._total = 0
+        self._has_existing = False
+
+    def add_existing(self, passwords):
+        for password in passwords:
+            self._existing.add(password)
+            self._has_existing = True
+
+    def analyze(self, passwords):
+        """
+        Analyzes the next chunk of passwords and returns their strength levels
+        """
+        levels = list(map(bisect_right, repeat(LEVEL_THRESHOLDS), entropy_bits(passwords)))
+        for level in range(len(LEVEL_NAMES)):
+            self._level_counts[level] += levels.count(level)
+        for index, password in enumerate(passwords, self._total):
+            seen, first = self._batch.add(password, index)
+            if seen:
+                self._duplicates.append((index, first))
+            if self._has_existing and password in self._existing:
+                self._reused.append(index)
+        self._total += len(passwords)
+        return levels
+
+    def report(self):
+        return PasswordReport(self._total, list(self._level_counts), list(self._duplicates), list(self._reused),
+                              self._batch.approximate or self._existing.approximate)
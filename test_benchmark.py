@@ -0,0 +1,46 @@
+import unittest
+import json
+import os
+import benchmark
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.baseline = 'test_benchmark_baseline.json'
+
+    def tearDown(self):
+        if os.path.exists(self.baseline):
+            os.remove(self.baseline)
+
+    def test_run_suite(self):
+        results = benchmark.run_suite(sizes=(50,), lengths=(8,), isolate=False)
+        self.assertEqual(len(results), len(benchmark.CASES) * 1 * 1)
+        for result in results.values():
+            self.assertGreater(result['throughput'], 0)
+        self.assertGreater(results['save_encrypted_passwords/n=50/len=8']['file_size'], 0)
+        self.assertIsNone(results['generate_multiple_passwords/n=50/len=8']['file_size'])
+
+    def test_compare(self):
+        baseline = {'case': {'throughput': 1000, 'peak_rss_kb': 1000, 'file_size': 100}}
+        self.assertEqual(benchmark.compare({'case': {'throughput': 900, 'peak_rss_kb': 1100, 'file_size': 100}},
+                                           baseline, tolerance=0.2), [])
+        regressions = benchmark.compare({'case': {'throughput': 700, 'peak_rss_kb': 1300, 'file_size': 100}},
+                                        baseline, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertEqual(benchmark.compare({'new': {'throughput': 1}}, baseline), [])
+
+    def test_main_fails_on_regression(self):
+        args = ['--cases', 'generate_multiple_passwords', '--sizes', '100', '--lengths', '8',
+                '--baseline', self.baseline]
+        self.assertEqual(benchmark.main(args + ['--update-baseline']), 0)
+        with open(self.baseline) as file:
+            baseline = json.load(file)
+        self.assertIn('generate_multiple_passwords/n=100/len=8', baseline)
+        for result in baseline.values():
+            result['throughput'] *= 1000
+        with open(self.baseline, 'w') as file:
+            json.dump(baseline, file)
+        self.assertEqual(benchmark.main(args), 1)
+
+if __name__ == '__main__':
+    unittest.main()
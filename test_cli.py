@@ -0,0 +1,120 @@
+import unittest
+import io
+import json
+import os
+import subprocess
+import sys
+import cli
+import keyfile
+from unittest import mock
+from cryptography.fernet import Fernet
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.key_file = 'test_cli.key'
+        self.new_key_file = 'test_cli_new.key'
+        with open(self.key_file, 'wb') as key_file:
+            key_file.write(Fernet.generate_key())
+
+    def tearDown(self):
+        for filename in (self.key_file, self.new_key_file):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def run_cli(self, argv, data=b''):
+        stdout = io.BytesIO()
+        self.assertEqual(cli.main(argv, io.BytesIO(data), stdout), 0)
+        return stdout.getvalue()
+
+    def test_generate(self):
+        lines = self.run_cli(['generate', '-n', '25', '-l', '12', '--no-special', '--chunk-size', '10']).splitlines()
+        self.assertEqual(len(lines), 25)
+        self.assertTrue(all(len(line) == 12 and line.isalnum() for line in lines))
+
+    def test_generate_with_pattern(self):
+        lines = self.run_cli(['generate', '-n', '20', '--pattern', 'd{4}-u{2}']).splitlines()
+        self.assertEqual(len(lines), 20)
+        self.assertTrue(all(line[:4].isdigit() and line[4:5] == b'-' and line[5:].isupper() for line in lines))
+
+    def test_rejects_non_positive_chunk_size(self):
+        for argv in (['generate', '-n', '5', '-l', '8', '--chunk-size', '0'],
+                     ['encrypt', '-k', self.key_file, '-w', '-1']):
+            with mock.patch('sys.stderr', io.StringIO()), self.assertRaises(SystemExit):
+                cli.main(argv, io.BytesIO(), io.BytesIO())
+
+    def test_encrypt_decrypt_round_trip(self):
+        passwords = [f"password{i}".encode() for i in range(30)]
+        encrypted = self.run_cli(['encrypt', '-k', self.key_file, '--chunk-size', '7', '-w', '2'],
+                                 b'\n'.join(passwords) + b'\n')
+        self.assertEqual(len(encrypted.splitlines()), 30)
+        decrypted = self.run_cli(['decrypt', '-k', self.key_file, '--chunk-size', '7'], encrypted)
+        self.assertEqual(decrypted.splitlines(), passwords)
+
+    def test_rekey(self):
+        encrypted = self.run_cli(['generate', '-n', '5', '-l', '8', '-k', self.key_file])
+        rotated = self.run_cli(['rekey', '-k', self.key_file, '--new-key', self.new_key_file, '-w', '1'], encrypted)
+        self.assertTrue(os.path.exists(self.new_key_file))
+        old = self.run_cli(['decrypt', '-k', self.key_file], encrypted)
+        new = self.run_cli(['decrypt', '-k', self.new_key_file], rotated)
+        self.assertEqual(old, new)
+        self.assertEqual(cli.main(['decrypt', '-k', self.key_file], io.BytesIO(rotated), io.BytesIO()), 1)
+
+    def test_rekey_file_in_place(self):
+        filename = 'test_cli_rekey.txt'
+        try:
+            with open(filename, 'wb') as file:
+                file.write(self.run_cli(['encrypt', '-k', self.key_file], b'one\ntwo\n'))
+            self.run_cli(['rekey', '-k', self.key_file, '--new-key', self.new_key_file, '--file', filename])
+            with open(filename, 'rb') as file:
+                self.assertEqual(self.run_cli(['decrypt', '-k', self.new_key_file], file.read()), b'one\ntwo\n')
+        finally:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_import_export(self):
+        source, vault, exported = 'test_cli_import.csv', 'test_cli_import.vault', 'test_cli_export.json'
+        try:
+            with open(source, 'w') as file:
+                file.write('name,username,password\nMail,me,pw\n')
+            self.run_cli(['import', source, '--vault', vault, '-k', self.key_file])
+            self.run_cli(['export', vault, '-k', self.key_file, '-o', exported])
+            with open(exported) as file:
+                self.assertEqual(json.load(file), [{'service': 'Mail', 'username': 'me', 'password': 'pw',
+                                                    'metadata': None}])
+        finally:
+            for filename in (source, vault, vault + '.sidx', vault + '.log', exported):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def test_passphrase_key(self):
+        os.remove(self.key_file)
+        with mock.patch.dict(os.environ, {cli.PASSPHRASE_ENV: 'passphrase'}), \
+                mock.patch.object(keyfile, 'calibrated_cost', return_value=1 << 10):
+            self.run_cli(['keygen', '--passphrase', self.key_file])
+            self.assertTrue(keyfile.is_passphrase_key_file(self.key_file))
+            encrypted = self.run_cli(['encrypt', '-k', self.key_file, '--no-agent'], b'secret\n')
+            self.assertEqual(self.run_cli(['decrypt', '-k', self.key_file, '--no-agent'], encrypted), b'secret\n')
+        with mock.patch.dict(os.environ, {cli.PASSPHRASE_ENV: 'wrong'}):
+            self.assertEqual(cli.main(['decrypt', '-k', self.key_file, '--no-agent'], io.BytesIO(encrypted),
+                                      io.BytesIO()), 1)
+
+    def test_keygen_keeps_existing_key(self):
+        with open(self.key_file, 'rb') as file:
+            key = file.read()
+        with mock.patch('sys.stderr', io.StringIO()):
+            self.assertEqual(cli.main(['keygen', self.key_file], io.BytesIO(), io.BytesIO()), 1)
+        with open(self.key_file, 'rb') as file:
+            self.assertEqual(file.read(), key)
+        self.run_cli(['keygen', '--force', self.key_file])
+        with open(self.key_file, 'rb') as file:
+            self.assertNotEqual(file.read(), key)
+
+    def test_does_not_import_gui_or_git(self):
+        code = ("import sys, cli; cli.main(['generate', '-n', '1', '-l', '8']); "
+                "assert not {'PyQt5', 'git', 'cryptography'} & set(sys.modules), sys.modules.keys()")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import json
+import os
+from cryptography.fernet import Fernet
+from changelog import log_path
+from import_export import export_records, import_records, iter_import_records, record_from_mapping
+from records import Record, RecordVault, index_path, save_records
+
+class TestImportExport(unittest.TestCase):
+
+    def setUp(self):
+        self.key = Fernet.generate_key()
+        self.vault = 'test_import.vault'
+        self.files = [self.vault, index_path(self.vault), log_path(self.vault)]
+
+    def tearDown(self):
+        for filename in self.files:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def write(self, filename, text):
+        self.files.append(filename)
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return filename
+
+    def test_browser_csv(self):
+        source = self.write('test_import.csv', 'name,url,username,password,note\n'
+                                               'GitHub,https://github.com,me,pw1,"two\nlines"\n'
+                                               'Empty,https://example.com,me,,\n')
+        self.assertEqual(list(iter_import_records(source)),
+                         [Record('GitHub', 'me', 'pw1', {'note': 'two\nlines', 'url': 'https://github.com'})])
+
+    def test_password_manager_json(self):
+        export = {'encrypted': False, 'folders': [{'id': '1', 'name': 'Work'}], 'items': [
+            {'name': 'Mail', 'notes': None, 'login': {'username': 'me', 'password': 'pw',
+                                                      'uris': [{'match': None, 'uri': 'https://mail.example'}]}},
+            {'name': 'Secure note', 'type': 2, 'notes': 'text'},
+        ]}
+        source = self.write('test_import.json', json.dumps(export, indent=2))
+        self.assertEqual(list(iter_import_records(source)),
+                         [Record('Mail', 'me', 'pw', {'url': 'https://mail.example'})])
+
+    def test_bitwarden_json(self):
+        export = {'encrypted': False, 'folders': [], 'items': [{
+            'passwordHistory': [{'lastUsedDate': '2024-01-01T00:00:00.000Z', 'password': 'OLDPW'}],
+            'revisionDate': '2024-02-01T00:00:00.000Z', 'id': 'a1', 'organizationId': None, 'folderId': None,
+            'type': 1, 'reprompt': 0, 'name': 'Mail', 'notes': 'note', 'favorite': False,
+            'fields': [{'name': 'PIN', 'value': '1234', 'type': 1, 'linkedId': None}],
+            'login': {'uris': [{'match': None, 'uri': 'https://mail.example'}], 'username': 'me',
+                      'password': 'pw', 'totp': None},
+            'collectionIds': None,
+        }]}
+        source = self.write('test_import.json', json.dumps(export, indent=2))
+        [record] = iter_import_records(source)
+        self.assertEqual(record[:3], ('Mail', 'me', 'pw'))
+        self.assertEqual(record.metadata['url'], 'https://mail.example')
+        self.assertEqual(record.metadata['notes'], 'note')
+        self.assertEqual(record.metadata['passwordhistory'], export['items'][0]['passwordHistory'])
+        self.assertEqual(record.metadata['fields'], export['items'][0]['fields'])
+
+    def test_json_lines(self):
+        source = self.write('test_import.jsonl', '{"service": "a", "password": "1"}\n'
+                                                 '{"url": "https://b", "password": "2"}\n')
+        self.assertEqual(list(iter_import_records(source)), [Record('a', '', '1'), Record('https://b', '', '2')])
+
+    def test_json_objects_span_read_blocks(self):
+        records = [Record(f"service{i}", f"user{i}", 'x' * 1000 + str(i)) for i in range(300)]
+        source = self.write('test_import.json', json.dumps([record._asdict() for record in records]))
+        self.assertEqual(list(iter_import_records(source)), records)
+
+    def test_record_from_mapping_keeps_metadata(self):
+        self.assertEqual(record_from_mapping({'Account': 'Bank', 'Login Name': 'me', 'Password': 'pw',
+                                              'metadata': '{"n": 1}'}),
+                         Record('Bank', 'me', 'pw', {'n': 1}))
+
+    def test_free_text_metadata_is_kept(self):
+        self.assertEqual(record_from_mapping({'service': 'Bank', 'password': 'pw', 'metadata': 'call first'}),
+                         Record('Bank', '', 'pw', {'metadata': 'call first'}))
+        self.assertEqual(record_from_mapping({'service': 'Bank', 'password': 'pw', 'metadata': '[1, 2]'}),
+                         Record('Bank', '', 'pw', {'metadata': '[1, 2]'}))
+
+    def test_import_into_existing_vault(self):
+        save_records([Record('Old', 'me', 'old')], self.vault, self.key)
+        with RecordVault(self.vault, self.key) as vault:
+            vault.append(Record('Logged', 'me', 'logged'))
+        source = self.write('test_import.csv', 'service,username,password\nNew,you,new\n')
+        progress = []
+        self.assertEqual(import_records(source, self.vault, self.key,
+                                        progress=lambda done, total: progress.append((done, total))), 1)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+        self.assertFalse(os.path.exists(log_path(self.vault)))
+        with RecordVault(self.vault, self.key) as vault:
+            self.assertEqual([record.service for record in vault], ['Old', 'Logged', 'New'])
+            self.assertEqual(vault.find('new'), [Record('New', 'you', 'new')])
+
+    def test_failed_import_keeps_vault(self):
+        save_records([Record('Old', 'me', 'old')], self.vault, self.key)
+        source = self.write('test_import.json', '[{"service": "a", "password": "1"}, {"service": ')
+        with self.assertRaises(ValueError):
+            import_records(source, self.vault, self.key)
+        self.assertFalse(os.path.exists(self.vault + '.import'))
+        with RecordVault(self.vault, self.key) as vault:
+            self.assertEqual(list(vault), [Record('Old', 'me', 'old')])
+
+    def test_refuses_to_overwrite_legacy_file(self):
+        legacy = self.write('test_import_legacy.txt', 'token\n')
+        source = self.write('test_import.csv', 'service,password\na,1\n')
+        with self.assertRaises(ValueError):
+            import_records(source, legacy, self.key)
+
+    def test_export_round_trip(self):
+        records = [Record('Mail', 'me', 'pw, "quoted"', {'n': 1}), Record('Bank', '', 'pw2')]
+        for filename in ('test_export.csv', 'test_export.json'):
+            self.files.append(filename)
+            self.assertEqual(export_records(iter(records), filename), 2)
+            self.assertEqual(list(iter_import_records(filename)), records)
+
+    def test_export_is_private_and_atomic(self):
+        filename = self.write('test_export.csv', 'previous export\n')
+        self.files.append(filename + '.export')
+
+        def failing():
+            yield Record('Mail', 'me', 'pw')
+            raise OSError('vault closed')
+
+        with self.assertRaises(OSError):
+            export_records(failing(), filename)
+        self.assertFalse(os.path.exists(filename + '.export'))
+        with open(filename, encoding='utf-8') as file:
+            self.assertEqual(file.read(), 'previous export\n')
+        export_records([Record('Mail', 'me', 'pw')], filename)
+        if os.name == 'posix':
+            self.assertEqual(os.stat(filename).st_mode & 0o777, 0o600)
+
+if __name__ == '__main__':
+    unittest.main()
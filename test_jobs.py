@@ -0,0 +1,160 @@
+import unittest
+import os
+from functools import partial
+from unittest import mock
+import keyfile
+from cryptography.fernet import Fernet
+from changelog import log_path
+from encryption_utils import read_encrypted_passwords, save_encrypted_passwords
+from jobs import (
+    JobCancelled, JobControl, call_job, generate_passwords_job, import_records_job, open_with_key_job, rekey_job,
+    save_passwords_job, save_records_job
+)
+from records import Record, RecordVault, index_path
+
+class TestJobs(unittest.TestCase):
+
+    def test_generate_passwords_job_streams_chunks(self):
+        chunks = []
+        progress = []
+        control = JobControl(on_progress=lambda done, total: progress.append((done, total)),
+                             on_partial=chunks.append)
+        self.assertEqual(generate_passwords_job(control, 25, 8, chunk_size=10), 25)
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(progress, [(10, 25), (20, 25), (25, 25)])
+
+    def test_cancel_stops_job(self):
+        chunks = []
+        control = JobControl(on_partial=chunks.append)
+
+        def cancel_after_first(done, total):
+            control.cancel()
+
+        control._on_progress = cancel_after_first
+        with self.assertRaises(JobCancelled):
+            generate_passwords_job(control, 100, 8, chunk_size=10)
+        self.assertEqual(len(chunks), 1)
+        with self.assertRaises(JobCancelled):
+            call_job(control, len, [])
+
+    def test_save_passwords_job(self):
+        plain, encrypted = 'test_job_plain.txt', 'test_job_encrypted.txt'
+        progress = []
+        control = JobControl(on_progress=lambda done, total: progress.append((done, total)))
+        passwords = [f"password{i}" for i in range(5)]
+        key = Fernet.generate_key()
+        try:
+            save_passwords_job(control, passwords, plain, encrypted, key)
+            with open(plain) as file:
+                self.assertEqual(file.read().splitlines(), passwords)
+            self.assertEqual(read_encrypted_passwords(encrypted, key), passwords)
+            self.assertEqual(progress[-1], (10, 10))
+        finally:
+            for filename in (plain, encrypted, encrypted + '.key'):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def test_save_with_passphrase_and_open(self):
+        encrypted = 'test_job_encrypted.txt'
+        passwords = [f"password{i}" for i in range(5)]
+        try:
+            with mock.patch.object(keyfile, 'calibrated_cost', return_value=1 << 10):
+                save_passwords_job(JobControl(), passwords, None, encrypted, None, 'passphrase')
+            self.assertTrue(keyfile.is_passphrase_key_file(encrypted + '.key'))
+            load_key = partial(keyfile.load_key, encrypted + '.key', 'passphrase', use_agent=False)
+            key, decrypted = open_with_key_job(JobControl(), read_encrypted_passwords, encrypted, load_key)
+            self.assertEqual(decrypted, passwords)
+        finally:
+            for filename in (encrypted, encrypted + '.key'):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def test_save_records_job(self):
+        filename, copy = 'test_job_records.vault', 'test_job_records_copy.vault'
+        records = [Record(f"service{i}", 'me', f"password{i}") for i in range(5)]
+        key = Fernet.generate_key()
+        progress = []
+        control = JobControl(on_progress=lambda done, total: progress.append((done, total)))
+        try:
+            self.assertEqual(save_records_job(control, iter(records), 5, filename, key), filename)
+            self.assertEqual(progress[-1], (5, 5))
+            with RecordVault(filename, key) as vault:
+                vault.delete(0)
+                # Сохранение в тот же файл уплотняет журнал открытого хранилища
+                save_records_job(JobControl(), iter(vault), len(vault), filename, key, vault)
+                self.assertEqual(vault.pending_changes, 0)
+                save_records_job(JobControl(), iter(vault), len(vault), copy, key, vault)
+            with RecordVault(copy, key) as vault:
+                self.assertEqual(list(vault), records[1:])
+        finally:
+            for name in (filename, copy):
+                for path in (name, index_path(name), log_path(name)):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def test_import_job_keeps_existing_key_file(self):
+        source, vault, key_file = 'test_job_import.csv', 'test_job_import.vault', 'test_job_import.vault.key'
+        old_key = Fernet.generate_key()
+        try:
+            with open(source, 'w') as file:
+                file.write('service,password\nMail,pw\n')
+            with open(key_file, 'wb') as file:
+                file.write(old_key)
+            with self.assertRaises(FileExistsError):
+                import_records_job(JobControl(), source, vault, Fernet.generate_key(), key_file=key_file)
+            with open(key_file, 'rb') as file:
+                self.assertEqual(file.read(), old_key)
+            self.assertFalse(os.path.exists(vault))
+        finally:
+            for filename in (source, vault, key_file, index_path(vault), log_path(vault)):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def test_rekey_job_resumes_after_cancel(self):
+        encrypted, new_key_file = 'test_job_rekey.txt', 'test_job_rekey_new.key'
+        passwords = [f"password{i}" for i in range(50)]
+        key = Fernet.generate_key()
+        save_encrypted_passwords(passwords, encrypted, key)
+        control = JobControl(on_progress=lambda done, total: control.cancel())
+        try:
+            with self.assertRaises(JobCancelled):
+                rekey_job(control, encrypted, lambda: key, new_key_file, chunk_size=10)
+            self.assertEqual(read_encrypted_passwords(encrypted, key), passwords)
+            self.assertEqual(rekey_job(JobControl(), encrypted, lambda: key, new_key_file, chunk_size=10), 50)
+            with open(new_key_file, 'rb') as file:
+                self.assertEqual(read_encrypted_passwords(encrypted, file.read()), passwords)
+        finally:
+            for filename in (encrypted, new_key_file, encrypted + '.rekey', encrypted + '.rekey.json'):
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+    def test_rekey_job_keeps_default_key_file(self):
+        encrypted, new_key_file = 'test_job_rekey.txt', 'test_job_rekey_new.key'
+        default_key_file = 'decryption_key.key'
+        backup = None
+        if os.path.exists(default_key_file):
+            with open(default_key_file, 'rb') as file:
+                backup = file.read()
+        key = Fernet.generate_key()
+        with open(default_key_file, 'wb') as file:
+            file.write(key)
+        try:
+            save_encrypted_passwords(['one', 'two'], encrypted, key)
+            load_key = partial(keyfile.load_key, default_key_file, use_agent=False)
+            rekey_job(JobControl(), encrypted, load_key, new_key_file)
+            with open(default_key_file, 'rb') as file:
+                self.assertEqual(file.read(), key)
+            with open(new_key_file, 'rb') as file:
+                self.assertEqual(read_encrypted_passwords(encrypted, file.read()), ['one', 'two'])
+        finally:
+            for filename in (encrypted, new_key_file, encrypted + '.rekey', encrypted + '.rekey.json'):
+                if os.path.exists(filename):
+                    os.remove(filename)
+            if backup is None:
+                os.remove(default_key_file)
+            else:
+                with open(default_key_file, 'wb') as file:
+                    file.write(backup)
+
+if __name__ == '__main__':
+    unittest.main()
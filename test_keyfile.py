@@ -0,0 +1,98 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import key_agent
+import keyfile
+from cryptography.fernet import Fernet
+from keyfile import KeyFileError, create_key_file, load_key
+
+class TestKeyFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.key_file = os.path.join(self.directory, 'vault.key')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_raw_key_file(self):
+        key = Fernet.generate_key()
+        with open(self.key_file, 'wb') as file:
+            file.write(key + b'\n')
+        self.assertFalse(keyfile.is_passphrase_key_file(self.key_file))
+        self.assertEqual(load_key(self.key_file, use_agent=False), key)
+
+    def test_passphrase_key_file(self):
+        key = create_key_file(self.key_file, 'correct horse', n=1 << 10)
+        Fernet(key)
+        with open(self.key_file, 'rb') as file:
+            self.assertNotIn(key, file.read())
+        self.assertTrue(keyfile.is_passphrase_key_file(self.key_file))
+        self.assertEqual(load_key(self.key_file, 'correct horse', use_agent=False), key)
+        with self.assertRaises(KeyFileError):
+            load_key(self.key_file, 'wrong', use_agent=False)
+        with self.assertRaises(KeyFileError):
+            load_key(self.key_file, use_agent=False)
+
+    def test_existing_key_file_is_not_overwritten(self):
+        key = create_key_file(self.key_file, 'correct horse', n=1 << 10)
+        with self.assertRaises(FileExistsError):
+            create_key_file(self.key_file, 'other', n=1 << 10)
+        self.assertEqual(load_key(self.key_file, 'correct horse', use_agent=False), key)
+        key = create_key_file(self.key_file, 'other', n=1 << 10, force=True)
+        self.assertEqual(load_key(self.key_file, 'other', use_agent=False), key)
+
+    def test_calibrated_cost_is_remembered(self):
+        calibration_file = os.path.join(self.directory, 'calibration.json')
+        n = keyfile.calibrated_cost(0.001, calibration_file)
+        self.assertEqual(n, keyfile.MIN_SCRYPT_N)
+        self.assertTrue(os.path.exists(calibration_file))
+        self.assertGreaterEqual(keyfile.calibrate(0.2), n)
+
+class TestKeyAgent(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket = os.path.join(self.directory, 'agent.sock')
+        self.agent = key_agent.KeyAgent(self.socket, ttl=60)
+        self.thread = threading.Thread(target=self.agent.serve)
+        self.thread.start()
+        while not os.path.exists(self.socket):
+            pass
+
+    def tearDown(self):
+        self.agent.stop()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+
+    def test_keys_are_cached(self):
+        self.assertIsNone(key_agent.get_key('id', self.socket))
+        self.assertTrue(key_agent.put_key('id', b'secret', self.socket, start=False))
+        self.assertEqual(key_agent.get_key('id', self.socket), b'secret')
+        self.assertTrue(key_agent.forget_keys(self.socket))
+        self.assertIsNone(key_agent.get_key('id', self.socket))
+
+    def test_keys_expire(self):
+        self.agent.ttl = 0
+        key_agent.put_key('id', b'secret', self.socket, start=False)
+        self.assertIsNone(key_agent.get_key('id', self.socket))
+
+    def test_derived_key_is_served_from_agent(self):
+        key_file = os.path.join(self.directory, 'vault.key')
+        key = create_key_file(key_file, 'passphrase', n=1 << 10)
+        os.environ[key_agent.SOCKET_ENV] = self.socket
+        try:
+            self.assertIsNone(keyfile.cached_key(key_file))
+            self.assertEqual(load_key(key_file, 'passphrase'), key)
+            self.assertEqual(keyfile.cached_key(key_file), key)
+            self.assertEqual(load_key(key_file), key)
+        finally:
+            del os.environ[key_agent.SOCKET_ENV]
+
+    def test_no_agent(self):
+        self.assertIsNone(key_agent.get_key('id', os.path.join(self.directory, 'missing.sock')))
+
+if __name__ == '__main__':
+    unittest.main()
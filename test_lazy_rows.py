@@ -0,0 +1,91 @@
+import unittest
+import os
+from cryptography.fernet import Fernet
+from encryption_utils import save_encrypted_passwords
+from vault import save_vault
+from records import Record, RecordVault, save_records, index_path
+from changelog import log_path
+from lazy_rows import LazyRows, open_text_rows, open_legacy_record_rows, open_record_rows
+
+class TestLazyRows(unittest.TestCase):
+
+    def setUp(self):
+        self.key = Fernet.generate_key()
+        self.filename = 'test_lazy_rows.dat'
+
+    def tearDown(self):
+        for filename in (self.filename, index_path(self.filename), log_path(self.filename)):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_rows_are_fetched_on_demand_and_cache_is_bounded(self):
+        fetched = []
+
+        def fetch(start, stop):
+            fetched.append((start, stop))
+            return [f"row{i}" for i in range(start, stop)]
+
+        rows = LazyRows(1000000, fetch, block_size=100, max_cached_rows=300)
+        self.assertEqual(len(rows), 1000000)
+        self.assertEqual(fetched, [])
+        self.assertEqual(rows[123456], 'row123456')
+        self.assertEqual(rows[123400], 'row123400')
+        self.assertEqual(fetched, [(123400, 123500)])
+        for row in range(0, 1000, 10):
+            rows[row]
+        self.assertLessEqual(rows.cached_rows, 300)
+        self.assertEqual(rows[-1], 'row999999')
+        rows[5] = 'edited'
+        rows.invalidate()
+        self.assertEqual(rows[5], 'edited')
+        with self.assertRaises(IndexError):
+            rows[1000000]
+
+    def test_legacy_file_rows(self):
+        passwords = [f"password{i}" for i in range(50)]
+        passwords[7] = 'abc - Mail'
+        save_encrypted_passwords(passwords, self.filename, self.key)
+        rows = open_text_rows(self.filename, self.key)
+        self.assertEqual(len(rows), 50)
+        self.assertEqual(rows[42], 'password42')
+        self.assertEqual(list(rows), passwords)
+        rows.close()
+        rows = open_legacy_record_rows(self.filename, self.key)
+        self.assertEqual(rows[7], Record(service='Mail', password='abc'))
+        rows.close()
+
+    def test_vault_rows(self):
+        save_vault([f"password{i}" for i in range(50)], self.filename, self.key, chunk_entries=8)
+        rows = open_text_rows(self.filename, self.key)
+        self.assertEqual(rows[33], 'password33')
+        rows.close()
+
+    def test_record_vault_rows(self):
+        save_records([Record('Mail', 'me', 'pw'), Record(password='solo')], self.filename, self.key)
+        rows = open_text_rows(self.filename, self.key)
+        self.assertEqual(list(rows), ['pw - Mail', 'solo'])
+        rows.close()
+        with RecordVault(self.filename, self.key) as vault:
+            rows = open_record_rows(vault)
+            vault.update(1, Record('Bank', '', 'solo'))
+            rows.invalidate(1)
+            self.assertEqual(rows[1].service, 'Bank')
+
+    def test_record_vault_text_rows_are_read_only(self):
+        save_records([Record(password=f"pw{i}") for i in range(20)], self.filename, self.key, chunk_entries=4)
+        with RecordVault(self.filename, self.key) as vault:
+            vault.delete(3)
+            vault.update(0, Record('Mail', '', 'changed'))
+            vault.append(Record(password='new'))
+        os.remove(index_path(self.filename))
+        log_size = os.path.getsize(log_path(self.filename))
+        rows = open_text_rows(self.filename, self.key)
+        expected = ['changed - Mail'] + [f"pw{i}" for i in range(1, 20) if i != 3] + ['new']
+        self.assertEqual(list(rows), expected)
+        self.assertEqual(rows[3], 'pw4')
+        rows.close()
+        self.assertFalse(os.path.exists(index_path(self.filename)))
+        self.assertEqual(os.path.getsize(log_path(self.filename)), log_size)
+
+if __name__ == '__main__':
+    unittest.main()
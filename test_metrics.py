@@ -0,0 +1,51 @@
+import unittest
+import metrics
+from cryptography.fernet import Fernet
+from encryption_utils import encrypt_password, decrypt_password, encrypt_passwords, decrypt_passwords
+from password_generator import generate_multiple_passwords
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        self.was_enabled = metrics.enabled
+
+    def tearDown(self):
+        metrics.enable(self.was_enabled)
+        metrics.reset()
+
+    def test_disabled_records_nothing(self):
+        metrics.enable(False)
+        key = Fernet.generate_key()
+        decrypt_password(encrypt_password('secret', key), key)
+        generate_multiple_passwords(10, 8)
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_bulk_operation_emits_one_summary(self):
+        metrics.enable()
+        key = Fernet.generate_key()
+        passwords = generate_multiple_passwords(100, 8)
+        with self.assertLogs(level='INFO') as logs:
+            encrypted_passwords = encrypt_passwords(passwords, key, workers=1, chunk_size=10)
+        self.assertEqual(len(logs.records), 1)
+        self.assertTrue(logs.output[0].endswith('items/s'))
+        decrypt_passwords(encrypted_passwords, key, workers=1)
+        stats = metrics.snapshot()
+        self.assertEqual(stats['generate']['count'], 100)
+        self.assertEqual(stats['generate']['bytes'], 800)
+        self.assertEqual(stats['encrypt']['count'], 100)
+        self.assertEqual(stats['encrypt']['bytes'], sum(map(len, encrypted_passwords)))
+        self.assertEqual(stats['decrypt']['count'], 100)
+
+    def test_per_item_latency_histogram(self):
+        metrics.enable()
+        key = Fernet.generate_key()
+        for _ in range(5):
+            encrypt_password('secret', key)
+        stat = metrics.snapshot()['encrypt']
+        self.assertEqual(stat['calls'], 5)
+        self.assertEqual(sum(stat['histogram'].values()), 5)
+        self.assertGreater(stat['seconds'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,17 @@
 import unittest
 import os
 import string
+import threading
+from unittest import mock
+import encryption_utils
+from cryptography.fernet import Fernet
 from password_generator import (
-    generate_password, generate_multiple_passwords
+    compile_pattern, generate_password, generate_multiple_passwords, measure_throughput, iter_passwords
 )
 from encryption_utils import (
     generate_key, encrypt_password, decrypt_password,
-    save_encrypted_passwords, read_encrypted_passwords
+    save_encrypted_passwords, read_encrypted_passwords, generate_encrypted_passwords,
+    encrypt_passwords, decrypt_passwords
 )
 
 class TestPasswordGenerator(unittest.TestCase):
@@ -42,6 +47,62 @@ class TestPasswordGenerator(unittest.TestCase):
         password = generate_password(10, exclude_chars=exclude_chars)
         self.assertTrue(all(c not in exclude_chars for c in password))
 
+    def test_generate_multiple_passwords_batch_options(self):
+        passwords = generate_multiple_passwords(1000, 16, include_special=False, exclude_chars='abc')
+        self.assertEqual(len(passwords), 1000)
+        allowed = set(string.ascii_letters + string.digits) - set('abc')
+        self.assertTrue(all(len(p) == 16 and set(p) <= allowed for p in passwords))
+        self.assertEqual(len(set(passwords)), 1000)
+
+    def test_generate_multiple_passwords_unicode_template(self):
+        template = 'абвгд'
+        passwords = generate_multiple_passwords(20, 8, template=template)
+        self.assertTrue(all(set(p) <= set(template) for p in passwords))
+
+    def test_generate_password_empty_charset(self):
+        with self.assertRaises(ValueError):
+            generate_password(10, template='abc', exclude_chars='abc')
+
+    def test_generate_password_with_pattern(self):
+        passwords = generate_multiple_passwords(200, 0, pattern='ul{3}d{2}[xyz]-\\d', exclude_chars='0')
+        for password in passwords:
+            self.assertEqual(len(password), 9)
+            self.assertTrue(password[0].isupper() and password[1:4].islower())
+            self.assertTrue(password[4:6].isdigit() and '0' not in password[4:6])
+            self.assertIn(password[6], 'xyz')
+            self.assertEqual(password[7:], '-d')
+
+    def test_pattern_required_classes(self):
+        passwords = list(iter_passwords(500, 0, pattern='l{5}*{3}!d!s', chunk_size=100))
+        self.assertEqual(len(passwords), 500)
+        self.assertTrue(all(set(p) & set(string.digits) and set(p) & set(string.punctuation) for p in passwords))
+
+    def test_pattern_uses_options_for_any_character(self):
+        password = generate_password(0, include_uppercase=False, include_numbers=False, include_special=False,
+                                     pattern='*{30}')
+        self.assertTrue(password.islower() and len(password) == 30)
+
+    def test_compile_pattern_is_cached(self):
+        self.assertIs(compile_pattern('A{8}!d'), compile_pattern('A{8}!d'))
+        self.assertEqual(compile_pattern('A{8}!d').runs, ((string.ascii_letters + string.digits, 8),))
+
+    def test_invalid_patterns(self):
+        for pattern in ('{3}', 'd{x}', 'd{0}', '[ab', '!x', 'd!u', '[a]', 'd\\'):
+            with self.assertRaises(ValueError, msg=pattern):
+                compile_pattern(pattern, exclude_chars='a')
+
+    def test_iter_passwords_is_lazy(self):
+        passwords = iter_passwords(25, 12, chunk_size=10)
+        self.assertFalse(isinstance(passwords, list))
+        passwords = list(passwords)
+        self.assertEqual(len(passwords), 25)
+        self.assertTrue(all(len(p) == 12 for p in passwords))
+
+    def test_measure_throughput(self):
+        results = measure_throughput(lengths=(8, 16), count=100)
+        self.assertEqual(sorted(results), [8, 16])
+        self.assertTrue(all(rate > 0 for rate in results.values()))
+
     def test_encryption_decryption(self):
         password = "TestPassword123!"
         key = generate_key()
@@ -58,5 +119,36 @@ class TestPasswordGenerator(unittest.TestCase):
         self.assertEqual(passwords, read_passwords)
         os.remove(filename)  # Clean up
 
+    def test_generate_encrypted_passwords_pipeline(self):
+        filename = 'test_pipeline_passwords.txt'
+        key = Fernet.generate_key()
+        generate_encrypted_passwords(25, 12, filename, key, chunk_size=10, include_special=False)
+        read_passwords = read_encrypted_passwords(filename, key)
+        self.assertEqual(len(read_passwords), 25)
+        self.assertTrue(all(len(p) == 12 and p.isalnum() for p in read_passwords))
+        os.remove(filename)
+
+    def test_bulk_encryption_decryption_parallel(self):
+        passwords = generate_multiple_passwords(50, 10)
+        key = Fernet.generate_key()
+        encrypted_passwords = encrypt_passwords(passwords, key, workers=2, chunk_size=7)
+        self.assertEqual(len(encrypted_passwords), 50)
+        self.assertEqual(decrypt_password(encrypted_passwords[13], key), passwords[13])
+        self.assertEqual(decrypt_passwords(encrypted_passwords, key, workers=2, chunk_size=7), passwords)
+        self.assertEqual(decrypt_passwords(encrypted_passwords, key, workers=1), passwords)
+
+    def test_parallel_encryption_from_worker_thread_uses_spawn(self):
+        passwords = generate_multiple_passwords(20, 10)
+        key = Fernet.generate_key()
+        results = []
+        with mock.patch.object(encryption_utils, 'ProcessPoolExecutor',
+                               wraps=encryption_utils.ProcessPoolExecutor) as executor:
+            thread = threading.Thread(target=lambda: results.append(
+                encrypt_passwords(passwords, key, workers=2, chunk_size=5)))
+            thread.start()
+            thread.join()
+        self.assertEqual(executor.call_args.kwargs['mp_context'].get_start_method(), 'spawn')
+        self.assertEqual(decrypt_passwords(results[0], key), passwords)
+
 if __name__ == '__main__':
     unittest.main()
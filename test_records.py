@@ -0,0 +1,222 @@
+import unittest
+import os
+from unittest import mock
+import records
+from cryptography.fernet import Fernet
+from vault import VaultError, VaultReader, save_vault
+from changelog import COMPACT_SUFFIX, log_path
+from records import (
+    Record, RecordVault, ServiceIndex, save_records, index_path, record_from_legacy
+)
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.key = Fernet.generate_key()
+        self.filename = 'test_records.vault'
+
+    def tearDown(self):
+        for filename in (self.filename, index_path(self.filename), log_path(self.filename),
+                         log_path(self.filename) + COMPACT_SUFFIX):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def make_records(self, count):
+        return [Record(f"service{i}", f"user{i}", f"password{i}", {'n': i}) for i in range(count)]
+
+    def test_find_by_service(self):
+        records = self.make_records(100) + [Record('Mail', 'second', 'pw')]
+        save_records(records, self.filename, self.key, chunk_entries=16)
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual(len(vault), 101)
+            self.assertEqual(vault.find('service42'), [records[42]])
+            self.assertEqual(vault.find('  MAIL '), [records[100]])
+            self.assertEqual(vault.find('missing'), [])
+            self.assertEqual(vault[7].metadata, {'n': 7})
+
+    def test_index_is_encrypted(self):
+        save_records([Record('VerySecretService', 'user', 'pw')], self.filename, self.key)
+        with open(index_path(self.filename), 'rb') as file:
+            self.assertNotIn(b'VerySecretService', file.read())
+
+    def test_missing_index_is_rebuilt(self):
+        records = self.make_records(20)
+        save_records(records, self.filename, self.key, chunk_entries=8)
+        os.remove(index_path(self.filename))
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual(vault.find('service13'), [records[13]])
+            self.assertEqual(vault.index.indexed_count, 20)
+
+    def test_index_is_loaded_on_first_lookup(self):
+        expected = self.make_records(20)
+        save_records(expected, self.filename, self.key, chunk_entries=4)
+        with mock.patch.object(records, '_open', wraps=records._open) as open_segment:
+            with RecordVault(self.filename, self.key) as vault:
+                vault.append(Record('Mail', 'me', 'pw'))
+                self.assertEqual(vault[3], expected[3])
+                open_segment.assert_not_called()
+                self.assertEqual(vault.find('service13'), [expected[13]])
+                self.assertEqual(vault.find('mail'), [Record('Mail', 'me', 'pw')])
+                self.assertEqual(open_segment.call_count, 5)
+
+    def test_index_add_is_incremental(self):
+        save_records(self.make_records(5), self.filename, self.key)
+        with RecordVault(self.filename, self.key) as vault:
+            size = os.path.getsize(index_path(self.filename))
+            vault.index.add([(5, 'extra')])
+            self.assertGreater(os.path.getsize(index_path(self.filename)), size)
+            salt = vault._reader.salt
+        index = ServiceIndex(index_path(self.filename), self.key, salt)
+        self.assertEqual(index.lookup('extra'), [5])
+        self.assertEqual(index.indexed_count, 6)
+
+    def test_changes_are_appended_to_log(self):
+        records = self.make_records(10)
+        save_records(records, self.filename, self.key)
+        vault_size = os.path.getsize(self.filename)
+        with RecordVault(self.filename, self.key) as vault:
+            vault.update(3, records[3]._replace(service='Mail'))
+            vault.delete(0)
+            row = vault.append(Record('Bank', 'me', 'pw'))
+            self.assertEqual(row, 9)
+            self.assertEqual(vault.pending_changes, 3)
+        self.assertEqual(os.path.getsize(self.filename), vault_size)
+
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual(len(vault), 10)
+            self.assertEqual(vault[0], records[1])
+            self.assertEqual(vault[2].service, 'Mail')
+            self.assertEqual(vault[-1], Record('Bank', 'me', 'pw'))
+            self.assertEqual(vault.find_rows('mail'), [(2, vault[2])])
+            self.assertEqual(vault.find('service3'), [])
+            self.assertEqual(vault.find('service0'), [])
+            self.assertEqual(list(vault), [vault[i] for i in range(10)])
+
+    def test_compaction(self):
+        save_records(self.make_records(10), self.filename, self.key, chunk_entries=4)
+        with RecordVault(self.filename, self.key) as vault:
+            vault.delete(5)
+            vault.append(Record('Bank', 'me', 'pw'))
+            expected = list(vault)
+            vault.compact_in_background().join()
+            self.assertEqual(vault.pending_changes, 0)
+            self.assertEqual(list(vault), expected)
+            self.assertEqual(vault.find_rows('bank'), [(9, Record('Bank', 'me', 'pw'))])
+            self.assertFalse(vault.compact())
+        self.assertFalse(os.path.exists(self.filename + COMPACT_SUFFIX))
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual(list(vault), expected)
+
+    def test_serial_by_default(self):
+        with mock.patch('encryption_utils.ProcessPoolExecutor') as executor:
+            save_records(self.make_records(40), self.filename, self.key, chunk_entries=4)
+            with RecordVault(self.filename, self.key) as vault:
+                vault.delete(0)
+                vault.compact()
+        executor.assert_not_called()
+
+    def test_failed_background_compaction_is_reported(self):
+        save_records(self.make_records(3), self.filename, self.key)
+        errors = []
+        with RecordVault(self.filename, self.key) as vault:
+            vault.delete(0)
+            with mock.patch.object(records, 'save_vault', side_effect=OSError('disk full')):
+                vault.compact_in_background(on_error=errors.append).join()
+            self.assertEqual([str(error) for error in errors], ['disk full'])
+            self.assertIs(vault.compact_error, errors[0])
+            self.assertEqual(vault.pending_changes, 1)
+
+    def test_failed_compaction_closes_snapshot(self):
+        save_records(self.make_records(3), self.filename, self.key)
+        readers = []
+
+        def opening(*args):
+            readers.append(VaultReader(*args))
+            return readers[-1]
+
+        with RecordVault(self.filename, self.key) as vault:
+            vault.delete(0)
+            with mock.patch.object(records, 'save_vault', side_effect=OSError('disk full')), \
+                    mock.patch.object(records, 'VaultReader', side_effect=opening):
+                with self.assertRaises(OSError):
+                    vault.compact()
+            self.assertEqual(len(readers), 1)
+            self.assertTrue(readers[0]._file.closed)
+
+    def test_rows_skip_deleted_entries(self):
+        expected = self.make_records(40)
+        save_records(expected, self.filename, self.key, chunk_entries=8)
+        with RecordVault(self.filename, self.key) as vault:
+            for row in (0, 0, 5, 17, 17, 30, 33):
+                vault.delete(row)
+                del expected[row]
+            self.assertEqual([vault[row] for row in range(len(vault))], expected)
+            self.assertEqual(vault[-1], expected[-1])
+
+    def test_changes_during_compaction_are_kept(self):
+        save_records(self.make_records(6), self.filename, self.key)
+        with RecordVault(self.filename, self.key) as vault:
+            vault.delete(1)
+            original_save_records = records.save_records
+
+            def save_records_while_editing(*args, **kwargs):
+                original_save_records(*args, **kwargs)
+                vault.update(3, Record('Edited'))
+                vault.append(Record('Added'))
+
+            with mock.patch.object(records, 'save_records', save_records_while_editing):
+                self.assertTrue(vault.compact())
+            self.assertEqual(vault.pending_changes, 2)
+            services = [record.service for record in vault]
+            self.assertEqual(services, ['service0', 'service2', 'service3', 'Edited', 'service5', 'Added'])
+            self.assertEqual(vault.find_rows('edited'), [(3, Record('Edited'))])
+
+    def test_stale_log_is_ignored(self):
+        save_records(self.make_records(3), self.filename, self.key)
+        with RecordVault(self.filename, self.key) as vault:
+            vault.delete(0)
+        with open(log_path(self.filename), 'rb') as file:
+            stale_log = file.read()
+        with RecordVault(self.filename, self.key) as vault:
+            vault.compact()
+        with open(log_path(self.filename), 'wb') as file:
+            file.write(stale_log)
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual(len(vault), 2)
+            self.assertEqual(vault.pending_changes, 0)
+
+    def test_interrupted_compaction_log_is_recovered(self):
+        save_records(self.make_records(3), self.filename, self.key)
+        with RecordVault(self.filename, self.key) as vault:
+            vault.append(Record('Bank'))
+            # Журнал нового хранилища ещё не перемещён на место
+            os.replace(log_path(self.filename), log_path(self.filename) + COMPACT_SUFFIX)
+        with open(log_path(self.filename), 'wb') as file:
+            file.write(b'stale')
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual(vault[-1], Record('Bank'))
+        self.assertFalse(os.path.exists(log_path(self.filename) + COMPACT_SUFFIX))
+
+    def test_torn_log_append_is_discarded(self):
+        save_records(self.make_records(3), self.filename, self.key)
+        with RecordVault(self.filename, self.key) as vault:
+            vault.append(Record('Bank'))
+        with open(log_path(self.filename), 'ab') as file:
+            file.write(b'\x00\x00\x01\x00partial')
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual(len(vault), 4)
+            vault.append(Record('Mail'))
+        with RecordVault(self.filename, self.key) as vault:
+            self.assertEqual([record.service for record in vault][-2:], ['Bank', 'Mail'])
+
+    def test_plain_vault_is_rejected(self):
+        save_vault(['password'], self.filename, self.key)
+        with self.assertRaises(VaultError):
+            RecordVault(self.filename, self.key)
+
+    def test_record_from_legacy(self):
+        self.assertEqual(record_from_legacy('abc - Mail'), Record(service='Mail', password='abc'))
+        self.assertEqual(record_from_legacy('abc'), Record(password='abc'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import os
+from unittest import mock
+import rekey
+from changelog import log_path
+from cryptography.fernet import Fernet
+from encryption_utils import read_encrypted_passwords, save_encrypted_passwords
+from records import Record, RecordVault, index_path, save_records
+from rekey import CHECKPOINT_SUFFIX, REKEY_SUFFIX, rekey_file
+from vault import VaultError, read_vault, save_vault
+
+class TestRekey(unittest.TestCase):
+
+    def setUp(self):
+        self.old_key = Fernet.generate_key()
+        self.new_key = Fernet.generate_key()
+        self.filename = 'test_rekey.dat'
+
+    def tearDown(self):
+        for filename in (self.filename, self.filename + REKEY_SUFFIX, self.filename + CHECKPOINT_SUFFIX,
+                         index_path(self.filename), log_path(self.filename)):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def interrupt_after(self, chunks):
+        """
+        Makes the next rekey_file fail once chunks chunks have been checkpointed
+        """
+        save = rekey._Checkpoint.save
+        calls = []
+
+        def failing_save(checkpoint, **state):
+            save(checkpoint, **state)
+            calls.append(state)
+            if len(calls) == chunks:
+                raise KeyboardInterrupt
+        return mock.patch.object(rekey._Checkpoint, 'save', failing_save)
+
+    def test_legacy_file(self):
+        passwords = [f"password{i}" for i in range(25)]
+        save_encrypted_passwords(passwords, self.filename, self.old_key)
+        progress = []
+        entries = rekey_file(self.filename, self.old_key, self.new_key, workers=1, chunk_size=10,
+                             progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(entries, 25)
+        self.assertEqual(read_encrypted_passwords(self.filename, self.new_key), passwords)
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1][0], progress[-1][1])
+        self.assertFalse(os.path.exists(self.filename + CHECKPOINT_SUFFIX))
+        self.assertFalse(os.path.exists(self.filename + REKEY_SUFFIX))
+
+    def test_legacy_file_resumes_after_crash(self):
+        passwords = [f"password{i}" for i in range(25)]
+        save_encrypted_passwords(passwords, self.filename, self.old_key)
+        with self.interrupt_after(2), self.assertRaises(KeyboardInterrupt):
+            rekey_file(self.filename, self.old_key, self.new_key, workers=1, chunk_size=10)
+        # До замены исходный файл по-прежнему читается старым ключом
+        self.assertEqual(read_encrypted_passwords(self.filename, self.old_key), passwords)
+        with mock.patch.object(rekey, '_rotate_chunk', wraps=rekey._rotate_chunk) as rotate:
+            rekey_file(self.filename, self.old_key, self.new_key, workers=1, chunk_size=10)
+        self.assertEqual(rotate.call_count, 1)
+        self.assertEqual(read_encrypted_passwords(self.filename, self.new_key), passwords)
+
+    def test_checkpoint_for_other_key_is_ignored(self):
+        passwords = [f"password{i}" for i in range(25)]
+        save_encrypted_passwords(passwords, self.filename, self.old_key)
+        with self.interrupt_after(1), self.assertRaises(KeyboardInterrupt):
+            rekey_file(self.filename, self.old_key, Fernet.generate_key(), workers=1, chunk_size=10)
+        rekey_file(self.filename, self.old_key, self.new_key, workers=1, chunk_size=10)
+        self.assertEqual(read_encrypted_passwords(self.filename, self.new_key), passwords)
+
+    def test_vault(self):
+        entries = [f"entry{i}" for i in range(100)]
+        save_vault(entries, self.filename, self.old_key, chunk_entries=16)
+        self.assertEqual(rekey_file(self.filename, self.old_key, self.new_key, workers=2), 100)
+        self.assertEqual(read_vault(self.filename, self.new_key), entries)
+        with self.assertRaises(VaultError):
+            read_vault(self.filename, self.old_key)
+
+    def test_vault_resumes_after_crash(self):
+        entries = [f"entry{i}" for i in range(100)]
+        save_vault(entries, self.filename, self.old_key, chunk_entries=16)
+        with self.interrupt_after(3), self.assertRaises(KeyboardInterrupt):
+            rekey_file(self.filename, self.old_key, self.new_key, workers=1)
+        self.assertEqual(read_vault(self.filename, self.old_key), entries)
+        progress = []
+        rekey_file(self.filename, self.old_key, self.new_key, workers=1,
+                   progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress, [(4, 7), (5, 7), (6, 7), (7, 7)])
+        self.assertEqual(read_vault(self.filename, self.new_key), entries)
+
+    def test_already_rotated_vault(self):
+        save_vault(['a', 'b'], self.filename, self.new_key)
+        self.assertEqual(rekey_file(self.filename, self.old_key, self.new_key), 2)
+        self.assertEqual(read_vault(self.filename, self.new_key), ['a', 'b'])
+
+    def test_record_vault(self):
+        records = [Record(f"service{i}", f"user{i}", f"password{i}") for i in range(50)]
+        save_records(records, self.filename, self.old_key, chunk_entries=8)
+        with RecordVault(self.filename, self.old_key) as vault:
+            vault.append(Record('Mail', 'me', 'secret'))
+        rekey_file(self.filename, self.old_key, self.new_key, workers=1)
+        with RecordVault(self.filename, self.new_key) as vault:
+            self.assertEqual(len(vault), 51)
+            self.assertEqual(vault.find('mail'), [Record('Mail', 'me', 'secret')])
+            self.assertEqual(vault.find('service7'), [records[7]])
+
+if __name__ == '__main__':
+    unittest.main()
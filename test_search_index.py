@@ -0,0 +1,60 @@
+import unittest
+from jobs import JobCancelled, JobControl, build_search_index_job
+from records import Record
+from search_index import SearchIndex
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [
+            Record('Mail', 'alice'), Record('GitHub', 'bob'), Record('Gitlab', 'carol'),
+            Record('Work mail', 'dave'), Record('Bank', 'mailer'), Record('Shop', 'eve@gmail.com'),
+        ]
+        self.index = SearchIndex()
+        self.index.build(self.records)
+
+    def test_ranking(self):
+        self.assertEqual(self.index.search('MAIL'), [0, 3, 4, 5])
+        self.assertEqual(self.index.search('gi'), [1, 2])
+        self.assertEqual(self.index.search('hub'), [1])
+        self.assertEqual(self.index.search('  '), [])
+        self.assertEqual(self.index.search('git', limit=1), [1])
+
+    def test_typos(self):
+        self.assertEqual(self.index.search('githbu')[0], 1)
+        self.assertEqual(self.index.search('gitlba')[0], 2)
+        self.assertEqual(self.index.search('zzzz'), [])
+
+    def test_narrowing_query(self):
+        self.assertEqual(self.index.search('ai'), [])
+        self.assertEqual(self.index.search('ail'), [0, 3, 4, 5])
+        self.assertEqual(self.index.search('ail.')[0], 5)
+
+    def test_updates_are_searchable(self):
+        self.index.search('ail')
+        self.index.update(1, Record('Mailbox', 'bob'))
+        self.assertCountEqual(self.index.search('ail'), [0, 1, 3, 4, 5])
+        self.assertEqual(self.index.search('github'), [])
+        row = self.index.append(Record('Gitea', 'frank'))
+        self.assertEqual(row, 6)
+        self.assertEqual(self.index.search('git'), [6, 2])
+
+    def test_build_keeps_newer_updates(self):
+        index = SearchIndex()
+        index.update(0, Record('Changed'))
+        index.build(self.records)
+        self.assertEqual(index.search('mail'), [3, 4, 5])
+        self.assertEqual(index.search('changed'), [0])
+
+    def test_build_job(self):
+        index = SearchIndex()
+        records = [Record(f"service{i}") for i in range(5000)]
+        self.assertIs(build_search_index_job(JobControl(), index, iter(records)), index)
+        self.assertEqual(index.search('service4999')[0], 4999)
+        control = JobControl()
+        control.cancel()
+        with self.assertRaises(JobCancelled):
+            build_search_index_job(control, SearchIndex(), iter(records))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from jobs import JobControl, analyze_passwords_job
+from password_generator import generate_multiple_passwords
+from strength import (
+    BloomFilter, PasswordAnalyzer, SeenPasswords, entropy_bits, strength_level,
+    VERY_WEAK, WEAK, REASONABLE, VERY_STRONG
+)
+
+class TestStrength(unittest.TestCase):
+
+    def test_entropy(self):
+        bits = entropy_bits(['', 'aaaaaaaaaaaa', 'password', 'Tr0ub4dor&3', 'correct horse battery staple'])
+        self.assertEqual(bits[0], 0)
+        self.assertLess(bits[1], bits[2])
+        self.assertEqual([strength_level(b) for b in bits], [VERY_WEAK, VERY_WEAK, WEAK, REASONABLE, VERY_STRONG])
+        self.assertGreater(entropy_bits(['пароль123'])[0], entropy_bits(['parol123'])[0])
+
+    def test_duplicates_and_reuse(self):
+        analyzer = PasswordAnalyzer()
+        analyzer.add_existing(['vault1', 'vault2'])
+        analyzer.analyze(['new1', 'vault2', 'new1'])
+        analyzer.analyze(['new2', 'new1'])
+        report = analyzer.report()
+        self.assertEqual(report.total, 5)
+        self.assertEqual(sum(report.level_counts), 5)
+        self.assertEqual(report.duplicates, [(2, 0), (4, 0)])
+        self.assertEqual(report.reused, [1])
+        self.assertFalse(report.approximate)
+
+    def test_hash_collisions_are_not_repeats(self):
+        class Colliding(str):
+            def __hash__(self):
+                return 0
+
+        seen = SeenPasswords()
+        self.assertEqual(seen.add(Colliding('first'), 0), (False, None))
+        self.assertEqual(seen.add(Colliding('second'), 1), (False, None))
+        self.assertNotIn(Colliding('third'), seen)
+        self.assertEqual(seen.add(Colliding('second'), 2), (True, 1))
+
+    def test_switch_to_bloom_filter(self):
+        passwords = generate_multiple_passwords(2000, 16)
+        seen = SeenPasswords(max_exact=100, capacity=2000)
+        self.assertEqual([seen.add(password)[0] for password in passwords].count(True), 0)
+        self.assertTrue(seen.approximate)
+        self.assertTrue(all(password in seen for password in passwords))
+        self.assertEqual(seen.add(passwords[5]), (True, None))
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        self.assertFalse(bloom.add(hash('a')))
+        self.assertTrue(bloom.add(hash('a')))
+        self.assertIn(hash('a'), bloom)
+        false_positives = sum(hash(f"other{i}") in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_analyze_job(self):
+        progress = []
+        passwords = ['one', 'two', 'one'] * 10
+        report = analyze_passwords_job(JobControl(on_progress=lambda done, total: progress.append(done)),
+                                       iter(passwords), len(passwords), existing=['two'], chunk_size=7)
+        self.assertEqual(len(report.duplicates), 28)
+        self.assertEqual(len(report.reused), 10)
+        self.assertEqual(progress, [7, 14, 21, 28, 30])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from updater import (
+    UPDATE_APPLIED, UPDATE_FAILED, UPDATE_SKIPPED, NO_UPDATES,
+    check_for_updates, read_last_check, update_from_github
+)
+from startup import StartupTimer, lazy_import
+
+def git(*args, cwd=None):
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True)
+
+def commit(repo, filename):
+    with open(os.path.join(repo, filename), 'w') as file:
+        file.write(filename)
+    git('add', filename, cwd=repo)
+    git('-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-m', filename, cwd=repo)
+
+class TestUpdater(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.remote = os.path.join(self.root, 'remote.git')
+        self.app = os.path.join(self.root, 'app')
+        self.publisher = os.path.join(self.root, 'publisher')
+        self.state_file = os.path.join(self.root, 'state', 'last_update_check')
+        git('init', '--bare', '-b', 'main', self.remote)
+        git('clone', self.remote, self.publisher)
+        git('checkout', '-b', 'main', cwd=self.publisher)
+        commit(self.publisher, 'first.txt')
+        git('push', 'origin', 'main', cwd=self.publisher)
+        git('clone', '-b', 'main', self.remote, self.app)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_no_updates(self):
+        self.assertEqual(update_from_github(self.app), NO_UPDATES)
+
+    def test_update_is_pulled(self):
+        commit(self.publisher, 'second.txt')
+        git('push', 'origin', 'main', cwd=self.publisher)
+        self.assertEqual(check_for_updates(self.app, self.state_file), UPDATE_APPLIED)
+        self.assertTrue(os.path.exists(os.path.join(self.app, 'second.txt')))
+        self.assertIsNotNone(read_last_check(self.state_file))
+
+    def test_recent_check_is_skipped(self):
+        now = time.time()
+        self.assertEqual(check_for_updates(self.app, self.state_file, now=now), NO_UPDATES)
+        commit(self.publisher, 'second.txt')
+        git('push', 'origin', 'main', cwd=self.publisher)
+        self.assertEqual(check_for_updates(self.app, self.state_file, now=now + 60), UPDATE_SKIPPED)
+        self.assertEqual(check_for_updates(self.app, self.state_file, interval=30, now=now + 60), UPDATE_APPLIED)
+
+    def test_unreachable_remote_fails_without_caching(self):
+        git('remote', 'set-url', 'origin', os.path.join(self.root, 'missing.git'), cwd=self.app)
+        self.assertEqual(check_for_updates(self.app, self.state_file), UPDATE_FAILED)
+        self.assertIsNone(read_last_check(self.state_file))
+        self.assertEqual(update_from_github(os.path.join(self.root, 'nowhere')), UPDATE_FAILED)
+
+class TestStartup(unittest.TestCase):
+
+    def test_lazy_import_and_timer(self):
+        module = lazy_import('json')
+        self.assertEqual(module.dumps([1]), '[1]')
+        timer = StartupTimer()
+        timer.mark('imports')
+        timer.mark('window shown')
+        self.assertEqual([name for name, _elapsed in timer.marks], ['imports', 'window shown'])
+        self.assertIn('window shown', timer.report())
+
+if __name__ == '__main__':
+    unittest.main()
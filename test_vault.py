@@ -0,0 +1,83 @@
+import unittest
+import os
+from password_generator import generate_multiple_passwords
+from cryptography.fernet import Fernet
+from encryption_utils import save_encrypted_passwords, read_encrypted_passwords
+from vault import (
+    VaultError, save_vault, read_vault, is_vault_file, open_vault,
+    convert_legacy_to_vault, convert_vault_to_legacy
+)
+
+class TestVault(unittest.TestCase):
+
+    def setUp(self):
+        self.key = Fernet.generate_key()
+        self.filenames = []
+
+    def tearDown(self):
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def make_filename(self, name):
+        self.filenames.append(name)
+        return name
+
+    def test_save_and_read_vault(self):
+        passwords = generate_multiple_passwords(100, 12) + ['', 'пароль - сервис']
+        filename = self.make_filename('test_vault.vault')
+        save_vault(passwords, filename, self.key, chunk_entries=16, workers=1)
+        self.assertTrue(is_vault_file(filename))
+        self.assertEqual(read_vault(filename, self.key, workers=2), passwords)
+
+    def test_empty_vault(self):
+        filename = self.make_filename('test_empty.vault')
+        save_vault([], filename, self.key)
+        self.assertEqual(read_vault(filename, self.key), [])
+
+    def test_random_access(self):
+        passwords = [f"password{i}" for i in range(100)]
+        filename = self.make_filename('test_random_access.vault')
+        save_vault(passwords, filename, self.key, chunk_entries=16)
+        with open_vault(filename, self.key) as reader:
+            self.assertEqual(len(reader), 100)
+            self.assertEqual(reader.chunk_count, 7)
+            self.assertEqual(reader[0], 'password0')
+            self.assertEqual(reader[37], 'password37')
+            self.assertEqual(reader[-1], 'password99')
+            self.assertEqual(reader[14:40], passwords[14:40])
+            for item in (slice(40, 14, -1), slice(None, None, -3), slice(5, 90, 7), slice(10, 2), slice(-5, None)):
+                self.assertEqual(reader[item], passwords[item])
+            self.assertEqual(reader.read_range(90, 200), passwords[90:])
+            self.assertEqual(list(reader), passwords)
+            with self.assertRaises(IndexError):
+                reader.get(100)
+
+    def test_wrong_key(self):
+        filename = self.make_filename('test_wrong_key.vault')
+        save_vault(['secret'], filename, self.key)
+        with self.assertRaises(VaultError):
+            read_vault(filename, Fernet.generate_key())
+
+    def test_vault_is_smaller_than_legacy(self):
+        passwords = generate_multiple_passwords(1000, 12)
+        legacy = self.make_filename('test_legacy_size.txt')
+        vault = self.make_filename('test_size.vault')
+        save_encrypted_passwords(passwords, legacy, self.key)
+        save_vault(passwords, vault, self.key)
+        self.assertLess(os.path.getsize(vault) * 4, os.path.getsize(legacy))
+
+    def test_convert_between_formats(self):
+        passwords = generate_multiple_passwords(30, 10)
+        legacy = self.make_filename('test_legacy.txt')
+        vault = self.make_filename('test_convert.vault')
+        legacy_again = self.make_filename('test_legacy_again.txt')
+        save_encrypted_passwords(passwords, legacy, self.key)
+        self.assertFalse(is_vault_file(legacy))
+        convert_legacy_to_vault(legacy, vault, self.key, chunk_entries=8)
+        self.assertEqual(read_vault(vault, self.key), passwords)
+        convert_vault_to_legacy(vault, legacy_again, self.key)
+        self.assertEqual(read_encrypted_passwords(legacy_again, self.key), passwords)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import logging
+import os
+import time
+
+# Проверять обновления не чаще раза в сутки
+UPDATE_CHECK_INTERVAL = 24 * 60 * 60
+# Сколько секунд ждать ответа удалённого репозитория
+UPDATE_TIMEOUT = 15
+DEFAULT_STATE_FILE = os.path.join(os.path.expanduser('~'), '.password_manager', 'last_update_check')
+
+UPDATE_APPLIED = 'updated'
+NO_UPDATES = 'up-to-date'
+UPDATE_SKIPPED = 'skipped'
+UPDATE_FAILED = 'failed'
+
+
+def read_last_check(state_file=DEFAULT_STATE_FILE):
+    try:
+        with open(state_file) as file:
+            return float(file.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def write_last_check(timestamp, state_file=DEFAULT_STATE_FILE):
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(state_file)), exist_ok=True)
+        with open(state_file, 'w') as file:
+            file.write(str(timestamp))
+    except OSError as e:
+        logging.error(f"Не удалось сохранить время проверки обновлений: {e}")
+
+
+# Автообновление через GitHub
+def update_from_github(repo_path, timeout=UPDATE_TIMEOUT):
+    if not os.path.exists(repo_path):
+        logging.error(f"Путь к репозиторию {repo_path} не существует.")
+        return UPDATE_FAILED
+
+    try:
+        import git  # GitPython грузится долго, поэтому только при проверке обновлений
+
+        repo = git.Repo(repo_path)
+        origin = repo.remotes.origin
+        # Получаем информацию о удаленном репозитории
+        origin.fetch(kill_after_timeout=timeout)
+        # Проверяем, есть ли изменения
+        tracking = repo.active_branch.tracking_branch()
+        head = repo.head.commit
+        if tracking is not None and tracking.commit != head and not repo.is_ancestor(tracking.commit, head):
+            origin.pull(kill_after_timeout=timeout)
+            logging.info("Есть новая версия, обновляемся...")
+            return UPDATE_APPLIED
+        logging.info("Обновлений нет, все стабильно :)")
+        return NO_UPDATES
+    except Exception as e:
+        logging.error(f"Ошибка обновления репозитория: {e}")
+        return UPDATE_FAILED
+
+
+def check_for_updates(repo_path, state_file=DEFAULT_STATE_FILE, interval=UPDATE_CHECK_INTERVAL,
+                      timeout=UPDATE_TIMEOUT, now=None):
+    """
+    Runs update_from_github unless the last successful check was less than interval seconds ago
+    """
+    now = time.time() if now is None else now
+    last_check = read_last_check(state_file)
+    if last_check is not None and 0 <= now - last_check < interval:
+        logging.info("Обновления уже проверялись недавно, пропускаем.")
+        return UPDATE_SKIPPED
+    result = update_from_github(repo_path, timeout)
+    if result != UPDATE_FAILED:
+        write_last_check(now, state_file)
+    return result
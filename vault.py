@@ -0,0 +1,348 @@
+import bisect
+import logging
+import mmap
+import os
+import struct
+import time
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+import metrics
+from encryption_utils import _iter_chunks, _map_chunks, iter_encrypted_passwords, save_encrypted_passwords
+
+# Формат бинарного хранилища:
+#   заголовок | чанк 0 | чанк 1 | ... | зашифрованный индекс | футер
+# Каждый чанк содержит много записей и шифруется одной операцией AES-GCM.
+# Индекс хранит смещение и номер первой записи каждого чанка, футер указывает на индекс.
+VAULT_MAGIC = b'PMVAULT\n'
+VAULT_VERSION = 1
+FOOTER_MAGIC = b'PMVINDEX'
+DEFAULT_CHUNK_ENTRIES = 4096
+# Флаги заголовка
+FLAG_RECORDS = 1    # entries are encoded structured records, see records.py
+
+HEADER = struct.Struct('>8sHH16s')        # magic, version, flags, salt
+RECORD_LENGTH = struct.Struct('>I')       # length of the sealed chunk that follows
+CHUNK_POSITION = struct.Struct('>IQ')     # chunk number, first entry number (authenticated)
+ENTRY_COUNT = struct.Struct('>I')
+INDEX_ENTRY = struct.Struct('>QQI')       # offset, first entry number, entry count
+FOOTER = struct.Struct('>QI8s')           # index offset, index length, magic
+NONCE_SIZE = 12
+
+
+class VaultError(Exception):
+    pass
+
+
+def _derive_vault_key(key, salt):
+    """
+    Derives the AES-GCM key for one vault file from the Fernet key and the file salt
+    """
+    hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=salt, info=b'password_manager vault v1')
+    return hkdf.derive(key if isinstance(key, bytes) else key.encode())
+
+
+def _seal(aead, data, associated_data):
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + aead.encrypt(nonce, data, associated_data)
+
+
+def _open(aead, sealed, associated_data):
+    try:
+        return aead.decrypt(sealed[:NONCE_SIZE], sealed[NONCE_SIZE:], associated_data)
+    except InvalidTag:
+        raise VaultError("Vault is corrupted or the key is wrong")
+
+
+def _iter_framed(data, position):
+    """
+    Yields (end, payload) for every length-prefixed record in data from position on.
+    A truncated record at the tail (an interrupted append) ends the iteration.
+    """
+    while position + RECORD_LENGTH.size <= len(data):
+        (length,) = RECORD_LENGTH.unpack_from(data, position)
+        end = position + RECORD_LENGTH.size + length
+        if end > len(data):
+            return
+        yield end, data[position + RECORD_LENGTH.size:end]
+        position = end
+
+
+def _append_framed(filename, payload, sync=False):
+    with open(filename, 'ab') as file:
+        file.write(RECORD_LENGTH.pack(len(payload)) + payload)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def _pack_entries(entries):
+    encoded = [entry.encode() for entry in entries]
+    lengths = struct.pack(f'>{len(encoded)}I', *map(len, encoded))
+    return ENTRY_COUNT.pack(len(encoded)) + lengths + b''.join(encoded)
+
+
+def _unpack_entries(data):
+    (count,) = ENTRY_COUNT.unpack_from(data)
+    lengths = struct.unpack_from(f'>{count}I', data, ENTRY_COUNT.size)
+    position = ENTRY_COUNT.size + 4 * count
+    entries = []
+    for length in lengths:
+        entries.append(data[position:position + length].decode())
+        position += length
+    return entries
+
+
+def _seal_chunk(context, task):
+    vault_key, header = context
+    chunk_number, first_entry, entries = task
+    associated_data = header + CHUNK_POSITION.pack(chunk_number, first_entry)
+    return len(entries), _seal(AESGCM(vault_key), _pack_entries(entries), associated_data)
+
+
+def _open_chunk(context, task):
+    vault_key, header = context
+    chunk_number, first_entry, entry_count, sealed = task
+    associated_data = header + CHUNK_POSITION.pack(chunk_number, first_entry)
+    entries = _unpack_entries(_open(AESGCM(vault_key), sealed, associated_data))
+    if len(entries) != entry_count:
+        raise VaultError("Vault index does not match chunk contents")
+    return entries
+
+
+def is_vault_file(filename):
+    """
+    Checks whether filename starts with the binary vault header
+    """
+    try:
+        with open(filename, 'rb') as file:
+            return file.read(len(VAULT_MAGIC)) == VAULT_MAGIC
+    except OSError:
+        return False
+
+
+def save_vault(entries, filename, key, chunk_entries=DEFAULT_CHUNK_ENTRIES, workers=1, flags=0, salt=None):
+    """
+    Writes entries to filename in the binary vault format.
+    entries may be any iterable of strings; they are sealed chunk_entries at a time.
+    salt, random by default, lets a caller bind files written beside the vault to it.
+    """
+    try:
+        header = HEADER.pack(VAULT_MAGIC, VAULT_VERSION, flags, salt or os.urandom(16))
+        context = (_derive_vault_key(key, header[-16:]), header)
+
+        def tasks():
+            first_entry = 0
+            for chunk_number, chunk in enumerate(_iter_chunks(entries, chunk_entries)):
+                yield chunk_number, first_entry, chunk
+                first_entry += len(chunk)
+
+        index = []
+        first_entry = 0
+        with metrics.operation('file_write') as operation, open(filename, 'wb') as file:
+            file.write(header)
+            offset = len(header)
+            for entry_count, sealed in _map_chunks(_seal_chunk, context, tasks(), workers):
+                file.write(RECORD_LENGTH.pack(len(sealed)) + sealed)
+                operation.add(entry_count, RECORD_LENGTH.size + len(sealed))
+                index.append(INDEX_ENTRY.pack(offset, first_entry, entry_count))
+                offset += RECORD_LENGTH.size + len(sealed)
+                first_entry += entry_count
+
+            sealed_index = _seal(AESGCM(context[0]), b''.join(index), header + FOOTER_MAGIC)
+            file.write(sealed_index)
+            file.write(FOOTER.pack(offset, len(sealed_index), FOOTER_MAGIC))
+        logging.info(f"Vault with {first_entry} entries saved successfully.")
+    except Exception as e:
+        logging.error(f"Error saving vault: {e}")
+        raise e
+
+
+def _read_layout(buffer, key):
+    """
+    Parses the header and the index of a vault held in buffer (bytes or mmap)
+    and returns (context, [(offset, first_entry, entry_count), ...])
+    """
+    if len(buffer) < HEADER.size + FOOTER.size:
+        raise VaultError("File is too short to be a vault")
+    header = bytes(buffer[:HEADER.size])
+    magic, version, _flags, salt = HEADER.unpack(header)
+    if magic != VAULT_MAGIC:
+        raise VaultError("File is not a vault")
+    if version != VAULT_VERSION:
+        raise VaultError(f"Unsupported vault version: {version}")
+    context = (_derive_vault_key(key, salt), header)
+
+    index_offset, index_length, footer_magic = FOOTER.unpack(buffer[-FOOTER.size:])
+    if footer_magic != FOOTER_MAGIC:
+        raise VaultError("Vault footer is missing or damaged")
+    sealed_index = buffer[index_offset:index_offset + index_length]
+    index = _open(AESGCM(context[0]), sealed_index, header + FOOTER_MAGIC)
+    return context, list(INDEX_ENTRY.iter_unpack(index))
+
+
+class VaultReader:
+    """
+    Random-access view of a binary vault.
+    The file is memory-mapped and only the chunks covering the requested entries
+    are read and decrypted, so opening a vault and fetching one entry does not
+    depend on the vault size.
+    """
+
+    def __init__(self, filename, key):
+        self._file = open(filename, 'rb')
+        try:
+            if os.fstat(self._file.fileno()).st_size == 0:
+                raise VaultError("File is too short to be a vault")
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._context, self._index = _read_layout(self._mmap, key)
+        except Exception:
+            self.close()
+            raise
+        self._first_entries = [first_entry for _offset, first_entry, _count in self._index]
+        self._length = sum(entry_count for _offset, _first, entry_count in self._index)
+        self._cached_chunk = (None, None)
+
+    def __len__(self):
+        return self._length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if getattr(self, '_mmap', None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    @property
+    def chunk_count(self):
+        return len(self._index)
+
+    @property
+    def flags(self):
+        return HEADER.unpack(self._context[1])[2]
+
+    @property
+    def salt(self):
+        """
+        Random per-file salt; changes every time the vault is rewritten
+        """
+        return HEADER.unpack(self._context[1])[3]
+
+    def _chunk_task(self, chunk_number):
+        offset, first_entry, entry_count = self._index[chunk_number]
+        (length,) = RECORD_LENGTH.unpack_from(self._mmap, offset)
+        start = offset + RECORD_LENGTH.size
+        return chunk_number, first_entry, entry_count, self._mmap[start:start + length]
+
+    def read_chunk(self, chunk_number):
+        """
+        Returns the decrypted entries of one chunk
+        """
+        cached_number, cached_entries = self._cached_chunk
+        if cached_number == chunk_number:
+            return cached_entries
+        started = time.perf_counter() if metrics.enabled else None
+        task = self._chunk_task(chunk_number)
+        entries = _open_chunk(self._context, task)
+        if started is not None:
+            metrics.record('decrypt', len(entries), len(task[-1]), time.perf_counter() - started)
+        self._cached_chunk = (chunk_number, entries)
+        return entries
+
+    def _chunk_of(self, entry_number):
+        return bisect.bisect_right(self._first_entries, entry_number) - 1
+
+    def get(self, entry_number):
+        """
+        Returns entry entry_number, decrypting only the chunk that holds it
+        """
+        if entry_number < 0:
+            entry_number += self._length
+        if not 0 <= entry_number < self._length:
+            raise IndexError("vault entry index out of range")
+        chunk_number = self._chunk_of(entry_number)
+        return self.read_chunk(chunk_number)[entry_number - self._first_entries[chunk_number]]
+
+    def read_range(self, start, stop):
+        """
+        Returns entries [start, stop), decrypting only the chunks that cover them
+        """
+        start, stop, _step = slice(start, stop).indices(self._length)
+        if start >= stop:
+            return []
+        entries = []
+        for chunk_number in range(self._chunk_of(start), self._chunk_of(stop - 1) + 1):
+            first_entry = self._first_entries[chunk_number]
+            chunk = self.read_chunk(chunk_number)
+            entries.extend(chunk[max(start - first_entry, 0):stop - first_entry])
+        return entries
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            rows = range(*item.indices(self._length))
+            if not rows:
+                return []
+            if rows.step == 1:
+                return self.read_range(rows.start, rows.stop)
+            # Читаем один раз весь охватываемый диапазон, шаг применяем уже к нему
+            low = min(rows[0], rows[-1])
+            entries = self.read_range(low, max(rows[0], rows[-1]) + 1)
+            return [entries[row - low] for row in rows]
+        return self.get(item)
+
+    def __iter__(self):
+        return self.iter_entries()
+
+    def iter_entries(self, workers=1):
+        """
+        Yields every entry in order, decrypting chunks across workers processes
+        """
+        tasks = (self._chunk_task(chunk_number) for chunk_number in range(len(self._index)))
+        for entries in _map_chunks(_open_chunk, self._context, tasks, workers):
+            yield from entries
+
+
+def open_vault(filename, key):
+    """
+    Opens a binary vault for random access; see VaultReader
+    """
+    return VaultReader(filename, key)
+
+
+def iter_vault(filename, key, workers=1):
+    """
+    Lazily yields the entries of a binary vault in order
+    """
+    with VaultReader(filename, key) as reader:
+        yield from reader.iter_entries(workers)
+
+
+def read_vault(filename, key, workers=1):
+    try:
+        entries = list(iter_vault(filename, key, workers))
+        logging.info("Vault read and decrypted successfully.")
+    except Exception as e:
+        logging.error(f"Error reading vault: {e}")
+        raise e
+    return entries
+
+
+def convert_legacy_to_vault(legacy_filename, vault_filename, key, chunk_entries=DEFAULT_CHUNK_ENTRIES,
+                            workers=1):
+    """
+    Converts a file with one Fernet token per line into the binary vault format
+    """
+    save_vault(iter_encrypted_passwords(legacy_filename, key, workers), vault_filename, key, chunk_entries, workers)
+
+
+def convert_vault_to_legacy(vault_filename, legacy_filename, key, workers=1):
+    """
+    Converts a binary vault back into a file with one Fernet token per line
+    """
+    save_encrypted_passwords(iter_vault(vault_filename, key, workers), legacy_filename, key, workers=workers)
@@ -0,0 +1,42 @@
+import logging
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+from jobs import JobCancelled, JobControl
+
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal('qint64', 'qint64')  # байты больших файлов не помещаются в int
+    partial = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Worker(QRunnable):
+    """
+    Runs job(control, *args, **kwargs) on a QThreadPool thread.
+    Progress, partial results and the outcome are delivered through signals,
+    which Qt queues onto the UI thread.
+    """
+
+    def __init__(self, job, *args, **kwargs):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self.control = JobControl(on_progress=self.signals.progress.emit, on_partial=self.signals.partial.emit)
+        self._job = job
+        self._args = args
+        self._kwargs = kwargs
+
+    def cancel(self):
+        self.control.cancel()
+
+    def run(self):
+        try:
+            result = self._job(self.control, *self._args, **self._kwargs)
+        except JobCancelled:
+            logging.info("Job cancelled.")
+            self.signals.cancelled.emit()
+        except Exception as e:
+            logging.error(f"Error running job: {e}")
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)